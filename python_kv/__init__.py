@@ -1,8 +1,9 @@
 """Python key-value store using Raft consensus."""
 
-from .kvstore import KVStore, NotLeaderError, CommitFailedError
+from .kvstore import KVStore, NotLeaderError, CommitFailedError, StaleReadError
+from .async_kvstore import AsyncKVStore
+from .cluster import KVCluster
 from .datastore import DataStore
+from .transport import HTTPTransport
 
-__all__ = ["KVStore", "NotLeaderError", "CommitFailedError", "DataStore"]
-
-
+__all__ = ["KVStore", "AsyncKVStore", "KVCluster", "NotLeaderError", "CommitFailedError", "StaleReadError", "DataStore", "HTTPTransport"]
@@ -0,0 +1,229 @@
+"""Asyncio key-value store using Raft consensus via HTTP bridge."""
+
+import asyncio
+import collections
+from typing import Dict, Optional, Tuple
+
+from .async_transport import AsyncHTTPTransport
+from .datastore import DataStore
+from .kvstore import CommitFailedError, NotLeaderError
+
+
+class AsyncKVStore:
+    """Asyncio variant of KVStore for keeping many operations in flight.
+
+    Operations only submit their command and then wait on a future. A single
+    background applier task pulls committed entries from the bridge in log
+    order, applies them to the local DataStore and resolves the futures of
+    the operations whose index it reached, so the cost of waiting does not
+    grow with the number of in-flight operations.
+    """
+
+    def __init__(self, raft_bridge_url: str, server_id: int, timeout_ms: int = 30000,
+                 transport: Optional[AsyncHTTPTransport] = None, recent_results: int = 65536):
+        """
+        Initialize the KV store.
+
+        Args:
+            raft_bridge_url: Base URL of the Raft bridge service (e.g., "http://localhost:8080")
+            server_id: ID of this server in the Raft cluster
+            timeout_ms: Timeout for waiting for commits in milliseconds
+            transport: Asyncio HTTP transport for submissions; defaults to a new pipelined transport
+            recent_results: Number of applied results kept for late-arriving submissions
+        """
+        self.bridge_url = raft_bridge_url.rstrip('/')
+        self.server_id = server_id
+        self.timeout_ms = timeout_ms
+        self.transport = transport or AsyncHTTPTransport()
+        # The applier long-polls the bridge; give it its own connection so it
+        # never blocks pipelined submissions behind it.
+        self._feed_transport = AsyncHTTPTransport(pool_size=1, max_pipeline=1)
+        self.datastore = DataStore()
+        self.last_applied_index = -1
+        self.last_error: Optional[Exception] = None
+
+        self._waiters: Dict[int, asyncio.Future] = {}
+        # Results of recently applied entries. A submission's response can
+        # arrive after the applier already passed its index.
+        self._recent: "collections.OrderedDict[int, tuple]" = collections.OrderedDict()
+        self._recent_limit = recent_results
+        self._wakeup: Optional[asyncio.Event] = None
+        self._applier: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _submit_command(self, kind: str, key: str, value: str = "", compare_value: str = "") -> int:
+        """Submit a command to Raft and return log index."""
+        url = f"{self.bridge_url}/submit"
+        payload = {
+            "kind": kind,
+            "key": key,
+            "value": value,
+            "compare_value": compare_value,
+            "id": self.server_id
+        }
+
+        response = await self.transport.post(url, json=payload, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+
+        if not data.get("is_leader"):
+            raise NotLeaderError("This server is not the Raft leader")
+
+        return data["log_index"]
+
+    async def _wait_applied(self, log_index: int) -> Tuple[Tuple[Optional[str], bool], dict]:
+        """Wait until the applier reaches log_index; return its result and command."""
+        if self._closed:
+            raise RuntimeError("AsyncKVStore is closed")
+        if log_index <= self.last_applied_index:
+            if log_index in self._recent:
+                return self._recent[log_index]
+            raise CommitFailedError(f"Result for log index {log_index} is no longer available")
+        fut = self._waiters.get(log_index)
+        if fut is None:
+            fut = self._waiters[log_index] = asyncio.get_running_loop().create_future()
+        self._ensure_applier()
+        self._wakeup.set()
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), self.timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            detail = f" (last error: {self.last_error})" if self.last_error else ""
+            raise CommitFailedError(f"Timed out waiting for log index {log_index} to be applied{detail}") from None
+        finally:
+            if self._waiters.get(log_index) is fut and not fut.done():
+                del self._waiters[log_index]
+
+    def _ensure_applier(self):
+        if self._applier is None or self._applier.done():
+            self._wakeup = asyncio.Event()
+            self._applier = asyncio.ensure_future(self._run_applier())
+
+    async def _run_applier(self):
+        """Apply committed entries in log order and resolve waiting operations."""
+        while not self._closed:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            try:
+                if not await self._fetch_commits():
+                    # Nothing new yet: block on the bridge until the next
+                    # index commits instead of polling.
+                    await self._wait_next_commit()
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = e
+                await asyncio.sleep(0.05)
+
+    async def _fetch_commits(self) -> bool:
+        """Apply all commits after last_applied_index; return True if any were new."""
+        url = f"{self.bridge_url}/get_commits_since"
+        response = await self._feed_transport.get(url, params={"since_index": self.last_applied_index}, timeout=5)
+        if response.status == 404:
+            return False
+        response.raise_for_status()
+        commits = response.json().get("commits", [])
+        commits.sort(key=lambda c: c["index"])
+        applied_before = self.last_applied_index
+        for commit in commits:
+            self._apply_commit(commit)
+        return self.last_applied_index > applied_before
+
+    async def _wait_next_commit(self):
+        url = f"{self.bridge_url}/wait_commit"
+        payload = {"log_index": self.last_applied_index + 1, "timeout_ms": self.timeout_ms}
+        response = await self._feed_transport.post(url, json=payload, timeout=(self.timeout_ms / 1000) + 10)
+        response.raise_for_status()
+        self._apply_commit(response.json())
+
+    def _apply_commit(self, commit: dict):
+        index = commit["index"]
+        # Only apply the next entry in sequence; anything else was either
+        # applied already or will arrive in order on a later fetch.
+        if index != self.last_applied_index + 1:
+            return
+        outcome = (self.datastore.apply(commit["command"]), commit["command"])
+        self.last_applied_index = index
+        self._recent[index] = outcome
+        if len(self._recent) > self._recent_limit:
+            self._recent.popitem(last=False)
+        fut = self._waiters.pop(index, None)
+        if fut is not None and not fut.done():
+            fut.set_result(outcome)
+
+    async def get(self, key: str) -> Tuple[Optional[str], bool]:
+        """
+        Get a value by key.
+
+        Returns:
+            Tuple of (value, found) where found is True if key exists.
+
+        Raises:
+            NotLeaderError: If this server is not the leader
+        """
+        log_index = await self._submit_command("get", key)
+        result, _ = await self._wait_applied(log_index)
+        return result
+
+    async def put(self, key: str, value: str) -> Tuple[Optional[str], bool]:
+        """
+        Put a key-value pair.
+
+        Returns:
+            Tuple of (previous_value, was_found) where was_found indicates
+            if the key existed before.
+
+        Raises:
+            NotLeaderError: If this server is not the leader
+        """
+        log_index = await self._submit_command("put", key, value)
+        result, _ = await self._wait_applied(log_index)
+        return result
+
+    async def cas(self, key: str, compare_value: str, new_value: str) -> Tuple[Optional[str], bool]:
+        """
+        Compare-and-swap operation.
+
+        Returns:
+            Tuple of (old_value, was_found) where was_found indicates
+            if the key existed before the operation.
+
+        Raises:
+            NotLeaderError: If this server is not the leader
+            CommitFailedError: If another command was committed at our index
+        """
+        log_index = await self._submit_command("cas", key, new_value, compare_value)
+        result, command = await self._wait_applied(log_index)
+        if command.get("id") != self.server_id:
+            raise CommitFailedError("Command was committed but not ours (lost leadership)")
+        return result
+
+    async def is_leader(self) -> bool:
+        """Check if this server is the Raft leader."""
+        response = await self.transport.get(f"{self.bridge_url}/is_leader", timeout=5)
+        response.raise_for_status()
+        return response.json()["is_leader"]
+
+    async def close(self):
+        """Stop the applier and close all connections."""
+        self._closed = True
+        if self._applier is not None:
+            self._applier.cancel()
+            try:
+                await self._applier
+            except asyncio.CancelledError:
+                pass
+        for fut in self._waiters.values():
+            if not fut.done():
+                fut.cancel()
+        self._waiters.clear()
+        await self.transport.close()
+        await self._feed_transport.close()
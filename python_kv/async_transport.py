@@ -0,0 +1,253 @@
+"""Asyncio HTTP/1.1 transport with connection reuse and request pipelining."""
+
+import asyncio
+import collections
+import json
+import socket
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_MAX_PIPELINE = 128
+
+
+class HTTPError(Exception):
+    """Raised for HTTP error responses (status >= 400)."""
+
+    def __init__(self, status: int, body: bytes):
+        super().__init__(f"HTTP {status}: {body[:200]!r}")
+        self.status = status
+        self.body = body
+
+
+class AsyncResponse:
+    """A fully-read HTTP response."""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise HTTPError(self.status, self.body)
+
+
+class _PipelinedConnection:
+    """A single keep-alive connection that pipelines requests.
+
+    Requests are written back-to-back without waiting for earlier responses;
+    a reader task matches responses to requests in FIFO order, as required by
+    HTTP/1.1.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._pending: Deque[asyncio.Future] = collections.deque()
+        self.closed = False
+        self._read_task = asyncio.ensure_future(self._read_loop())
+
+    @property
+    def inflight(self) -> int:
+        return len(self._pending)
+
+    def send(self, request: bytes) -> asyncio.Future:
+        if self.closed:
+            raise ConnectionError("connection is closed")
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append(fut)
+        self._writer.write(request)
+        return fut
+
+    async def drain(self):
+        await self._writer.drain()
+
+    async def _read_loop(self):
+        try:
+            while True:
+                response = await self._read_response()
+                if response is None:
+                    break
+                fut = self._pending.popleft()
+                # The caller may have given up (timeout/cancel); the response
+                # still has to be consumed to keep the pipeline in sync.
+                if not fut.done():
+                    fut.set_result(response)
+                if response.headers.get("connection", "").lower() == "close":
+                    break
+        except asyncio.IncompleteReadError:
+            self._fail_pending(ConnectionError("connection closed in the middle of a response"))
+        except Exception as e:
+            self._fail_pending(e)
+        finally:
+            self._fail_pending(ConnectionError("connection closed by server"))
+            self.close()
+
+    async def _read_response(self) -> Optional[AsyncResponse]:
+        status_line = await self._reader.readline()
+        if not status_line:
+            return None
+        parts = status_line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2:
+            raise ConnectionError(f"malformed status line: {status_line!r}")
+        status = int(parts[1])
+
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size_line = await self._reader.readline()
+                if not size_line:
+                    raise asyncio.IncompleteReadError(b"", None)
+                size = int(size_line.split(b";", 1)[0].strip(), 16)
+                if size == 0:
+                    # Skip trailers up to the terminating blank line.
+                    while (await self._reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readexactly(2)
+            body = b"".join(chunks)
+        else:
+            body = await self._reader.readexactly(int(headers.get("content-length", "0")))
+        return AsyncResponse(status, headers, body)
+
+    def _fail_pending(self, exc: Exception):
+        while self._pending:
+            fut = self._pending.popleft()
+            if not fut.done():
+                fut.set_exception(exc)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._writer.close()
+        if not self._read_task.done() and self._read_task is not asyncio.current_task():
+            self._read_task.cancel()
+
+
+class AsyncHTTPTransport:
+    """Asyncio HTTP/1.1 client with per-host connection pools and pipelining.
+
+    Each host gets up to ``pool_size`` keep-alive connections, and each
+    connection carries up to ``max_pipeline`` outstanding requests. New
+    requests go to the least-loaded connection, so thousands of concurrent
+    callers share a handful of sockets.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE,
+                 max_pipeline: int = DEFAULT_MAX_PIPELINE,
+                 tcp_nodelay: bool = True):
+        """
+        Initialize the transport.
+
+        Args:
+            pool_size: Maximum number of connections per host
+            max_pipeline: Maximum number of outstanding requests per connection
+            tcp_nodelay: Disable Nagle's algorithm on pooled sockets
+        """
+        self.pool_size = pool_size
+        self.max_pipeline = max_pipeline
+        self.tcp_nodelay = tcp_nodelay
+        self._pools: Dict[Tuple[str, str, int], List[_PipelinedConnection]] = {}
+        self._slots: Dict[Tuple[str, str, int], asyncio.Semaphore] = {}
+        self._connecting: Dict[Tuple[str, str, int], int] = {}
+
+    async def get(self, url: str, params: Optional[dict] = None,
+                  timeout: Optional[float] = None) -> AsyncResponse:
+        """Send a GET request over a pooled connection."""
+        return await self.request("GET", url, params=params, timeout=timeout)
+
+    async def post(self, url: str, json: Optional[dict] = None,
+                   timeout: Optional[float] = None) -> AsyncResponse:
+        """Send a POST request over a pooled connection."""
+        return await self.request("POST", url, json=json, timeout=timeout)
+
+    async def request(self, method: str, url: str, params: Optional[dict] = None,
+                      json: Optional[dict] = None,
+                      timeout: Optional[float] = None) -> AsyncResponse:
+        """Send a request and return the fully-read response."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {parts.scheme}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+
+        target = parts.path or "/"
+        query = parts.query
+        if params:
+            query = f"{query}&{urlencode(params)}" if query else urlencode(params)
+        if query:
+            target = f"{target}?{query}"
+
+        body = b""
+        headers = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}", "Connection: keep-alive"]
+        if json is not None:
+            body = _dumps(json)
+            headers.append("Content-Type: application/json")
+        if body or method == "POST":
+            headers.append(f"Content-Length: {len(body)}")
+        request = ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = asyncio.Semaphore(self.pool_size * self.max_pipeline)
+        async with slots:
+            conn = await self._acquire(key)
+            fut = conn.send(request)
+            await conn.drain()
+            if timeout is None:
+                return await fut
+            # Shield the future: on timeout the response must still be read
+            # off the connection by the reader task.
+            return await asyncio.wait_for(asyncio.shield(fut), timeout)
+
+    async def _acquire(self, key: Tuple[str, str, int]) -> _PipelinedConnection:
+        while True:
+            pool = self._pools.setdefault(key, [])
+            pool[:] = [c for c in pool if not c.closed]
+            best = min(pool, key=lambda c: c.inflight, default=None)
+            opening = self._connecting.get(key, 0)
+            has_room = len(pool) + opening < self.pool_size
+            if best is not None and best.inflight < self.max_pipeline and (best.inflight == 0 or not has_room):
+                return best
+            if has_room:
+                break
+            # Every connection is saturated or still being opened.
+            await asyncio.sleep(0.001)
+
+        self._connecting[key] = opening + 1
+        try:
+            scheme, host, port = key
+            reader, writer = await asyncio.open_connection(host, port, ssl=(scheme == "https") or None)
+        finally:
+            self._connecting[key] -= 1
+        sock = writer.get_extra_info("socket")
+        if self.tcp_nodelay and sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = _PipelinedConnection(reader, writer)
+        pool.append(conn)
+        return conn
+
+    async def close(self):
+        """Close all pooled connections."""
+        for pool in self._pools.values():
+            for conn in pool:
+                conn.close()
+        self._pools.clear()
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
@@ -3,6 +3,7 @@
 Command-line interface for starting the Raft KV store cluster.
 """
 
+import argparse
 import subprocess
 import sys
 import os
@@ -96,7 +97,32 @@ def kill_existing_processes():
                          capture_output=True, stderr=subprocess.DEVNULL)
 
 
-def start_node(node_id, port, peer_ids, bridge_path):
+def bridge_learner_args(learner_ids):
+    """Return the bridge's startup arguments naming the cluster's learners.
+
+    Every node, voters and learners alike, gets the same list. Without
+    learners no argument is added.
+    """
+    if not learner_ids:
+        return []
+    return ["--learners=" + ",".join(map(str, learner_ids))]
+
+
+def bridge_timing_args(timing="default", adaptive_timing=False):
+    """Return the bridge's startup arguments selecting its Raft timing.
+
+    The defaults add no arguments, so bridges built before timing profiles
+    existed still start.
+    """
+    args = []
+    if timing != "default":
+        args.append(f"--timing={timing}")
+    if adaptive_timing:
+        args.append("--adaptive-timing")
+    return args
+
+
+def start_node(node_id, port, peer_ids, bridge_path, extra_args=()):
     """Start a single Raft node."""
     print(f"Starting node {node_id} on port {port}...")
     
@@ -104,7 +130,7 @@ def start_node(node_id, port, peer_ids, bridge_path):
     creationflags = subprocess.CREATE_NEW_CONSOLE if sys.platform == "win32" else 0
     
     process = subprocess.Popen(
-        [str(bridge_path), str(node_id), str(port), peers_str],
+        [str(bridge_path), str(node_id), str(port), peers_str, *extra_args],
         cwd=os.getcwd(),
         creationflags=creationflags,
         stdout=subprocess.DEVNULL,
@@ -115,11 +141,11 @@ def start_node(node_id, port, peer_ids, bridge_path):
     return process
 
 
-def connect_peers():
-    """Connect all peers together."""
+def connect_peers(nodes):
+    """Connect all peers together; nodes lists (port, node_id) pairs."""
     # Get listen addresses first
     addresses = {}
-    for port, node_id in [(8080, 0), (8081, 1), (8082, 2)]:
+    for port, node_id in nodes:
         for _ in range(10):
             try:
                 response = requests.get(f"http://localhost:{port}/listen_addr", timeout=1)
@@ -131,7 +157,7 @@ def connect_peers():
                 time.sleep(0.2)
     
     # Connect peers
-    for port, node_id in [(8080, 0), (8081, 1), (8082, 2)]:
+    for port, node_id in nodes:
         for peer_id, peer_addr in addresses.items():
             if peer_id != node_id:
                 try:
@@ -144,16 +170,16 @@ def connect_peers():
                     pass
     
     # Signal ready
-    for port in [8080, 8081, 8082]:
+    for port, _ in nodes:
         try:
             requests.post(f"http://localhost:{port}/ready", timeout=1)
         except:
             pass
 
 
-def find_leader():
-    """Find which node is the leader."""
-    for port, node_id in [(8080, 0), (8081, 1), (8082, 2)]:
+def find_leader(nodes):
+    """Find which of the (port, node_id) pairs in nodes is the leader."""
+    for port, node_id in nodes:
         try:
             response = requests.get(f"http://localhost:{port}/is_leader", timeout=1)
             if response.status_code == 200 and response.json().get("is_leader"):
@@ -165,6 +191,18 @@ def find_leader():
 
 def main():
     """Main entry point for the CLI."""
+    parser = argparse.ArgumentParser(description="Start a 3-node Raft KV store cluster.")
+    parser.add_argument("--learners", type=int, default=0, metavar="N",
+                        help="also start N non-voting learner nodes on ports 8083 and up")
+    parser.add_argument("--timing", choices=["default", "lan", "wan"], default="default",
+                        help="heartbeat and election timeout profile of the Raft nodes")
+    parser.add_argument("--adaptive-timing", action="store_true",
+                        help="lengthen the timeouts to fit the round trip times the nodes measure")
+    args = parser.parse_args()
+    nodes = [(8080 + node_id, node_id) for node_id in range(3 + args.learners)]
+    learner_ids = [node_id for _, node_id in nodes[3:]]
+    extra_args = bridge_timing_args(args.timing, args.adaptive_timing) + bridge_learner_args(learner_ids)
+
     print("=" * 60)
     print("Raft KV Store - Simple Startup")
     print("=" * 60)
@@ -190,18 +228,21 @@ def main():
     time.sleep(1)
     
     print()
-    print("Starting 3-node cluster...")
+    if learner_ids:
+        print(f"Starting 3-node cluster with learners {learner_ids}...")
+    else:
+        print("Starting 3-node cluster...")
     
     # Start all nodes
-    start_node(0, 8080, [1, 2], bridge_path)
-    start_node(1, 8081, [0, 2], bridge_path)
-    start_node(2, 8082, [0, 1], bridge_path)
+    for port, node_id in nodes:
+        peer_ids = [peer_id for _, peer_id in nodes if peer_id != node_id]
+        start_node(node_id, port, peer_ids, bridge_path, extra_args)
     
     print("✓ All nodes started")
     time.sleep(2)
     
     # Connect peers
-    connect_peers()
+    connect_peers(nodes)
     print("✓ Nodes connected")
     
     # Wait for leader
@@ -209,7 +250,7 @@ def main():
     print("Waiting for leader election...")
     for i in range(30):
         time.sleep(0.5)
-        leader_port, leader_id = find_leader()
+        leader_port, leader_id = find_leader(nodes)
         if leader_port:
             print()
             print("=" * 60)
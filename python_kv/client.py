@@ -1,25 +1,28 @@
 """Client for interacting with the KV store over HTTP."""
 
-import requests
 from typing import Optional, Tuple
 
+from .transport import HTTPTransport, get_default_transport
+
 
 class KVClient:
     """Client for making requests to a KV store server."""
     
-    def __init__(self, server_url: str):
+    def __init__(self, server_url: str, transport: Optional[HTTPTransport] = None):
         """
         Initialize the client.
         
         Args:
             server_url: Base URL of the KV store server (e.g., "http://localhost:9000")
+            transport: HTTP transport to use; defaults to the shared pooled transport
         """
         self.server_url = server_url.rstrip('/')
+        self.transport = transport or get_default_transport()
     
     def get(self, key: str) -> Tuple[Optional[str], bool]:
         """Get a value by key."""
         url = f"{self.server_url}/get"
-        response = requests.post(url, json={"key": key})
+        response = self.transport.post(url, json={"key": key})
         response.raise_for_status()
         data = response.json()
         
@@ -31,7 +34,7 @@ class KVClient:
     def put(self, key: str, value: str) -> Tuple[Optional[str], bool]:
         """Put a key-value pair."""
         url = f"{self.server_url}/put"
-        response = requests.post(url, json={"key": key, "value": value})
+        response = self.transport.post(url, json={"key": key, "value": value})
         response.raise_for_status()
         data = response.json()
         
@@ -43,7 +46,7 @@ class KVClient:
     def cas(self, key: str, compare_value: str, new_value: str) -> Tuple[Optional[str], bool]:
         """Compare-and-swap operation."""
         url = f"{self.server_url}/cas"
-        response = requests.post(url, json={
+        response = self.transport.post(url, json={
             "key": key,
             "compare_value": compare_value,
             "value": new_value
@@ -0,0 +1,138 @@
+"""Cluster-wide client that spreads bounded-staleness reads across nodes."""
+
+import itertools
+import threading
+from typing import List, Optional, Tuple
+
+import requests
+
+from .kvstore import KVStore, NotLeaderError, StaleReadError
+from .transport import HTTPTransport, get_default_transport
+
+
+class KVCluster:
+    """Key-value client for a whole Raft cluster.
+
+    Keeps one KVStore per node. Writes and log reads go to the current
+    leader, which is rediscovered when a node answers NotLeaderError.
+    Bounded-staleness reads are spread round-robin across all nodes, so read
+    throughput grows with the cluster size; a node that is too stale or
+    unreachable hands the read to the next one.
+    """
+
+    def __init__(self, node_urls: List[str], transport: Optional[HTTPTransport] = None,
+                 max_staleness_entries: Optional[int] = None,
+                 max_staleness_ms: Optional[float] = 1000, **kvstore_kwargs):
+        """
+        Initialize the cluster client.
+
+        Args:
+            node_urls: Bridge URLs of all nodes, indexed by server ID
+            transport: HTTP transport to use; defaults to the shared pooled transport
+            max_staleness_entries: Default entry bound for bounded reads
+            max_staleness_ms: Default time bound for bounded reads
+            **kvstore_kwargs: Passed to each node's KVStore
+        """
+        transport = transport or get_default_transport()
+        self.stores = [
+            KVStore(url, server_id=server_id, transport=transport, **kvstore_kwargs)
+            for server_id, url in enumerate(node_urls)
+        ]
+        self.max_staleness_entries = max_staleness_entries
+        self.max_staleness_ms = max_staleness_ms
+        self._leader: Optional[int] = None
+        self._next_reader = itertools.count()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _find_leader(self) -> KVStore:
+        """Return the leader's KVStore, probing all nodes if it isn't known."""
+        with self._lock:
+            if self._leader is not None:
+                return self.stores[self._leader]
+        for server_id, store in enumerate(self.stores):
+            try:
+                if store.is_leader():
+                    with self._lock:
+                        self._leader = server_id
+                    return store
+            except requests.RequestException:
+                continue
+        raise NotLeaderError("No node in the cluster is the Raft leader")
+
+    def _on_leader(self, operation, idempotent: bool):
+        """
+        Run operation(store) on the leader, retrying once after a leader change.
+
+        As in KVStore, failures after which the command may still commit are
+        only retried when the operation is idempotent.
+        """
+        store = self._find_leader()
+        try:
+            return operation(store)
+        except NotLeaderError as e:
+            with self._lock:
+                self._leader = None
+            if e.maybe_committed and not idempotent:
+                raise
+        except requests.ConnectionError:
+            with self._lock:
+                self._leader = None
+            if not idempotent:
+                raise
+        return operation(self._find_leader())
+
+    def get(self, key: str, consistency: str = "bounded",
+            max_staleness_entries: Optional[int] = None,
+            max_staleness_ms: Optional[float] = None) -> Tuple[Optional[str], bool]:
+        """
+        Get a value by key.
+
+        Bounded reads (the default) use the cluster's staleness bounds unless
+        overridden and are served by the next node in turn; other consistency
+        modes go to the leader as in KVStore.get.
+
+        Raises:
+            StaleReadError: If no node could serve the read within bounds
+        """
+        if consistency != "bounded":
+            return self._on_leader(lambda store: store.get(key, consistency), idempotent=True)
+        if max_staleness_entries is None and max_staleness_ms is None:
+            max_staleness_entries = self.max_staleness_entries
+            max_staleness_ms = self.max_staleness_ms
+
+        start = next(self._next_reader)
+        last_error: Optional[Exception] = None
+        for offset in range(len(self.stores)):
+            store = self.stores[(start + offset) % len(self.stores)]
+            try:
+                return store.get(key, "bounded", max_staleness_entries, max_staleness_ms)
+            except (StaleReadError, requests.RequestException) as e:
+                last_error = e
+        raise StaleReadError(f"No node could serve a bounded read of {key!r}: {last_error}")
+
+    def put(self, key: str, value: str) -> Tuple[Optional[str], bool]:
+        """Put a key-value pair through the leader."""
+        return self._on_leader(lambda store: store.put(key, value), idempotent=True)
+
+    def cas(self, key: str, compare_value: str, new_value: str) -> Tuple[Optional[str], bool]:
+        """Compare-and-swap through the leader."""
+        return self._on_leader(lambda store: store.cas(key, compare_value, new_value), idempotent=False)
+
+    def transfer_leadership(self, target_id: int) -> bool:
+        """Hand the leadership over to node target_id; see KVStore.transfer_leadership."""
+        transferred = self._on_leader(lambda store: store.transfer_leadership(target_id), idempotent=False)
+        if transferred:
+            with self._lock:
+                self._leader = target_id
+        return transferred
+
+    def close(self):
+        """Stop every node's background applier."""
+        for store in self.stores:
+            store.close()
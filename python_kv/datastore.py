@@ -51,5 +51,23 @@ class DataStore:
             self._store[key] = new_value
         
         return old_value, was_found
-
+    
+    def apply(self, command: dict) -> Tuple[Optional[str], bool]:
+        """
+        Apply a committed Raft command to the store.
+        
+        Returns:
+            The result of the get/put/cas operation described by the command.
+        """
+        kind = command["kind"]
+        key = command["key"]
+        
+        if kind == "get":
+            return self.get(key)
+        elif kind == "put":
+            return self.put(key, command.get("value", ""))
+        elif kind == "cas":
+            return self.cas(key, command.get("compare_value", ""), command.get("value", ""))
+        else:
+            raise ValueError(f"Unknown command kind: {kind}")
 
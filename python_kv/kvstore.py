@@ -1,30 +1,106 @@
 """Key-value store using Raft consensus via HTTP bridge."""
 
+import collections
 import json
+import socket
+import threading
 import time
-from typing import Optional, Tuple
+import weakref
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union
 import requests
 
 from .datastore import DataStore
+from .transport import HTTPTransport, get_default_transport
+
+
+T = TypeVar("T")
 
 
 class KVStore:
-    """Distributed key-value store using Raft consensus."""
+    """Distributed key-value store using Raft consensus.
+    
+    With stream_commits enabled (the default), a background applier thread
+    follows the bridge's /commits_stream feed and applies committed entries
+    to the local DataStore as they arrive. Operations only submit their
+    command and wait for the applier to reach its index.
     
-    def __init__(self, raft_bridge_url: str, server_id: int, timeout_ms: int = 30000):
+    Given a list of node URLs, the store caches the current leader and
+    follows it across elections: a not-leader response moves it to the
+    hinted leader (or to whichever node claims leadership), and the
+    operation is retried there with backoff.
+    """
+    
+    def __init__(self, raft_bridge_url: Union[str, Sequence[str]], server_id: int, timeout_ms: int = 30000,
+                 transport: Optional[HTTPTransport] = None, batch_size: int = 1000,
+                 combined_submit: bool = True, stream_commits: bool = True,
+                 recent_results: int = 65536, follower_wait_ms: int = 50,
+                 failover_timeout_ms: int = 3000, stream_idle_timeout_ms: int = 15000):
         """
         Initialize the KV store.
         
         Args:
-            raft_bridge_url: Base URL of the Raft bridge service (e.g., "http://localhost:8080")
+            raft_bridge_url: Base URL of the Raft bridge service (e.g., "http://localhost:8080"),
+                or a list of the URLs of all nodes, indexed by server ID
             server_id: ID of this server in the Raft cluster
             timeout_ms: Timeout for waiting for commits in milliseconds
+            transport: HTTP transport to use; defaults to the shared pooled transport
+            batch_size: Maximum number of commands per /submit_batch request
+            combined_submit: Submit and wait for the commit in a single request
+                (/submit_wait) instead of /submit followed by /wait_commit; falls
+                back to the two requests if the bridge has no /submit_wait endpoint
+            stream_commits: Apply commits from the streaming feed in a background
+                thread; falls back to polling if the bridge has no stream endpoint
+            recent_results: Number of applied results kept for operations
+                whose index the applier has already passed
+            follower_wait_ms: How long a bounded-staleness read waits for this
+                node to catch up before raising StaleReadError
+            failover_timeout_ms: How long an operation keeps retrying on other
+                nodes after losing the leader (only with several node URLs)
+            stream_idle_timeout_ms: How long the commit stream may stay silent,
+                keep-alives included, before the applier reconnects
         """
-        self.bridge_url = raft_bridge_url.rstrip('/')
+        if isinstance(raft_bridge_url, str):
+            raft_bridge_url = [raft_bridge_url]
+        self.node_urls = [url.rstrip('/') for url in raft_bridge_url]
+        self.bridge_url = self.node_urls[0]  # Cached leader
+        self.failover_timeout_ms = failover_timeout_ms
+        self.transport = transport or get_default_transport()
         self.server_id = server_id
         self.timeout_ms = timeout_ms
+        self.batch_size = batch_size
+        self.combined_submit = combined_submit
+        self._submit_wait_supported = True
         self.datastore = DataStore()
         self.last_applied_index = -1  # Track the last commit index we've applied
+        self.stream_commits = stream_commits
+        self.follower_wait_ms = follower_wait_ms
+        self.stream_idle_timeout_ms = stream_idle_timeout_ms
+        self.last_error: Optional[Exception] = None
+        
+        # _cond guards the datastore, last_applied_index and _recent; the
+        # applier notifies it whenever it applies entries.
+        self._cond = threading.Condition()
+        self._recent: "collections.OrderedDict[int, tuple]" = collections.OrderedDict()
+        self._recent_limit = recent_results
+        self._applier: Optional[threading.Thread] = None
+        # The stream holds its connection for as long as it is open; give it
+        # its own so it never takes a slot in the shared pool.
+        self._stream_transport = HTTPTransport(pool_connections=1, pool_maxsize=1)
+        self._stream_response = None
+        self._stream_supported = True
+        self._closed = False
+        # Closes the stream's connection if the store is dropped without close().
+        self._finalizer = weakref.finalize(self, self._stream_transport.close)
+        
+        # Client-side lease read counters (see get(..., consistency="lease"))
+        self.lease_hits = 0
+        self.lease_misses = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
     
     def _submit_command(self, kind: str, key: str, value: str = "", compare_value: str = "") -> int:
         """Submit a command to Raft and return log index."""
@@ -37,15 +113,40 @@ class KVStore:
             "id": self.server_id
         }
         
-        response = requests.post(url, json=payload, timeout=5)
+        response = self.transport.post(url, json=payload, timeout=5)
         response.raise_for_status()
         data = response.json()
         
         if not data.get("is_leader"):
-            raise NotLeaderError("This server is not the Raft leader")
+            raise NotLeaderError("This server is not the Raft leader", data.get("leader_id"))
         
         return data["log_index"]
     
+    def _submit_batch(self, commands: List[dict]) -> int:
+        """Submit commands to Raft as one batch and return the first log index."""
+        url = f"{self.bridge_url}/submit_batch"
+        payload = {
+            "commands": [
+                {
+                    "kind": command["kind"],
+                    "key": command["key"],
+                    "value": command.get("value", ""),
+                    "compare_value": command.get("compare_value", ""),
+                    "id": self.server_id
+                }
+                for command in commands
+            ]
+        }
+        
+        response = self.transport.post(url, json=payload, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data.get("is_leader"):
+            raise NotLeaderError("This server is not the Raft leader", data.get("leader_id"))
+        
+        return data["first_index"]
+    
     def _wait_for_commit(self, log_index: int) -> dict:
         """Wait for a command to be committed at the given log index."""
         url = f"{self.bridge_url}/wait_commit"
@@ -57,41 +158,227 @@ class KVStore:
         # Add extra buffer to timeout to account for network delays
         timeout_seconds = (self.timeout_ms / 1000) + 10
         try:
-            response = requests.post(url, json=payload, timeout=timeout_seconds)
+            response = self.transport.post(url, json=payload, timeout=timeout_seconds)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.Timeout:
             # If timeout, check if we're still the leader
             try:
-                if not self.is_leader():
-                    raise NotLeaderError("Lost leadership while waiting for commit")
-            except:
-                pass
+                still_leader = self.is_leader()
+            except requests.RequestException:
+                still_leader = True  # Can't tell; report the timeout itself
+            if not still_leader:
+                raise NotLeaderError("Lost leadership while waiting for commit", maybe_committed=True)
             raise
     
+    def _submit_and_wait(self, kind: str, key: str, value: str = "", compare_value: str = "") -> dict:
+        """Submit a command and wait for its commit in a single round trip."""
+        url = f"{self.bridge_url}/submit_wait"
+        payload = {
+            "kind": kind,
+            "key": key,
+            "value": value,
+            "compare_value": compare_value,
+            "id": self.server_id,
+            "timeout_ms": self.timeout_ms
+        }
+        
+        # Add extra buffer to timeout to account for network delays
+        timeout_seconds = (self.timeout_ms / 1000) + 10
+        response = self.transport.post(url, json=payload, timeout=timeout_seconds)
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data.get("is_leader"):
+            raise NotLeaderError("This server is not the Raft leader", data.get("leader_id"))
+        if not data.get("committed", True):
+            raise NotLeaderError("Lost leadership while waiting for commit", maybe_committed=True)
+        
+        return data
+    
+    def _commit_command(self, kind: str, key: str, value: str = "", compare_value: str = "") -> dict:
+        """Submit a command and return its committed entry."""
+        if self.combined_submit and self._submit_wait_supported:
+            try:
+                return self._submit_and_wait(kind, key, value, compare_value)
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                # Older bridge without /submit_wait; nothing was submitted,
+                # so use /submit and /wait_commit from now on.
+                self._submit_wait_supported = False
+        log_index = self._submit_command(kind, key, value, compare_value)
+        return self._wait_for_commit(log_index)
+    
     def _apply_command(self, command: dict) -> Tuple[Optional[str], bool]:
         """Apply a committed command to the local data store."""
-        kind = command["kind"]
-        key = command["key"]
+        return self.datastore.apply(command)
+    
+    def _apply_commit(self, commit: dict) -> bool:
+        """
+        Apply a commit if it is the next one in log order.
         
-        if kind == "get":
-            return self.datastore.get(key)
-        elif kind == "put":
-            value = command.get("value", "")
-            return self.datastore.put(key, value)
-        elif kind == "cas":
-            compare_value = command.get("compare_value", "")
-            new_value = command.get("value", "")
-            return self.datastore.cas(key, compare_value, new_value)
-        else:
-            raise ValueError(f"Unknown command kind: {kind}")
+        Expects self._cond to be held. Returns True if the commit was applied.
+        """
+        index = commit["index"]
+        if index != self.last_applied_index + 1:
+            return False
+        outcome = (self._apply_command(commit["command"]), commit["command"])
+        self.last_applied_index = index
+        self._recent[index] = outcome
+        if len(self._recent) > self._recent_limit:
+            self._recent.popitem(last=False)
+        self._cond.notify_all()
+        return True
+    
+    def _streaming(self) -> bool:
+        """Whether operations are served by the background applier."""
+        return self.stream_commits and self._stream_supported and not self._closed
+    
+    def _ensure_applier(self):
+        with self._cond:
+            if self._applier is None or not self._applier.is_alive():
+                self._applier = threading.Thread(target=KVStore._run_applier, args=(weakref.ref(self),),
+                                                 name="kvstore-applier", daemon=True)
+                self._applier.start()
+    
+    @staticmethod
+    def _run_applier(store_ref: "weakref.ReferenceType[KVStore]"):
+        """
+        Follow the commit stream and apply entries as they arrive.
+        
+        The thread only holds the store while it handles a line, so a store
+        that is dropped without close() can still be collected; the stream's
+        idle timeout then wakes the thread up to exit.
+        """
+        backoff = 0.05
+        while True:
+            store = store_ref()
+            if store is None or store._closed:
+                return
+            response = None
+            try:
+                response = store._open_stream()
+                if response is None:
+                    return
+                backoff = 0.05
+                store = None
+                
+                for line in response.iter_lines():
+                    store = store_ref()
+                    if store is None:
+                        return
+                    if line:  # empty lines are keep-alives
+                        store._apply_streamed(json.loads(line))
+                    store = None
+            except Exception as e:
+                store = store_ref()
+                if store is None or store._closed:
+                    return
+                with store._cond:
+                    store.last_error = e
+                    store._cond.notify_all()
+                store = None
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 1.0)
+            finally:
+                if response is not None:
+                    response.close()
+    
+    def _open_stream(self) -> Optional[requests.Response]:
+        """
+        Open the commit stream on the cached leader.
+        
+        Returns None if the bridge has no stream endpoint, in which case
+        operations fall back to polling.
+        """
+        # Reconnect to the current leader after a failover.
+        url = f"{self.bridge_url}/commits_stream"
+        with self._cond:
+            since_index = self.last_applied_index
+        response = self._stream_transport.get(url, params={"since_index": since_index}, stream=True,
+                                              timeout=(5, self.stream_idle_timeout_ms / 1000))
+        if response.status_code == 404:
+            # Older bridge without a stream endpoint: fall back to polling.
+            response.close()
+            with self._cond:
+                self._stream_supported = False
+                self._cond.notify_all()
+            return None
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
+        self._stream_response = response
+        return response
+    
+    def _apply_streamed(self, commit: dict):
+        """Apply a commit received from the stream."""
+        with self._cond:
+            if commit["index"] > self.last_applied_index + 1:
+                raise CommitFailedError(
+                    f"Gap in commit stream: got index {commit['index']} "
+                    f"after {self.last_applied_index}")
+            self._apply_commit(commit)
+            self.last_error = None
+    
+    def _wait_until_applied(self, log_index: int) -> bool:
+        """
+        Wait for the applier to apply entries through log_index.
+        
+        Returns False if the bridge turned out not to support streaming, in
+        which case the caller has to poll instead.
+        """
+        self._ensure_applier()
+        deadline = time.monotonic() + self.timeout_ms / 1000
+        with self._cond:
+            while self.last_applied_index < log_index:
+                if not self._stream_supported:
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    detail = f" (last error: {self.last_error})" if self.last_error else ""
+                    raise CommitFailedError(f"Timed out waiting for log index {log_index} to be applied{detail}")
+                self._cond.wait(remaining)
+        return True
+    
+    def _wait_applied(self, log_index: int) -> Tuple[Tuple[Optional[str], bool], dict]:
+        """Wait for the applier to reach log_index; return its (result, command)."""
+        if not self._wait_until_applied(log_index):
+            self._wait_for_commit(log_index)
+            self._apply_through(log_index)
+        with self._cond:
+            if log_index in self._recent:
+                return self._recent[log_index]
+        raise CommitFailedError(f"Result for log index {log_index} is no longer available")
+    
+    def _execute(self, kind: str, key: str, value: str = "", compare_value: str = "") -> Tuple[Tuple[Optional[str], bool], dict]:
+        """Commit a single command and return its (result, command)."""
+        if self._streaming():
+            log_index = self._submit_command(kind, key, value, compare_value)
+            return self._wait_applied(log_index)
+        
+        # Sync any missing commits first
+        self._sync_commits()
+        
+        commit_data = self._commit_command(kind, key, value, compare_value)
+        log_index = commit_data["index"]
+        with self._cond:
+            # Apply in log order: other threads may have applied this entry
+            # already, or not yet the ones before it.
+            self._apply_commit(commit_data)
+        if self.last_applied_index < log_index:
+            self._apply_through(log_index)
+        with self._cond:
+            if log_index in self._recent:
+                return self._recent[log_index]
+        raise CommitFailedError(f"Result for log index {log_index} is no longer available")
     
     def _sync_commits(self):
         """Sync all commits since last_applied_index to ensure consistency."""
         try:
             url = f"{self.bridge_url}/get_commits_since"
             params = {"since_index": self.last_applied_index}
-            response = requests.get(url, params=params, timeout=5)
+            response = self.transport.get(url, params=params, timeout=5)
             response.raise_for_status()
             data = response.json()
             
@@ -99,11 +386,9 @@ class KVStore:
             # Sort commits by index to ensure we apply them in order
             commits.sort(key=lambda c: c["index"])
             
-            for commit in commits:
-                # Apply the command
-                self._apply_command(commit["command"])
-                # Update last applied index
-                self.last_applied_index = max(self.last_applied_index, commit["index"])
+            with self._cond:
+                for commit in commits:
+                    self._apply_commit(commit)
         except requests.exceptions.HTTPError as e:
             # If 404, it means no commits found (which is OK if last_applied_index is up to date)
             if e.response.status_code == 404:
@@ -115,29 +400,321 @@ class KVStore:
             # If sync fails, continue - we'll try again on next operation
             pass
     
-    def get(self, key: str) -> Tuple[Optional[str], bool]:
+    def _apply_through(self, last_index: int):
         """
-        Get a value by key.
+        Apply commits in order until last_index is applied.
+        
+        Other threads may apply some of them first; look results up in
+        self._recent.
+        """
+        url = f"{self.bridge_url}/get_commits_since"
+        while self.last_applied_index < last_index:
+            response = self.transport.get(url, params={"since_index": self.last_applied_index}, timeout=5)
+            response.raise_for_status()
+            commits = sorted(response.json().get("commits", []), key=lambda c: c["index"])
+            progressed = False
+            with self._cond:
+                for commit in commits:
+                    if self._apply_commit(commit):
+                        progressed = True
+            if not progressed and self.last_applied_index < last_index:
+                raise CommitFailedError(f"Bridge returned no commits after index {self.last_applied_index}")
+    
+    def _execute_batch(self, commands: List[dict]) -> List[Tuple[Tuple[Optional[str], bool], dict]]:
+        """
+        Submit commands in batches and apply them.
+        
+        Results are collected from self._recent, so a round of batches may
+        take up at most half of it; the rest leaves room for entries other
+        operations commit in the meantime.
+        """
+        round_size = max(1, self._recent_limit // 2)
+        results = []
+        for start in range(0, len(commands), round_size):
+            try:
+                results.extend(self._execute_round(commands[start:start + round_size]))
+            except NotLeaderError as e:
+                if not results or e.maybe_committed:
+                    raise
+                # The earlier rounds are committed; retrying the whole batch
+                # would submit them again.
+                raise NotLeaderError(str(e), e.leader_id, maybe_committed=True) from e
+        return results
+    
+    def _execute_round(self, commands: List[dict]) -> List[Tuple[Tuple[Optional[str], bool], dict]]:
+        """Submit commands in batches, wait once for the last one and apply them."""
+        if not commands:
+            return []
+        streaming = self._streaming()
+        if not streaming:
+            self._sync_commits()
+        
+        indices = []
+        for start in range(0, len(commands), self.batch_size):
+            chunk = commands[start:start + self.batch_size]
+            try:
+                first_index = self._submit_batch(chunk)
+            except NotLeaderError as e:
+                if not indices:
+                    raise
+                # The earlier chunks were accepted and may still commit.
+                raise NotLeaderError(str(e), e.leader_id, maybe_committed=True) from e
+            indices.extend(range(first_index, first_index + len(chunk)))
+        
+        if streaming:
+            self._wait_applied(indices[-1])
+        else:
+            self._wait_for_commit(indices[-1])
+            self._apply_through(indices[-1])
+        with self._cond:
+            results = {index: self._recent[index] for index in indices if index in self._recent}
+        for index in indices:
+            if index not in results:
+                raise CommitFailedError(f"Log index {index} was applied before this batch was submitted")
+            if results[index][1].get("id") != self.server_id:
+                raise CommitFailedError("Command was committed but not ours (lost leadership)")
+        return [results[index] for index in indices]
+    
+    def _find_leader(self, hint: Optional[int]) -> bool:
+        """
+        Point bridge_url at the leader, using the hint if there is one.
+        
+        Returns True if the cached leader changed.
+        """
+        if hint is None or not 0 <= hint < len(self.node_urls):
+            hint = None
+            for server_id, url in enumerate(self.node_urls):
+                try:
+                    response = self.transport.get(f"{url}/is_leader", timeout=1)
+                    if response.status_code == 200 and response.json().get("is_leader"):
+                        hint = server_id
+                        break
+                except requests.RequestException:
+                    continue
+        if hint is None or self.node_urls[hint] == self.bridge_url:
+            return False
+        self.bridge_url = self.node_urls[hint]
+        # The applier may be following a node that no longer makes progress.
+        self._interrupt_stream()
+        return True
+    
+    def _with_leader(self, operation: Callable[[], T], idempotent: bool) -> T:
+        """
+        Run operation against the leader, following leader changes.
+        
+        With a single node URL errors propagate unchanged. Otherwise a
+        NotLeaderError or connection error moves to the new leader and the
+        operation is retried with backoff for up to failover_timeout_ms.
+        Failures after which the command may still commit are only retried
+        when the operation is idempotent.
+        """
+        if len(self.node_urls) == 1:
+            return operation()
+        deadline = time.monotonic() + self.failover_timeout_ms / 1000
+        backoff = 0.01
+        while True:
+            try:
+                return operation()
+            except NotLeaderError as e:
+                if e.maybe_committed and not idempotent:
+                    raise
+                error, hint = e, e.leader_id
+            except requests.ConnectionError as e:
+                if not idempotent:
+                    raise
+                error, hint = e, None
+            if time.monotonic() >= deadline:
+                raise error
+            if not self._find_leader(hint):
+                # No leader yet (election in progress): back off and probe again.
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 0.2)
+    
+    def get_many(self, keys: Iterable[str]) -> List[Tuple[Optional[str], bool]]:
+        """
+        Get several keys with one batched submission.
         
         Returns:
-            Tuple of (value, found) where found is True if key exists.
+            List of (value, found) tuples in the same order as keys.
             
         Raises:
             NotLeaderError: If this server is not the leader
-            requests.RequestException: On network errors
+            CommitFailedError: If a command was lost (e.g., leadership changed)
         """
-        # Sync any missing commits first
-        self._sync_commits()
+        commands = [{"kind": "get", "key": key} for key in keys]
+        return [result for result, _ in self._with_leader(lambda: self._execute_batch(commands), idempotent=True)]
+    
+    def put_many(self, items) -> List[Tuple[Optional[str], bool]]:
+        """
+        Put several key-value pairs with one batched submission.
+        
+        Args:
+            items: A mapping or an iterable of (key, value) pairs
+        
+        Returns:
+            List of (previous_value, was_found) tuples in the order of items.
+            
+        Raises:
+            NotLeaderError: If this server is not the leader
+            CommitFailedError: If a command was lost (e.g., leadership changed)
+        """
+        if hasattr(items, "items"):
+            items = items.items()
+        commands = [{"kind": "put", "key": key, "value": value} for key, value in items]
+        return [result for result, _ in self._with_leader(lambda: self._execute_batch(commands), idempotent=True)]
+    
+    def cas_many(self, items: Iterable[Tuple[str, str, str]]) -> List[Tuple[Optional[str], bool]]:
+        """
+        Compare-and-swap several keys with one batched submission.
+        
+        Args:
+            items: Iterable of (key, compare_value, new_value) triples
         
-        log_index = self._submit_command("get", key)
-        commit_data = self._wait_for_commit(log_index)
+        Returns:
+            List of (old_value, was_found) tuples in the order of items.
+            
+        Raises:
+            NotLeaderError: If this server is not the leader
+            CommitFailedError: If a command was lost (e.g., leadership changed)
+        """
+        commands = [
+            {"kind": "cas", "key": key, "compare_value": compare_value, "value": new_value}
+            for key, compare_value, new_value in items
+        ]
+        return [result for result, _ in self._with_leader(lambda: self._execute_batch(commands), idempotent=False)]
+    
+    def _read_index(self) -> int:
+        """Ask the leader for a ReadIndex; returns -1 if it can't serve one yet."""
+        url = f"{self.bridge_url}/read_index"
+        response = self.transport.post(url, timeout=5)
+        response.raise_for_status()
+        data = response.json()
         
-        # Update last applied index
-        self.last_applied_index = max(self.last_applied_index, commit_data["index"])
+        if not data.get("is_leader"):
+            raise NotLeaderError("This server is not the Raft leader", data.get("leader_id"))
         
-        # Apply to local store
-        value, found = self._apply_command(commit_data["command"])
-        return value, found
+        return data["read_index"]
+    
+    def _read_linearizable(self, key: str) -> Tuple[Optional[str], bool]:
+        """Serve a read from local state once it has caught up to a ReadIndex."""
+        read_index = self._read_index()
+        if read_index < 0:
+            # The leader hasn't committed an entry in its term yet; reading
+            # through the log commits one, so later reads take the fast path.
+            result, _ = self._execute("get", key)
+            return result
+        
+        if not (self._streaming() and self._wait_until_applied(read_index)):
+            self._apply_through(read_index)
+        with self._cond:
+            return self.datastore.get(key)
+    
+    def _read_lease(self, key: str) -> Tuple[Optional[str], bool]:
+        """Serve a read under the leader's lease, falling back to ReadIndex."""
+        url = f"{self.bridge_url}/lease_read"
+        response = self.transport.post(url, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data.get("is_leader"):
+            raise NotLeaderError("This server is not the Raft leader", data.get("leader_id"))
+        
+        read_index = data["read_index"]
+        if read_index < 0:
+            self.lease_misses += 1
+            return self._read_linearizable(key)
+        
+        self.lease_hits += 1
+        if not (self._streaming() and self._wait_until_applied(read_index)):
+            self._apply_through(read_index)
+        with self._cond:
+            return self.datastore.get(key)
+    
+    def _read_state(self) -> dict:
+        """Ask this node how fresh its committed state is."""
+        url = f"{self.bridge_url}/read_state"
+        response = self.transport.post(url, timeout=5)
+        response.raise_for_status()
+        return response.json()
+    
+    def _read_bounded(self, key: str, max_entries: Optional[int], max_ms: Optional[float]) -> Tuple[Optional[str], bool]:
+        """
+        Serve a read from this node's applied state if it is within the bounds.
+        
+        The read reflects at least every entry the leader had committed when
+        this node last heard from it, minus max_entries. If the node is
+        further behind, or hasn't heard from the leader within max_ms, it is
+        given follower_wait_ms to catch up before StaleReadError is raised.
+        """
+        if max_entries is None and max_ms is None:
+            raise ValueError("Bounded reads need max_staleness_entries or max_staleness_ms")
+        deadline = time.monotonic() + self.follower_wait_ms / 1000
+        while True:
+            state = self._read_state()
+            target = state["commit_index"]
+            fresh = True
+            if not state.get("is_leader"):
+                if max_ms is not None and state["since_leader_contact_ms"] > max_ms:
+                    fresh = False
+                target = state["leader_commit"] - (max_entries or 0)
+                if target > state["commit_index"]:
+                    fresh = False
+            if fresh:
+                break
+            if time.monotonic() >= deadline:
+                raise StaleReadError(
+                    f"Node state exceeds staleness bounds (commit index {state['commit_index']}, "
+                    f"leader commit {state['leader_commit']}, "
+                    f"{state['since_leader_contact_ms']:.0f} ms since leader contact)")
+            time.sleep(0.005)
+        
+        if target >= 0 and not (self._streaming() and self._wait_until_applied(target)):
+            self._apply_through(target)
+        with self._cond:
+            return self.datastore.get(key)
+    
+    def lease_stats(self) -> dict:
+        """Return this client's lease read hit and miss counts."""
+        return {"hits": self.lease_hits, "misses": self.lease_misses}
+    
+    def get(self, key: str, consistency: str = "log",
+            max_staleness_entries: Optional[int] = None,
+            max_staleness_ms: Optional[float] = None) -> Tuple[Optional[str], bool]:
+        """
+        Get a value by key.
+        
+        Args:
+            key: Key to read
+            consistency: "log" submits the read through the Raft log;
+                "linearizable" uses the leader's ReadIndex and serves the read
+                from local state without appending to the log;
+                "lease" skips the ReadIndex heartbeat round while the leader
+                holds a valid lease (requires a bridge with leases enabled);
+                "bounded" serves the read from this node's applied state,
+                which may be a follower's, within the staleness bounds below
+            max_staleness_entries: For "bounded" reads, how many entries the
+                read may lag behind the leader's commit index
+            max_staleness_ms: For "bounded" reads, how long ago the node may
+                have last heard from the leader
+        
+        Returns:
+            Tuple of (value, found) where found is True if key exists.
+            
+        Raises:
+            NotLeaderError: If this server is not the leader
+            StaleReadError: If a "bounded" read can't be served within bounds
+            requests.RequestException: On network errors
+        """
+        if consistency == "linearizable":
+            return self._with_leader(lambda: self._read_linearizable(key), idempotent=True)
+        if consistency == "lease":
+            return self._with_leader(lambda: self._read_lease(key), idempotent=True)
+        if consistency == "bounded":
+            return self._read_bounded(key, max_staleness_entries, max_staleness_ms)
+        if consistency != "log":
+            raise ValueError(f"Unknown consistency mode: {consistency}")
+        result, _ = self._with_leader(lambda: self._execute("get", key), idempotent=True)
+        return result
     
     def put(self, key: str, value: str) -> Tuple[Optional[str], bool]:
         """
@@ -151,18 +728,8 @@ class KVStore:
             NotLeaderError: If this server is not the leader
             requests.RequestException: On network errors
         """
-        # Sync any missing commits first
-        self._sync_commits()
-        
-        log_index = self._submit_command("put", key, value)
-        commit_data = self._wait_for_commit(log_index)
-        
-        # Update last applied index
-        self.last_applied_index = max(self.last_applied_index, commit_data["index"])
-        
-        # Apply to local store
-        prev_value, was_found = self._apply_command(commit_data["command"])
-        return prev_value, was_found
+        result, _ = self._with_leader(lambda: self._execute("put", key, value), idempotent=True)
+        return result
     
     def cas(self, key: str, compare_value: str, new_value: str) -> Tuple[Optional[str], bool]:
         """
@@ -179,28 +746,111 @@ class KVStore:
             NotLeaderError: If this server is not the leader
             requests.RequestException: On network errors
         """
-        log_index = self._submit_command("cas", key, new_value, compare_value)
-        commit_data = self._wait_for_commit(log_index)
+        result, command = self._with_leader(lambda: self._execute("cas", key, new_value, compare_value),
+                                            idempotent=False)
         
         # Verify this is our command
-        if commit_data["command"]["id"] != self.server_id:
+        if command["id"] != self.server_id:
             raise CommitFailedError("Command was committed but not ours (lost leadership)")
         
-        # Apply to local store
-        old_value, was_found = self._apply_command(commit_data["command"])
-        return old_value, was_found
+        return result
+    
+    def transfer_leadership(self, target_id: int) -> bool:
+        """
+        Hand the leadership over to server target_id, e.g. before restarting
+        the leader's bridge for maintenance.
+        
+        The leader stops accepting writes, brings the target's log up to date
+        and makes it start an election at once, so writes stall for a few
+        milliseconds instead of a full election timeout. With several node
+        URLs the store then follows the new leader.
+        
+        Returns:
+            True if the leadership moved, False if the target didn't take
+            over in time (the leader then accepts writes again).
+            
+        Raises:
+            NotLeaderError: If this server is not the leader
+            requests.RequestException: On network errors
+        """
+        def transfer() -> bool:
+            url = f"{self.bridge_url}/transfer_leadership"
+            response = self.transport.post(url, json={"target_id": target_id}, timeout=5)
+            response.raise_for_status()
+            data = response.json()
+            if not data.get("transferred") and not data.get("is_leader"):
+                raise NotLeaderError("This server is not the Raft leader", data.get("leader_id"))
+            return data["transferred"]
+        
+        transferred = self._with_leader(transfer, idempotent=False)
+        if transferred and len(self.node_urls) > 1:
+            self._find_leader(target_id)
+        return transferred
+    
+    def learner_progress(self) -> Dict[int, dict]:
+        """
+        Report how far each non-voting learner node lags behind the leader.
+        
+        Returns:
+            A dict mapping each learner's server id to its "match_index"
+            (last entry the leader knows it stores), "entries_behind"
+            (committed entries it is missing) and "since_contact_ms".
+            
+        Raises:
+            NotLeaderError: If this server is not the leader
+            requests.RequestException: On network errors
+        """
+        def progress() -> Dict[int, dict]:
+            url = f"{self.bridge_url}/learner_progress"
+            response = self.transport.get(url, timeout=5)
+            response.raise_for_status()
+            data = response.json()
+            if not data.get("is_leader"):
+                raise NotLeaderError("This server is not the Raft leader", data.get("leader_id"))
+            return {int(server_id): p for server_id, p in data["learners"].items()}
+        
+        return self._with_leader(progress, idempotent=True)
     
     def is_leader(self) -> bool:
         """Check if this server is the Raft leader."""
         url = f"{self.bridge_url}/is_leader"
-        response = requests.get(url, timeout=5)
+        response = self.transport.get(url, timeout=5)
         response.raise_for_status()
         return response.json()["is_leader"]
+    
+    def _interrupt_stream(self):
+        """Make the applier drop its current stream connection."""
+        response = self._stream_response
+        if response is not None:
+            # Closing the response would block on the reader's buffer lock;
+            # shutting the socket down wakes the applier out of its read.
+            sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+    
+    def close(self):
+        """Stop the background applier and close its stream connection."""
+        self._closed = True
+        self._interrupt_stream()
+        if self._applier is not None and self._applier is not threading.current_thread():
+            self._applier.join(timeout=1)
+        self._finalizer()
 
 
 class NotLeaderError(Exception):
-    """Raised when an operation is attempted on a non-leader server."""
-    pass
+    """Raised when an operation is attempted on a non-leader server.
+    
+    leader_id is the server ID the node reported as leader, if any, and
+    maybe_committed is True if the command may still have been committed.
+    """
+    
+    def __init__(self, message: str, leader_id: Optional[int] = None, maybe_committed: bool = False):
+        super().__init__(message)
+        self.leader_id = leader_id
+        self.maybe_committed = maybe_committed
 
 
 class CommitFailedError(Exception):
@@ -208,3 +858,8 @@ class CommitFailedError(Exception):
     pass
 
 
+class StaleReadError(Exception):
+    """Raised when a node's state is too stale to serve a bounded read."""
+    pass
+
+
@@ -0,0 +1,99 @@
+"""Pooled keep-alive HTTP transport shared by the KV store clients."""
+
+import socket
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+
+# Default pool sizing: enough keep-alive connections per bridge for a few
+# dozen client threads without reconnecting.
+DEFAULT_POOL_CONNECTIONS = 8
+DEFAULT_POOL_MAXSIZE = 64
+
+
+class _TunedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies socket options to every pooled connection."""
+
+    def __init__(self, socket_options, **kwargs):
+        self._socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = self._socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+class HTTPTransport:
+    """HTTP transport with per-host connection pools and keep-alive.
+
+    A single transport can be shared by any number of KVStore/KVClient
+    instances and threads; connections to each bridge are reused instead of
+    being opened for every request.
+    """
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 tcp_nodelay: bool = True,
+                 tcp_keepalive: bool = True):
+        """
+        Initialize the transport.
+
+        Args:
+            pool_connections: Number of per-host pools to keep (one per bridge URL)
+            pool_maxsize: Maximum number of keep-alive connections kept per host
+            tcp_nodelay: Disable Nagle's algorithm on pooled sockets
+            tcp_keepalive: Enable SO_KEEPALIVE on pooled sockets
+        """
+        nodelay = (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        socket_options = [opt for opt in HTTPConnection.default_socket_options if opt != nodelay]
+        if tcp_nodelay:
+            socket_options.append(nodelay)
+        if tcp_keepalive:
+            socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+
+        adapter = _TunedHTTPAdapter(
+            socket_options,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            # Don't block when every pooled connection is busy: requests
+            # have no pool timeout, so a long-lived request holding its
+            # connection (e.g. a commit stream) could stall other callers
+            # forever. Overflow requests get a connection that is closed
+            # after use instead of being kept alive.
+            pool_block=False,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Send a GET request over a pooled connection."""
+        return self.session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request over a pooled connection."""
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+
+_default_transport: Optional[HTTPTransport] = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> HTTPTransport:
+    """Return the process-wide transport, creating it on first use."""
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = HTTPTransport()
+        return _default_transport
@@ -0,0 +1,474 @@
+// Binary codec for the RPCs between Raft peers.
+package raft
+
+import (
+	"bufio"
+	"bytes"
+	"encoding/binary"
+	"encoding/gob"
+	"errors"
+	"fmt"
+	"io"
+	"net"
+	"net/rpc"
+	"time"
+)
+
+// peerDialTimeout bounds how long connecting to a peer may take.
+const peerDialTimeout = time.Second
+
+// maxFrameBytes bounds the size of a frame a codec accepts, so that a corrupt
+// length doesn't make it allocate without limit.
+const maxFrameBytes = 1 << 30
+
+// errFrameTruncated is returned when a frame ends before the message it
+// carries does.
+var errFrameTruncated = errors.New("raft codec: truncated frame")
+
+// peerCodec implements rpc.ClientCodec and rpc.ServerCodec for the Raft RPCs,
+// so that Servers don't go through gob's reflection for every message. Each
+// message is one frame: a 4-byte big-endian length, followed by the request
+// or response header and the body. Integers are varints, and the argument and
+// reply types of the Raft RPCs are encoded field by field. Log entries carry
+// their Payload as is; other commands are gob-encoded, once per frame.
+//
+// Like with gob, a net/rpc Client multiplexes concurrent calls over the
+// codec's connection, matching responses to requests by sequence number.
+// Writes are serialized by net/rpc, and reads happen in one goroutine, so the
+// codec reuses its frame buffers; decoded values never alias them.
+type peerCodec struct {
+	conn io.ReadWriteCloser
+	r    *bufio.Reader
+
+	wbuf []byte
+
+	// rbuf holds the last frame read, and dec decodes it.
+	rbuf []byte
+	dec  wireDecoder
+}
+
+func newPeerCodec(conn io.ReadWriteCloser) *peerCodec {
+	return &peerCodec{
+		conn: conn,
+		r:    bufio.NewReader(conn),
+	}
+}
+
+// dialPeer connects to the peer listening at addr.
+func dialPeer(addr net.Addr) (*rpc.Client, error) {
+	conn, err := net.DialTimeout(addr.Network(), addr.String(), peerDialTimeout)
+	if err != nil {
+		return nil, err
+	}
+	return rpc.NewClientWithCodec(newPeerCodec(conn)), nil
+}
+
+func (c *peerCodec) WriteRequest(r *rpc.Request, body any) error {
+	buf := c.startFrame()
+	buf = appendString(buf, r.ServiceMethod)
+	buf = binary.AppendUvarint(buf, r.Seq)
+	buf, err := appendBody(buf, body)
+	if err != nil {
+		return err
+	}
+	return c.writeFrame(buf)
+}
+
+func (c *peerCodec) WriteResponse(r *rpc.Response, body any) error {
+	// The client matches responses by Seq alone, so they don't carry the
+	// method.
+	buf := c.startFrame()
+	buf = binary.AppendUvarint(buf, r.Seq)
+	buf = appendString(buf, r.Error)
+	// On errors, net/rpc passes a placeholder body the client won't read.
+	if r.Error == "" {
+		var err error
+		if buf, err = appendBody(buf, body); err != nil {
+			return err
+		}
+	}
+	return c.writeFrame(buf)
+}
+
+func (c *peerCodec) ReadRequestHeader(r *rpc.Request) error {
+	if err := c.readFrame(); err != nil {
+		return err
+	}
+	r.ServiceMethod = c.dec.string()
+	r.Seq = c.dec.uvarint()
+	return c.dec.err
+}
+
+func (c *peerCodec) ReadRequestBody(body any) error {
+	return c.readBody(body)
+}
+
+func (c *peerCodec) ReadResponseHeader(r *rpc.Response) error {
+	if err := c.readFrame(); err != nil {
+		return err
+	}
+	r.Seq = c.dec.uvarint()
+	r.Error = c.dec.string()
+	return c.dec.err
+}
+
+func (c *peerCodec) ReadResponseBody(body any) error {
+	return c.readBody(body)
+}
+
+func (c *peerCodec) Close() error {
+	return c.conn.Close()
+}
+
+// startFrame resets the write buffer, reserving space for the frame length.
+func (c *peerCodec) startFrame() []byte {
+	return append(c.wbuf[:0], 0, 0, 0, 0)
+}
+
+// writeFrame fills in the length of the frame in buf and writes it.
+func (c *peerCodec) writeFrame(buf []byte) error {
+	binary.BigEndian.PutUint32(buf, uint32(len(buf)-4))
+	c.wbuf = buf
+	_, err := c.conn.Write(buf)
+	return err
+}
+
+// readFrame reads the next frame into the read buffer and points the decoder
+// at it.
+func (c *peerCodec) readFrame() error {
+	var length [4]byte
+	if _, err := io.ReadFull(c.r, length[:]); err != nil {
+		return err
+	}
+	n := binary.BigEndian.Uint32(length[:])
+	if n > maxFrameBytes {
+		return fmt.Errorf("raft codec: frame of %d bytes", n)
+	}
+	if cap(c.rbuf) < int(n) {
+		c.rbuf = make([]byte, n)
+	}
+	c.rbuf = c.rbuf[:n]
+	if _, err := io.ReadFull(c.r, c.rbuf); err != nil {
+		if err == io.EOF {
+			err = io.ErrUnexpectedEOF
+		}
+		return err
+	}
+	c.dec = wireDecoder{buf: c.rbuf}
+	return nil
+}
+
+// readBody decodes the body of the last frame read into body; a nil body
+// discards it.
+func (c *peerCodec) readBody(body any) error {
+	d := &c.dec
+	switch b := body.(type) {
+	case nil:
+		return nil
+	case *RequestVoteArgs:
+		b.Term = d.varint()
+		b.CandidateId = d.varint()
+		b.LastLogIndex = d.varint()
+		b.LastLogTerm = d.varint()
+		b.PreVote = d.bool()
+		b.LeadershipTransfer = d.bool()
+	case *RequestVoteReply:
+		b.Term = d.varint()
+		b.VoteGranted = d.bool()
+	case *AppendEntriesArgs:
+		b.Term = d.varint()
+		b.LeaderId = d.varint()
+		b.PrevLogIndex = d.varint()
+		b.PrevLogTerm = d.varint()
+		b.LeaderCommit = d.varint()
+		b.Entries = d.entries()
+	case *AppendEntriesReply:
+		b.Term = d.varint()
+		b.Success = d.bool()
+		b.ConflictIndex = d.varint()
+		b.ConflictTerm = d.varint()
+	case *InstallSnapshotArgs:
+		b.Term = d.varint()
+		b.LeaderId = d.varint()
+		b.LastIncludedIndex = d.varint()
+		b.LastIncludedTerm = d.varint()
+		b.Offset = d.varint()
+		b.Data = d.ownedBytes()
+		b.Done = d.bool()
+	case *InstallSnapshotReply:
+		b.Term = d.varint()
+	case *TimeoutNowArgs:
+		b.Term = d.varint()
+		b.LeaderId = d.varint()
+	case *TimeoutNowReply:
+		b.Term = d.varint()
+	default:
+		return fmt.Errorf("raft codec: can't decode %T", body)
+	}
+	return d.err
+}
+
+// appendBody appends the encoding of body, an argument or reply of a Raft RPC
+// or a pointer to one, to buf.
+func appendBody(buf []byte, body any) ([]byte, error) {
+	switch b := body.(type) {
+	case RequestVoteArgs:
+		return appendRequestVoteArgs(buf, &b), nil
+	case *RequestVoteArgs:
+		return appendRequestVoteArgs(buf, b), nil
+	case RequestVoteReply:
+		return appendRequestVoteReply(buf, &b), nil
+	case *RequestVoteReply:
+		return appendRequestVoteReply(buf, b), nil
+	case AppendEntriesArgs:
+		return appendAppendEntriesArgs(buf, &b)
+	case *AppendEntriesArgs:
+		return appendAppendEntriesArgs(buf, b)
+	case AppendEntriesReply:
+		return appendAppendEntriesReply(buf, &b), nil
+	case *AppendEntriesReply:
+		return appendAppendEntriesReply(buf, b), nil
+	case InstallSnapshotArgs:
+		return appendInstallSnapshotArgs(buf, &b), nil
+	case *InstallSnapshotArgs:
+		return appendInstallSnapshotArgs(buf, b), nil
+	case InstallSnapshotReply:
+		return binary.AppendVarint(buf, int64(b.Term)), nil
+	case *InstallSnapshotReply:
+		return binary.AppendVarint(buf, int64(b.Term)), nil
+	case TimeoutNowArgs:
+		return appendTimeoutNowArgs(buf, &b), nil
+	case *TimeoutNowArgs:
+		return appendTimeoutNowArgs(buf, b), nil
+	case TimeoutNowReply:
+		return binary.AppendVarint(buf, int64(b.Term)), nil
+	case *TimeoutNowReply:
+		return binary.AppendVarint(buf, int64(b.Term)), nil
+	default:
+		return buf, fmt.Errorf("raft codec: can't encode %T", body)
+	}
+}
+
+func appendRequestVoteArgs(buf []byte, args *RequestVoteArgs) []byte {
+	buf = binary.AppendVarint(buf, int64(args.Term))
+	buf = binary.AppendVarint(buf, int64(args.CandidateId))
+	buf = binary.AppendVarint(buf, int64(args.LastLogIndex))
+	buf = binary.AppendVarint(buf, int64(args.LastLogTerm))
+	buf = appendBool(buf, args.PreVote)
+	return appendBool(buf, args.LeadershipTransfer)
+}
+
+func appendRequestVoteReply(buf []byte, reply *RequestVoteReply) []byte {
+	buf = binary.AppendVarint(buf, int64(reply.Term))
+	return appendBool(buf, reply.VoteGranted)
+}
+
+func appendAppendEntriesArgs(buf []byte, args *AppendEntriesArgs) ([]byte, error) {
+	buf = binary.AppendVarint(buf, int64(args.Term))
+	buf = binary.AppendVarint(buf, int64(args.LeaderId))
+	buf = binary.AppendVarint(buf, int64(args.PrevLogIndex))
+	buf = binary.AppendVarint(buf, int64(args.PrevLogTerm))
+	buf = binary.AppendVarint(buf, int64(args.LeaderCommit))
+	return appendEntries(buf, args.Entries)
+}
+
+func appendAppendEntriesReply(buf []byte, reply *AppendEntriesReply) []byte {
+	buf = binary.AppendVarint(buf, int64(reply.Term))
+	buf = appendBool(buf, reply.Success)
+	buf = binary.AppendVarint(buf, int64(reply.ConflictIndex))
+	return binary.AppendVarint(buf, int64(reply.ConflictTerm))
+}
+
+func appendInstallSnapshotArgs(buf []byte, args *InstallSnapshotArgs) []byte {
+	buf = binary.AppendVarint(buf, int64(args.Term))
+	buf = binary.AppendVarint(buf, int64(args.LeaderId))
+	buf = binary.AppendVarint(buf, int64(args.LastIncludedIndex))
+	buf = binary.AppendVarint(buf, int64(args.LastIncludedTerm))
+	buf = binary.AppendVarint(buf, int64(args.Offset))
+	buf = appendBytes(buf, args.Data)
+	return appendBool(buf, args.Done)
+}
+
+func appendTimeoutNowArgs(buf []byte, args *TimeoutNowArgs) []byte {
+	buf = binary.AppendVarint(buf, int64(args.Term))
+	return binary.AppendVarint(buf, int64(args.LeaderId))
+}
+
+// Kinds of log entries in an encoded AppendEntriesArgs.
+const (
+	entryEmpty   = 0 // neither Command nor Payload
+	entryPayload = 1 // Payload follows
+	entryCommand = 2 // Command is the next value in the frame's gob stream
+)
+
+// appendEntries appends the count of entries, the gob stream of the commands
+// that have no payload, and then each entry's term, kind and payload.
+func appendEntries(buf []byte, entries []LogEntry) ([]byte, error) {
+	buf = binary.AppendUvarint(buf, uint64(len(entries)))
+	if len(entries) == 0 {
+		return buf, nil
+	}
+
+	var commands bytes.Buffer
+	var enc *gob.Encoder
+	for i := range entries {
+		if entries[i].Payload == nil && entries[i].Command != nil {
+			if enc == nil {
+				enc = gob.NewEncoder(&commands)
+			}
+			if err := enc.Encode(&entries[i].Command); err != nil {
+				return buf, err
+			}
+		}
+	}
+	buf = appendBytes(buf, commands.Bytes())
+
+	for i := range entries {
+		buf = binary.AppendVarint(buf, int64(entries[i].Term))
+		switch {
+		case entries[i].Payload != nil:
+			buf = append(buf, entryPayload)
+			buf = appendBytes(buf, entries[i].Payload)
+		case entries[i].Command != nil:
+			buf = append(buf, entryCommand)
+		default:
+			buf = append(buf, entryEmpty)
+		}
+	}
+	return buf, nil
+}
+
+func appendBool(buf []byte, b bool) []byte {
+	if b {
+		return append(buf, 1)
+	}
+	return append(buf, 0)
+}
+
+func appendBytes(buf []byte, b []byte) []byte {
+	buf = binary.AppendUvarint(buf, uint64(len(b)))
+	return append(buf, b...)
+}
+
+func appendString(buf []byte, s string) []byte {
+	buf = binary.AppendUvarint(buf, uint64(len(s)))
+	return append(buf, s...)
+}
+
+// wireDecoder reads values appended by the append functions above from buf.
+// The first error is kept in err, and all reads after it return zero values.
+type wireDecoder struct {
+	buf []byte
+	err error
+}
+
+func (d *wireDecoder) fail(err error) {
+	if d.err == nil {
+		d.err = err
+	}
+	d.buf = nil
+}
+
+func (d *wireDecoder) uvarint() uint64 {
+	v, n := binary.Uvarint(d.buf)
+	if n <= 0 {
+		d.fail(errFrameTruncated)
+		return 0
+	}
+	d.buf = d.buf[n:]
+	return v
+}
+
+func (d *wireDecoder) varint() int {
+	v, n := binary.Varint(d.buf)
+	if n <= 0 {
+		d.fail(errFrameTruncated)
+		return 0
+	}
+	d.buf = d.buf[n:]
+	return int(v)
+}
+
+func (d *wireDecoder) byte() byte {
+	if len(d.buf) == 0 {
+		d.fail(errFrameTruncated)
+		return 0
+	}
+	b := d.buf[0]
+	d.buf = d.buf[1:]
+	return b
+}
+
+func (d *wireDecoder) bool() bool {
+	return d.byte() != 0
+}
+
+// bytes returns the next byte slice, which aliases the frame.
+func (d *wireDecoder) bytes() []byte {
+	n := d.uvarint()
+	if n > uint64(len(d.buf)) {
+		d.fail(errFrameTruncated)
+		return nil
+	}
+	b := d.buf[:n:n]
+	d.buf = d.buf[n:]
+	return b
+}
+
+// ownedBytes returns a copy of the next byte slice, or nil if it's empty, as
+// gob would decode it.
+func (d *wireDecoder) ownedBytes() []byte {
+	if b := d.bytes(); len(b) > 0 {
+		return append([]byte(nil), b...)
+	}
+	return nil
+}
+
+func (d *wireDecoder) string() string {
+	return string(d.bytes())
+}
+
+// entries decodes the log entries appended by appendEntries. The payloads
+// share a single copy of the rest of the frame.
+func (d *wireDecoder) entries() []LogEntry {
+	n := d.uvarint()
+	if n == 0 || d.err != nil {
+		return nil
+	}
+	// Every entry takes at least two bytes.
+	if n > uint64(len(d.buf)) {
+		d.fail(errFrameTruncated)
+		return nil
+	}
+
+	var dec *gob.Decoder
+	if commands := d.bytes(); len(commands) > 0 {
+		dec = gob.NewDecoder(bytes.NewReader(commands))
+	}
+	d.buf = append([]byte(nil), d.buf...)
+
+	entries := make([]LogEntry, n)
+	for i := range entries {
+		entries[i].Term = d.varint()
+		switch kind := d.byte(); kind {
+		case entryEmpty:
+		case entryPayload:
+			if p := d.bytes(); len(p) > 0 {
+				entries[i].Payload = p
+			}
+		case entryCommand:
+			if dec == nil {
+				d.fail(errFrameTruncated)
+				return nil
+			}
+			if err := dec.Decode(&entries[i].Command); err != nil {
+				d.fail(err)
+				return nil
+			}
+		default:
+			d.fail(fmt.Errorf("raft codec: unknown entry kind %d", kind))
+			return nil
+		}
+	}
+	return entries
+}
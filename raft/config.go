@@ -0,0 +1,218 @@
+// Tunable parameters of a Consensus Module.
+package raft
+
+import (
+	"fmt"
+	"sort"
+	"strings"
+	"time"
+)
+
+// defaultHeartbeatInterval and defaultElectionTimeout are the leader's
+// heartbeat interval and the minimal election timeout used when
+// Config.HeartbeatInterval and Config.ElectionTimeout are zero.
+const (
+	defaultHeartbeatInterval = 10 * time.Millisecond
+	defaultElectionTimeout   = 150 * time.Millisecond
+)
+
+// timingProfiles are the heartbeat intervals and minimal election timeouts
+// selected by Config.WithTimingProfile.
+var timingProfiles = map[string]struct{ heartbeat, election time.Duration }{
+	// Servers on one host or in one rack; the defaults.
+	"default": {defaultHeartbeatInterval, defaultElectionTimeout},
+	// A fast local network: fewer heartbeats for a slightly slower failover.
+	"lan": {50 * time.Millisecond, 500 * time.Millisecond},
+	// Servers in different regions.
+	"wan": {200 * time.Millisecond, 2 * time.Second},
+}
+
+// Parameters of Config.AdaptiveTiming. Percentiles are taken over the latest
+// latencyWindowSize samples, and adaptive election timeouts are capped at
+// adaptiveMaxElectionScale times Config.ElectionTimeout.
+const (
+	latencyWindowSize             = 64
+	adaptivePercentile            = 0.99
+	adaptiveHeartbeatsPerElection = 4
+	adaptiveElectionRTTs          = 4
+	adaptiveElectionGaps          = 5
+	adaptiveMaxElectionScale      = 10
+)
+
+// leaseClockDriftBound bounds the relative drift between the clocks of any
+// two servers. Leases have to expire this much earlier than the minimal
+// election timeout to remain safe.
+const leaseClockDriftBound = 0.1
+
+// defaultSnapshotChunkBytes is the InstallSnapshot chunk size used when
+// Config.SnapshotChunkBytes is zero.
+const defaultSnapshotChunkBytes = 64 << 10
+
+// defaultMaxInflightAppends is the replication pipeline depth used when
+// Config.MaxInflightAppends is zero.
+const defaultMaxInflightAppends = 4
+
+// defaultMaxAppendEntries and defaultMaxAppendBytes limit AppendEntries
+// batches when Config.MaxAppendEntries and Config.MaxAppendBytes are zero.
+const (
+	defaultMaxAppendEntries = 1024
+	defaultMaxAppendBytes   = 1 << 20
+)
+
+// Config holds the tunable parameters of a ConsensusModule. Start from
+// DefaultConfig and override the fields of interest.
+type Config struct {
+	// LeaseDuration enables leader lease reads when positive. Every time a
+	// majority acknowledges AppendEntries sent at time t, the leader's lease
+	// is extended to t+LeaseDuration, and LeaseRead can serve reads without a
+	// network round trip while the lease holds. Followers then also refuse
+	// to vote while they've heard from a leader within the minimal election
+	// timeout, so no other leader can be elected during a lease.
+	// It must be shorter than the minimal election timeout, reduced by the
+	// clock drift bound. The same value should be used by all servers.
+	LeaseDuration time.Duration
+
+	// SnapshotChunkBytes is the size of the chunks in which a leader sends
+	// its snapshot to followers in InstallSnapshot RPCs; zero means
+	// defaultSnapshotChunkBytes.
+	SnapshotChunkBytes int
+
+	// MaxInflightAppends is how many AppendEntries RPCs a leader keeps in
+	// flight to a follower whose log matches its own, each carrying the
+	// entries appended since the previous one was sent; zero means
+	// defaultMaxInflightAppends. With 1, a leader waits for every reply
+	// before sending more entries.
+	MaxInflightAppends int
+
+	// MaxAppendEntries and MaxAppendBytes limit the entries a leader sends in
+	// one AppendEntries RPC, by count and by approximate encoded size; zero
+	// means defaultMaxAppendEntries and defaultMaxAppendBytes. An entry
+	// larger than MaxAppendBytes is sent on its own. A follower further
+	// behind catches up over successive RPCs.
+	MaxAppendEntries int
+	MaxAppendBytes   int
+
+	// CatchUpBytesPerSecond, when positive, throttles the entries sent to a
+	// follower that is catching up (one that is missing more entries than
+	// fit in an AppendEntries) to about this many bytes per second, so that
+	// a lagging follower doesn't take the leader's bandwidth from live
+	// replication. The throttled follower still gets heartbeats.
+	CatchUpBytesPerSecond int
+
+	// HeartbeatInterval is how often a leader sends AppendEntries to its
+	// followers when it has nothing else to send them; zero means
+	// defaultHeartbeatInterval.
+	HeartbeatInterval time.Duration
+
+	// ElectionTimeout is the minimal election timeout: a follower that hasn't
+	// heard from a leader for a random duration between ElectionTimeout and
+	// twice that starts an election. Zero means defaultElectionTimeout. It
+	// must be longer than HeartbeatInterval, and the same value should be
+	// used by all servers.
+	ElectionTimeout time.Duration
+
+	// AdaptiveTiming lengthens the heartbeat interval and election timeouts to
+	// fit the round trip times (RTT) a CM observes. A leader then sends
+	// heartbeats no more often than the 99th percentile RTT of AppendEntries
+	// to its slowest peer, so that a slow link doesn't queue them up, but at
+	// least four times per ElectionTimeout. A server's election timeout is at
+	// least four times the 99th percentile RTT to its peers and five times the
+	// 99th percentile interval between the AppendEntries it receives from its
+	// leader, so that a slow or jittery network doesn't cause false
+	// elections. HeartbeatInterval and ElectionTimeout remain the minima, and
+	// election timeouts grow to at most ten times ElectionTimeout.
+	AdaptiveTiming bool
+
+	// PreVote makes a server whose election timeout expires first ask its
+	// peers whether they would vote for it, without incrementing its term,
+	// and start an election only if a majority would. Peers refuse while
+	// they've heard from a leader within their minimal election timeout. A
+	// server that was partitioned away then rejoins in its old term instead
+	// of forcing the leader to step down with a higher one. It should be
+	// enabled on all servers or none.
+	PreVote bool
+
+	// CheckQuorum makes a leader step down once a majority of the servers
+	// hasn't replied to it within the minimal election timeout, so that a
+	// leader cut off from the majority stops accepting commands it can't
+	// commit, and its followers are free to grant pre-votes.
+	CheckQuorum bool
+
+	// Learners lists the IDs of the servers in the cluster that are learners:
+	// the leader replicates its log to them and they apply committed entries,
+	// but they don't vote, don't count towards the majority that commits an
+	// entry, and never start elections. Learners serve bounded-staleness reads
+	// and act as warm standbys without slowing down commits; the leader
+	// reports how far behind they are with LearnerProgress. The same value
+	// should be used by all servers, learners included.
+	Learners []int
+}
+
+// DefaultConfig returns the configuration used by NewServer and
+// NewConsensusModule.
+func DefaultConfig() Config {
+	return Config{}
+}
+
+// WithTimingProfile returns c with the HeartbeatInterval and ElectionTimeout
+// of a named timing profile: "default", "lan" (a fast local network) or "wan"
+// (servers in different regions).
+func (c Config) WithTimingProfile(name string) (Config, error) {
+	profile, ok := timingProfiles[name]
+	if !ok {
+		names := make([]string, 0, len(timingProfiles))
+		for name := range timingProfiles {
+			names = append(names, name)
+		}
+		sort.Strings(names)
+		return c, fmt.Errorf("unknown timing profile %q (want one of %s)", name, strings.Join(names, ", "))
+	}
+	c.HeartbeatInterval = profile.heartbeat
+	c.ElectionTimeout = profile.election
+	return c, nil
+}
+
+// heartbeatInterval returns HeartbeatInterval or its default.
+func (c Config) heartbeatInterval() time.Duration {
+	if c.HeartbeatInterval <= 0 {
+		return defaultHeartbeatInterval
+	}
+	return c.HeartbeatInterval
+}
+
+// minElectionTimeout returns ElectionTimeout or its default.
+func (c Config) minElectionTimeout() time.Duration {
+	if c.ElectionTimeout <= 0 {
+		return defaultElectionTimeout
+	}
+	return c.ElectionTimeout
+}
+
+// Validate checks that the configuration is usable.
+func (c Config) Validate() error {
+	if c.HeartbeatInterval < 0 || c.ElectionTimeout < 0 {
+		return fmt.Errorf("negative timeout in %+v", c)
+	}
+	if c.heartbeatInterval() >= c.minElectionTimeout() {
+		return fmt.Errorf("HeartbeatInterval %v not shorter than ElectionTimeout %v", c.heartbeatInterval(), c.minElectionTimeout())
+	}
+	maxLease := time.Duration(float64(c.minElectionTimeout()) * (1 - leaseClockDriftBound))
+	if c.LeaseDuration < 0 || c.LeaseDuration > maxLease {
+		return fmt.Errorf("LeaseDuration %v out of range [0, %v]", c.LeaseDuration, maxLease)
+	}
+	if c.SnapshotChunkBytes < 0 {
+		return fmt.Errorf("SnapshotChunkBytes %d is negative", c.SnapshotChunkBytes)
+	}
+	if c.MaxInflightAppends < 0 {
+		return fmt.Errorf("MaxInflightAppends %d is negative", c.MaxInflightAppends)
+	}
+	if c.MaxAppendEntries < 0 || c.MaxAppendBytes < 0 || c.CatchUpBytesPerSecond < 0 {
+		return fmt.Errorf("negative AppendEntries limit in %+v", c)
+	}
+	for _, id := range c.Learners {
+		if id < 0 {
+			return fmt.Errorf("negative learner ID %d", id)
+		}
+	}
+	return nil
+}
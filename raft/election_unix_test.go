@@ -0,0 +1,64 @@
+//go:build unix
+
+package raft
+
+import (
+	"fmt"
+	"syscall"
+	"testing"
+	"time"
+)
+
+// processCPUTime returns the user and system CPU time used by this process.
+func processCPUTime(b *testing.B) time.Duration {
+	var usage syscall.Rusage
+	if err := syscall.Getrusage(syscall.RUSAGE_SELF, &usage); err != nil {
+		b.Fatal(err)
+	}
+	return time.Duration(usage.Utime.Nano() + usage.Stime.Nano())
+}
+
+// BenchmarkIdleFollowers measures the CPU time a process spends per Raft group
+// and second on followers that have nothing to do but receive heartbeats
+// every 50 ms. Each iteration is one heartbeat round to every group.
+func BenchmarkIdleFollowers(b *testing.B) {
+	for _, groups := range []int{100, 1000} {
+		b.Run(fmt.Sprintf("groups=%d", groups), func(b *testing.B) {
+			ready := make(chan any)
+			cms := make([]*ConsensusModule, groups)
+			for i := range cms {
+				server := NewServer(0, []int{1, 2}, NewMapStorage(), ready, nil)
+				cms[i] = NewConsensusModule(0, []int{1, 2}, server, NewMapStorage(), ready, make(chan CommitEntry))
+			}
+			defer func() {
+				for _, cm := range cms {
+					cm.Stop()
+				}
+			}()
+			heartbeat := AppendEntriesArgs{Term: 1, LeaderId: 1, PrevLogIndex: -1, PrevLogTerm: -1, LeaderCommit: -1}
+			beat := func() {
+				for _, cm := range cms {
+					var reply AppendEntriesReply
+					cm.AppendEntries(heartbeat, &reply)
+				}
+			}
+			beat()
+			close(ready)
+
+			b.ResetTimer()
+			start, startCPU := time.Now(), processCPUTime(b)
+			for i := 0; i < b.N; i++ {
+				time.Sleep(50 * time.Millisecond)
+				beat()
+			}
+			elapsed, cpu := time.Since(start), processCPUTime(b)-startCPU
+			b.ReportMetric(float64(cpu.Microseconds())/float64(groups)/elapsed.Seconds(), "cpu-µs/group/s")
+
+			for _, cm := range cms {
+				if _, term, isLeader := cm.Report(); term != 1 || isLeader {
+					b.Fatalf("got a follower in term %d (leader=%v), want one in term 1", term, isLeader)
+				}
+			}
+		})
+	}
+}
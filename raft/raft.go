@@ -9,8 +9,11 @@ import (
 	"encoding/gob"
 	"fmt"
 	"log"
+	"math"
 	"math/rand"
 	"os"
+	"slices"
+	"sort"
 	"sync"
 	"time"
 )
@@ -24,11 +27,20 @@ type CommitEntry struct {
 	// Command is the client command being committed.
 	Command any
 
+	// Payload is set for commands submitted pre-encoded as a []byte (see
+	// Submit); it holds the same bytes as Command, for the client to decode.
+	Payload []byte
+
 	// Index is the log index at which the client command is committed.
 	Index int
 
-	// Term is the Raft term at which the client command is committed.
+	// Term is the term of the log entry holding the client command.
 	Term int
+
+	// Snapshot, if not nil, is a state machine snapshot (see
+	// ConsensusModule.Snapshot) covering all entries up to Index. The client
+	// replaces its state with it; Command is nil.
+	Snapshot []byte
 }
 
 type CMState int
@@ -57,7 +69,21 @@ func (s CMState) String() string {
 
 type LogEntry struct {
 	Command any
-	Term    int
+
+	// Payload holds a command that was submitted pre-encoded, as a []byte;
+	// Command is nil then. RPCs and storage carry its bytes as they are,
+	// instead of encoding a Go value for every peer and retry.
+	Payload []byte
+
+	Term int
+}
+
+// newLogEntry returns the log entry for command in term.
+func newLogEntry(command any, term int) LogEntry {
+	if payload, ok := command.([]byte); ok {
+		return LogEntry{Payload: payload, Term: term}
+	}
+	return LogEntry{Command: command, Term: term}
 }
 
 // ConsensusModule (CM) implements a single node of Raft consensus.
@@ -68,8 +94,14 @@ type ConsensusModule struct {
 	// id is the server ID of this CM.
 	id int
 
-	// peerIds lists the IDs of our peers in the cluster.
-	peerIds []int
+	// peerIds lists the IDs of our voting peers in the cluster, and
+	// learnerIds those of our peers that are learners (see Config.Learners).
+	// replicaIds lists both: the peers a leader replicates its log to.
+	// learner is set if this CM is a learner itself.
+	peerIds    []int
+	learnerIds []int
+	replicaIds []int
+	learner    bool
 
 	// server is the server containing this CM. It's used to issue RPC calls
 	// to peers.
@@ -78,9 +110,15 @@ type ConsensusModule struct {
 	// storage is used to persist state.
 	storage Storage
 
+	// config holds the tunable parameters of this CM.
+	config Config
+
 	// commitChan is the channel where this CM is going to report committed log
-	// entries. It's passed in by the client during construction.
-	commitChan chan<- CommitEntry
+	// entries. It's passed in by the client during construction. A CM created
+	// with NewConsensusModuleWithCommitBatches reports them in batches on
+	// commitBatchChan instead, and commitChan is nil.
+	commitChan      chan<- CommitEntry
+	commitBatchChan chan<- []CommitEntry
 
 	// newCommitReadyChan is an internal notification channel used by goroutines
 	// that commit new entries to the log to notify that these entries may be sent
@@ -91,7 +129,8 @@ type ConsensusModule struct {
 	newCommitReadyChanWg sync.WaitGroup
 
 	// triggerAEChan is an internal notification channel used to trigger
-	// sending new AEs to followers when interesting changes occurred.
+	// sending new AEs to followers when interesting changes occurred. It's
+	// written to with triggerAE.
 	triggerAEChan chan struct{}
 
 	// Persistent Raft state on all servers
@@ -99,15 +138,117 @@ type ConsensusModule struct {
 	votedFor    int
 	log         []LogEntry
 
+	// snapshot is the latest state machine snapshot; it covers all entries up
+	// to and including snapshotIndex, whose term was snapshotTerm. log holds
+	// the entries after snapshotIndex, so the entry at index i is
+	// log[i-snapshotIndex-1]; use the logLen, termAt and entriesFrom helpers
+	// rather than indexing log directly.
+	snapshot      []byte
+	snapshotIndex int
+	snapshotTerm  int
+
+	// termRuns holds the index of the first entry of each term in log, in
+	// log order, so that finding where a term starts or ends in the log is a
+	// binary search. Code that changes log keeps it up to date with
+	// appendLog, truncateLog, trimTermRuns or rebuildTermRuns.
+	termRuns []termRun
+
+	// With a LogStorage, persistedLogLen is the length (counted from index 0)
+	// of the prefix of the log known to be stored, and persistedTerm/persistedVotedFor the stored
+	// currentTerm and votedFor; persistToStorage only writes what changed.
+	persistedLogLen   int
+	persistedTerm     int
+	persistedVotedFor int
+
+	// With a DurableStorage, durableLogLen is the length (counted from index 0)
+	// of the prefix of the log known to be durable. A leader only counts itself towards a majority for
+	// entries in this prefix.
+	durableLogLen int
+
 	// Volatile Raft state on all servers
-	commitIndex        int
-	lastApplied        int
-	state              CMState
-	electionResetEvent time.Time
+	commitIndex int
+	lastApplied int
+	state       CMState
+
+	// electionTimer starts an election at electionDeadline unless it's reset
+	// by then; see resetElectionTimer. It's created once the CM is ready and
+	// stopped while the CM is a leader.
+	electionTimer    *time.Timer
+	electionDeadline time.Time
+
+	// leaderContact is the last time this CM heard from a leader of its
+	// current term, and leaderCommit the leader's commit index at that time.
+	leaderContact time.Time
+	leaderCommit  int
+
+	// Measurements for Config.AdaptiveTiming: peerRTT holds the latest round
+	// trip times of AppendEntries and RequestVote RPCs to each peer, and
+	// leaderGaps the latest intervals between contacts from the leader.
+	peerRTT    map[int]*latencyWindow
+	leaderGaps latencyWindow
+
+	// preVoteRound counts the pre-votes this CM started (see Config.PreVote),
+	// so that replies to an earlier one are ignored.
+	preVoteRound int
+
+	// peerContact holds, per peer, the last time it replied to this leader in
+	// its term; see Config.CheckQuorum.
+	peerContact map[int]time.Time
+
+	// Leadership transfer state on leaders (see TransferLeadership):
+	// transferTarget is the peer taking over, or -1; timeoutNowSent is set
+	// while a TimeoutNow to it is in flight or has succeeded, and transferDone
+	// is closed when the transfer ends.
+	transferTarget int
+	timeoutNowSent bool
+	transferDone   chan struct{}
+
+	// leaderId is the leader of the current term as far as this CM knows, or
+	// -1 if it doesn't know one.
+	leaderId int
 
 	// Volatile Raft state on leaders
 	nextIndex  map[int]int
 	matchIndex map[int]int
+
+	// Replication pipeline state on leaders, per peer. While probing, the
+	// leader looks for the point where the peer's log matches its own, with
+	// one AppendEntries from nextIndex in flight at a time. Once an
+	// AppendEntries succeeds, it pipelines up to Config.MaxInflightAppends of
+	// them: each sends the entries from sentIndex on and advances sentIndex,
+	// without waiting for the previous ones to be acknowledged. inflight
+	// counts the AppendEntries awaiting a reply.
+	probing   map[int]bool
+	sentIndex map[int]int
+	inflight  map[int]int
+
+	// catchUpBudget holds, per peer, the bytes of catch-up entries the leader
+	// may still send (see Config.CatchUpBytesPerSecond) as of
+	// catchUpRefilled; it goes negative after an oversized batch.
+	catchUpBudget   map[int]float64
+	catchUpRefilled map[int]time.Time
+
+	// matchBuf is scratch space for advanceCommitIndex.
+	matchBuf []int
+
+	// snapshotSending marks the peers a leader is sending its snapshot to.
+	// incomingSnapshot accumulates the chunks of the snapshot this CM is
+	// receiving, for the index incomingSnapshotIndex.
+	snapshotSending       map[int]bool
+	incomingSnapshot      []byte
+	incomingSnapshotIndex int
+
+	// Leader lease state (see Config.LeaseDuration). ackSent holds, per peer,
+	// the send time of the latest AppendEntries it acknowledged in our term;
+	// leaseExpiry is derived from the acknowledgements of a majority.
+	// Acknowledgements of AppendEntries sent before leaseResumes don't extend
+	// the lease: until then, a TimeoutNow this CM sent may still get its
+	// target elected.
+	ackSent      map[int]time.Time
+	leaseExpiry  time.Time
+	leaseResumes time.Time
+	leaseHits    uint64
+	leaseMisses  uint64
 }
 
 // NewConsensusModule creates a new CM with the given ID, list of peer IDs and
@@ -115,33 +256,86 @@ type ConsensusModule struct {
 // it's safe to start its state machine. commitChan is going to be used by the
 // CM to send log entries that have been committed by the Raft cluster.
 func NewConsensusModule(id int, peerIds []int, server *Server, storage Storage, ready <-chan any, commitChan chan<- CommitEntry) *ConsensusModule {
+	return NewConsensusModuleWithConfig(id, peerIds, server, storage, ready, commitChan, DefaultConfig())
+}
+
+// NewConsensusModuleWithConfig is like NewConsensusModule, but uses the given
+// config instead of DefaultConfig.
+func NewConsensusModuleWithConfig(id int, peerIds []int, server *Server, storage Storage, ready <-chan any, commitChan chan<- CommitEntry, config Config) *ConsensusModule {
+	return newConsensusModule(id, peerIds, server, storage, ready, commitChan, nil, config)
+}
+
+// NewConsensusModuleWithCommitBatches is like NewConsensusModuleWithConfig,
+// but the CM reports committed entries on commitBatchChan, in one slice per
+// range of entries that became committed together, rather than one by one.
+// The client owns the slices it receives.
+func NewConsensusModuleWithCommitBatches(id int, peerIds []int, server *Server, storage Storage, ready <-chan any, commitBatchChan chan<- []CommitEntry, config Config) *ConsensusModule {
+	return newConsensusModule(id, peerIds, server, storage, ready, nil, commitBatchChan, config)
+}
+
+func newConsensusModule(id int, peerIds []int, server *Server, storage Storage, ready <-chan any, commitChan chan<- CommitEntry, commitBatchChan chan<- []CommitEntry, config Config) *ConsensusModule {
+	if err := config.Validate(); err != nil {
+		log.Fatal(err)
+	}
 	cm := new(ConsensusModule)
 	cm.id = id
-	cm.peerIds = peerIds
+	for _, peerId := range peerIds {
+		if slices.Contains(config.Learners, peerId) {
+			cm.learnerIds = append(cm.learnerIds, peerId)
+		} else {
+			cm.peerIds = append(cm.peerIds, peerId)
+		}
+	}
+	cm.replicaIds = slices.Concat(cm.peerIds, cm.learnerIds)
+	cm.learner = slices.Contains(config.Learners, id)
 	cm.server = server
 	cm.storage = storage
+	cm.config = config
 	cm.commitChan = commitChan
+	cm.commitBatchChan = commitBatchChan
 	cm.newCommitReadyChan = make(chan struct{}, 16)
 	cm.triggerAEChan = make(chan struct{}, 1)
 	cm.state = Follower
 	cm.votedFor = -1
 	cm.commitIndex = -1
+	cm.leaderCommit = -1
+	cm.leaderId = -1
+	cm.transferTarget = -1
+	cm.persistedTerm = -1
+	cm.snapshotIndex = -1
+	cm.snapshotTerm = -1
 	cm.lastApplied = -1
 	cm.nextIndex = make(map[int]int)
 	cm.matchIndex = make(map[int]int)
+	cm.probing = make(map[int]bool)
+	cm.sentIndex = make(map[int]int)
+	cm.inflight = make(map[int]int)
+	cm.catchUpBudget = make(map[int]float64)
+	cm.catchUpRefilled = make(map[int]time.Time)
+	cm.ackSent = make(map[int]time.Time)
+	cm.snapshotSending = make(map[int]bool)
+	cm.peerRTT = make(map[int]*latencyWindow)
+	cm.peerContact = make(map[int]time.Time)
 
 	if cm.storage.HasData() {
 		cm.restoreFromStorage()
 	}
+	if cm.snapshotIndex >= 0 {
+		// Hand the restored snapshot to the client first.
+		cm.newCommitReadyChan <- struct{}{}
+	}
 
 	go func() {
 		// The CM is dormant until ready is signaled; then, it starts a countdown
-		// for leader election.
+		// for leader election. Learners never start elections.
 		<-ready
 		cm.mu.Lock()
-		cm.electionResetEvent = time.Now()
-		cm.mu.Unlock()
-		cm.runElectionTimer()
+		defer cm.mu.Unlock()
+		if cm.state == Dead || cm.learner {
+			return
+		}
+		cm.resetElectionTimer()
+		cm.electionTimer = time.AfterFunc(time.Until(cm.electionDeadline), cm.electionTimerFired)
 	}()
 
 	cm.newCommitReadyChanWg.Add(1)
@@ -156,21 +350,36 @@ func (cm *ConsensusModule) Report() (id int, term int, isLeader bool) {
 	return cm.id, cm.currentTerm, cm.state == Leader
 }
 
-// Submit submits a new command to the CM. This function doesn't block; clients
-// read the commit channel passed in the constructor to be notified of new
-// committed entries.
+// LeaderId returns the id of the leader of this CM's current term, if this CM
+// knows it (it is the leader, or it accepted AppendEntries from the leader),
+// and -1 otherwise. Clients use it to redirect requests a follower can't serve.
+func (cm *ConsensusModule) LeaderId() int {
+	cm.mu.Lock()
+	defer cm.mu.Unlock()
+	return cm.leaderId
+}
+
+// Submit submits a new command to the CM. This function doesn't block (beyond
+// waiting for a DurableStorage to sync the command); clients read the commit
+// channel passed in the constructor to be notified of new committed entries.
+// A command that is a []byte is treated as an encoded payload: it's
+// replicated and stored as is, and the client decodes it once committed,
+// which is cheaper than having Raft encode a Go value (with gob) per peer.
 // If this CM is the leader, Submit returns the log index where the command
-// is submitted. Otherwise, it returns -1
+// is submitted. Otherwise, or while it transfers its leadership, it returns -1
 func (cm *ConsensusModule) Submit(command any) int {
 	cm.mu.Lock()
 	cm.dlog("Submit received by %v: %v", cm.state, command)
-	if cm.state == Leader {
-		submitIndex := len(cm.log)
-		cm.log = append(cm.log, LogEntry{Command: command, Term: cm.currentTerm})
+	if cm.state == Leader && cm.transferTarget < 0 {
+		submitIndex := cm.logLen()
+		cm.appendLog(newLogEntry(command, cm.currentTerm))
 		cm.persistToStorage()
 		cm.dlog("... log=%v", cm.log)
 		cm.mu.Unlock()
-		cm.triggerAEChan <- struct{}{}
+		// Replicate while the entries are synced; the leader counts itself
+		// towards a majority once they're durable.
+		cm.triggerAE()
+		cm.waitDurable()
 		return submitIndex
 	}
 
@@ -178,6 +387,394 @@ func (cm *ConsensusModule) Submit(command any) int {
 	return -1
 }
 
+// triggerAE asks the leader's heartbeat loop to send AEs now. It never
+// blocks: triggerAEChan has room for one pending notification, and a pending
+// one already covers this request. A blocking send would hang forever if this
+// CM stopped being a leader (and the loop exited) after the caller unlocked.
+func (cm *ConsensusModule) triggerAE() {
+	select {
+	case cm.triggerAEChan <- struct{}{}:
+	default:
+	}
+}
+
+// SubmitBatch submits several commands to the CM at once. The commands are
+// appended to the log under a single lock acquisition and persisted together,
+// so they occupy consecutive log indices.
+// If this CM is the leader, SubmitBatch returns the log index of the first
+// command in the batch. Otherwise, or while it transfers its leadership, it
+// returns -1.
+func (cm *ConsensusModule) SubmitBatch(commands []any) int {
+	cm.mu.Lock()
+	cm.dlog("SubmitBatch received by %v: %d commands", cm.state, len(commands))
+	if cm.state == Leader && cm.transferTarget < 0 && len(commands) > 0 {
+		submitIndex := cm.logLen()
+		for _, command := range commands {
+			cm.appendLog(newLogEntry(command, cm.currentTerm))
+		}
+		cm.persistToStorage()
+		cm.dlog("... log=%v", cm.log)
+		cm.mu.Unlock()
+		// Replicate while the entries are synced; the leader counts itself
+		// towards a majority once they're durable.
+		cm.triggerAE()
+		cm.waitDurable()
+		return submitIndex
+	}
+
+	cm.mu.Unlock()
+	return -1
+}
+
+// Snapshot tells the CM that the client's state machine has taken a snapshot
+// of its state after applying all entries up to and including index. The CM
+// keeps and persists the snapshot, discards the log entries it covers, and
+// sends it to followers that need those entries. index has to be an entry the
+// client has received on the commit channel; older snapshots are ignored.
+func (cm *ConsensusModule) Snapshot(index int, snapshot []byte) error {
+	cm.mu.Lock()
+	defer cm.mu.Unlock()
+	if index > cm.lastApplied {
+		return fmt.Errorf("snapshot index %d is past the last applied index %d", index, cm.lastApplied)
+	}
+	if index <= cm.snapshotIndex {
+		return nil
+	}
+	cm.dlog("Snapshot at index=%d (%d bytes)", index, len(snapshot))
+
+	term := cm.termAt(index)
+	cm.log = append([]LogEntry(nil), cm.entriesFrom(index+1)...)
+	cm.snapshot, cm.snapshotIndex, cm.snapshotTerm = snapshot, index, term
+	cm.trimTermRuns()
+	cm.persistSnapshot()
+	return nil
+}
+
+// TransferLeadership hands this CM's leadership over to its peer targetId,
+// e.g. before the leader is restarted for maintenance. The CM stops accepting
+// commands, brings the target's log up to date and sends it a TimeoutNow RPC,
+// which makes it start an election at once instead of after an election
+// timeout. TransferLeadership returns true once this CM has stopped being the
+// leader. It returns false if this CM isn't the leader, targetId isn't one of
+// its peers, another transfer is in progress, or the target didn't take over
+// within the minimal election timeout; the CM then accepts commands again.
+// Voters don't let a leader lease hold up the target's election, so the CM
+// gives up its lease, and doesn't take a new one until an election timeout
+// after it last sent TimeoutNow.
+func (cm *ConsensusModule) TransferLeadership(targetId int) bool {
+	cm.mu.Lock()
+	if cm.state != Leader || cm.transferTarget >= 0 || !slices.Contains(cm.peerIds, targetId) {
+		cm.mu.Unlock()
+		return false
+	}
+	cm.dlog("transfers leadership to %d", targetId)
+	cm.transferTarget = targetId
+	cm.leaseExpiry = time.Time{}
+	done := make(chan struct{})
+	cm.transferDone = done
+	cm.maybeSendTimeoutNow(targetId)
+	cm.mu.Unlock()
+	cm.triggerAE()
+
+	timeout := time.NewTimer(cm.config.minElectionTimeout())
+	defer timeout.Stop()
+	select {
+	case <-done:
+		return true
+	case <-timeout.C:
+	}
+	cm.mu.Lock()
+	defer cm.mu.Unlock()
+	if cm.transferDone != done {
+		// The transfer ended as the timer fired.
+		return true
+	}
+	cm.dlog("leadership transfer to %d timed out", targetId)
+	cm.endTransfer()
+	return false
+}
+
+// maybeSendTimeoutNow sends TimeoutNow to peerId if it's the target of a
+// leadership transfer and its log has caught up with ours. A failed RPC is
+// retried after the next AppendEntries the target acknowledges.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) maybeSendTimeoutNow(peerId int) {
+	if peerId != cm.transferTarget || cm.timeoutNowSent || cm.matchIndex[peerId] < cm.logLen()-1 {
+		return
+	}
+	cm.timeoutNowSent = true
+	cm.leaseResumes = time.Now().Add(cm.minElectionTimeout())
+	args := TimeoutNowArgs{Term: cm.currentTerm, LeaderId: cm.id}
+	go func() {
+		cm.dlog("sending TimeoutNow to %d: %+v", peerId, args)
+		var reply TimeoutNowReply
+		err := cm.server.Call(peerId, "ConsensusModule.TimeoutNow", args, &reply)
+		cm.mu.Lock()
+		defer cm.mu.Unlock()
+		if err != nil {
+			if cm.transferTarget == peerId && cm.currentTerm == args.Term {
+				cm.timeoutNowSent = false
+			}
+		} else if reply.Term > cm.currentTerm {
+			// The target has started its election.
+			cm.dlog("term out of date in TimeoutNow reply")
+			cm.becomeFollower(reply.Term)
+		}
+	}()
+}
+
+// endTransfer ends the leadership transfer in progress, if any.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) endTransfer() {
+	if cm.transferTarget < 0 {
+		return
+	}
+	cm.transferTarget = -1
+	cm.timeoutNowSent = false
+	close(cm.transferDone)
+	cm.transferDone = nil
+}
+
+// ReadIndex implements the ReadIndex protocol for linearizable reads that
+// don't go through the log (section 6.4 of the Raft dissertation). If this CM
+// is the leader, it records its commit index, confirms it's still the leader
+// with a round of heartbeats acknowledged by a majority, and returns the
+// recorded index: a read is linearizable once the client's state machine has
+// applied entries up to that index.
+// It returns -1 if this CM isn't the leader, fails to confirm its leadership,
+// or hasn't committed an entry in its current term yet (until it does, its
+// commit index may lag behind the previous leader's).
+func (cm *ConsensusModule) ReadIndex() int {
+	cm.mu.Lock()
+	if cm.state != Leader || cm.commitIndex < 0 || cm.termAt(cm.commitIndex) != cm.currentTerm {
+		cm.mu.Unlock()
+		return -1
+	}
+	readIndex := cm.commitIndex
+	savedCurrentTerm := cm.currentTerm
+	cm.mu.Unlock()
+
+	if !cm.confirmLeadership(savedCurrentTerm) {
+		return -1
+	}
+	cm.dlog("ReadIndex confirmed readIndex=%d in term=%d", readIndex, savedCurrentTerm)
+	return readIndex
+}
+
+// confirmLeadership sends a round of heartbeats to all peers and reports
+// whether a majority of the cluster still acknowledges this CM as the leader
+// for term.
+func (cm *ConsensusModule) confirmLeadership(term int) bool {
+	acks := 1
+	if acks*2 > len(cm.peerIds)+1 {
+		return true
+	}
+
+	replies := make(chan bool, len(cm.peerIds))
+	for _, peerId := range cm.peerIds {
+		go func() {
+			cm.mu.Lock()
+			if cm.state != Leader || cm.currentTerm != term {
+				cm.mu.Unlock()
+				replies <- false
+				return
+			}
+			// Entries covered by the snapshot are committed and match on all
+			// servers, so it's enough to probe the snapshot's last entry.
+			prevLogIndex := max(cm.nextIndex[peerId]-1, cm.snapshotIndex)
+			prevLogTerm := cm.termAt(prevLogIndex)
+			args := AppendEntriesArgs{
+				Term:         term,
+				LeaderId:     cm.id,
+				PrevLogIndex: prevLogIndex,
+				PrevLogTerm:  prevLogTerm,
+				LeaderCommit: cm.commitIndex,
+			}
+			cm.mu.Unlock()
+
+			sentAt := time.Now()
+			var reply AppendEntriesReply
+			if err := cm.server.Call(peerId, "ConsensusModule.AppendEntries", args, &reply); err != nil {
+				replies <- false
+				return
+			}
+			cm.mu.Lock()
+			defer cm.mu.Unlock()
+			if reply.Term > cm.currentTerm {
+				cm.dlog("term out of date in ReadIndex heartbeat reply")
+				cm.becomeFollower(reply.Term)
+			} else if cm.state == Leader && reply.Term == term {
+				cm.recordAck(peerId, sentAt)
+			}
+			// A reply in our term acknowledges our leadership, whether or not
+			// the follower's log matched.
+			replies <- reply.Term == term
+		}()
+	}
+
+	// Give up after the minimal election timeout: by then a new leader may
+	// have been elected.
+	timeout := time.NewTimer(cm.config.minElectionTimeout())
+	defer timeout.Stop()
+	for pending := len(cm.peerIds); pending > 0; pending-- {
+		select {
+		case ok := <-replies:
+			if ok {
+				acks++
+				if acks*2 > len(cm.peerIds)+1 {
+					return true
+				}
+			}
+		case <-timeout.C:
+			return false
+		}
+	}
+	return false
+}
+
+// ReadState describes how fresh a CM's committed state is, for serving
+// reads with bounded staleness from followers.
+type ReadState struct {
+	// CommitIndex is this CM's commit index. Entries up to it are safe to
+	// serve.
+	CommitIndex int
+
+	// LeaderCommit is the leader's commit index as last reported to this CM
+	// (its own commit index on the leader).
+	LeaderCommit int
+
+	// SinceLeaderContact is the time since this CM last heard from the leader
+	// of its term (zero on the leader). LeaderCommit is at most that old.
+	SinceLeaderContact time.Duration
+
+	// IsLeader is true if this CM thinks it's the leader.
+	IsLeader bool
+}
+
+// EntriesBehind returns how many committed entries this CM was missing
+// compared to the leader when it last heard from it.
+func (rs ReadState) EntriesBehind() int {
+	return max(0, rs.LeaderCommit-rs.CommitIndex)
+}
+
+// ReadState reports the freshness of this CM's committed state; see the
+// ReadState type. A follower that never heard from a leader reports a
+// SinceLeaderContact longer than any sensible staleness bound.
+func (cm *ConsensusModule) ReadState() ReadState {
+	cm.mu.Lock()
+	defer cm.mu.Unlock()
+	if cm.state == Leader {
+		return ReadState{CommitIndex: cm.commitIndex, LeaderCommit: cm.commitIndex, IsLeader: true}
+	}
+	sinceContact := time.Duration(math.MaxInt64)
+	if !cm.leaderContact.IsZero() {
+		sinceContact = time.Since(cm.leaderContact)
+	}
+	return ReadState{
+		CommitIndex:        cm.commitIndex,
+		LeaderCommit:       max(cm.leaderCommit, cm.commitIndex),
+		SinceLeaderContact: sinceContact,
+	}
+}
+
+// LearnerProgress describes how far a learner's log is behind the leader's.
+type LearnerProgress struct {
+	// MatchIndex is the index of the last entry the leader knows the learner
+	// stores, or -1 if it doesn't know of any.
+	MatchIndex int
+
+	// EntriesBehind is how many entries committed on the leader the learner
+	// isn't known to store.
+	EntriesBehind int
+
+	// SinceContact is the time since the learner last replied to the leader.
+	SinceContact time.Duration
+}
+
+// LearnerProgress reports the replication progress of each learner (see
+// Config.Learners), by ID, if this CM is the leader, and nil otherwise.
+// MatchIndex is only known once a learner has accepted an AppendEntries from
+// this leader.
+func (cm *ConsensusModule) LearnerProgress() map[int]LearnerProgress {
+	cm.mu.Lock()
+	defer cm.mu.Unlock()
+	if cm.state != Leader {
+		return nil
+	}
+	progress := make(map[int]LearnerProgress, len(cm.learnerIds))
+	for _, peerId := range cm.learnerIds {
+		progress[peerId] = LearnerProgress{
+			MatchIndex:    cm.matchIndex[peerId],
+			EntriesBehind: max(0, cm.commitIndex-cm.matchIndex[peerId]),
+			SinceContact:  time.Since(cm.peerContact[peerId]),
+		}
+	}
+	return progress
+}
+
+// LeaseRead serves a read under the leader lease (see Config.LeaseDuration).
+// If this CM is the leader and its lease is valid, it returns the commit
+// index: a read is linearizable once the client's state machine has applied
+// entries up to that index, without any further network round trip.
+// It returns -1 if leases are disabled, this CM isn't the leader, its lease
+// expired, or it hasn't committed an entry in its current term yet; callers
+// should fall back to ReadIndex.
+func (cm *ConsensusModule) LeaseRead() int {
+	cm.mu.Lock()
+	defer cm.mu.Unlock()
+	if cm.config.LeaseDuration <= 0 {
+		return -1
+	}
+	if cm.state != Leader || cm.commitIndex < 0 || cm.termAt(cm.commitIndex) != cm.currentTerm ||
+		(len(cm.peerIds) > 0 && !time.Now().Before(cm.leaseExpiry)) || cm.transferTarget >= 0 {
+		cm.leaseMisses++
+		return -1
+	}
+	cm.leaseHits++
+	return cm.commitIndex
+}
+
+// LeaseStats reports how many LeaseRead calls were served under the lease
+// (hits) and how many had to be refused (misses).
+func (cm *ConsensusModule) LeaseStats() (hits uint64, misses uint64) {
+	cm.mu.Lock()
+	defer cm.mu.Unlock()
+	return cm.leaseHits, cm.leaseMisses
+}
+
+// recordAck notes that peerId acknowledged our leadership for an
+// AppendEntries sent at sentAt, for Config.CheckQuorum, and extends the lease
+// if a majority has acknowledged messages sent at or after some later time.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) recordAck(peerId int, sentAt time.Time) {
+	cm.peerContact[peerId] = time.Now()
+	if cm.config.LeaseDuration <= 0 || slices.Contains(cm.learnerIds, peerId) {
+		return
+	}
+	if sentAt.After(cm.ackSent[peerId]) {
+		cm.ackSent[peerId] = sentAt
+	}
+
+	// With n servers, we need acks from a majority; the leader counts itself,
+	// so (n/2) peers have to have acknowledged. The lease starts at the
+	// oldest send time among the most recent such acknowledgements.
+	needed := (len(cm.peerIds) + 1) / 2
+	times := make([]time.Time, 0, len(cm.ackSent))
+	for _, t := range cm.ackSent {
+		times = append(times, t)
+	}
+	if len(times) < needed {
+		return
+	}
+	sort.Slice(times, func(i, j int) bool { return times[i].After(times[j]) })
+	if times[needed-1].Before(cm.leaseResumes) {
+		return
+	}
+	if expiry := times[needed-1].Add(cm.config.LeaseDuration); expiry.After(cm.leaseExpiry) {
+		cm.leaseExpiry = expiry
+	}
+}
+
 // Stop stops this CM, cleaning up its state. This method returns quickly, but
 // it may take a bit of time (up to ~election timeout) for all goroutines to
 // exit.
@@ -185,6 +782,10 @@ func (cm *ConsensusModule) Stop() {
 	cm.dlog("CM.Stop called")
 	cm.mu.Lock()
 	cm.state = Dead
+	cm.endTransfer()
+	if cm.electionTimer != nil {
+		cm.electionTimer.Stop()
+	}
 	cm.mu.Unlock()
 	cm.dlog("becomes Dead")
 
@@ -194,9 +795,25 @@ func (cm *ConsensusModule) Stop() {
 	cm.newCommitReadyChanWg.Wait()
 }
 
+// snapshotRecord is how a snapshot is persisted under the "snapshot" key.
+type snapshotRecord struct {
+	Index int
+	Term  int
+	Data  []byte
+}
+
 // restoreFromStorage restores the persistent state of this CM from storage.
 // It should be called during constructor, before any concurrency concerns.
 func (cm *ConsensusModule) restoreFromStorage() {
+	if snapshotData, found := cm.storage.Get("snapshot"); found {
+		var record snapshotRecord
+		d := gob.NewDecoder(bytes.NewBuffer(snapshotData))
+		if err := d.Decode(&record); err != nil {
+			log.Fatal(err)
+		}
+		cm.snapshot, cm.snapshotIndex, cm.snapshotTerm = record.Data, record.Index, record.Term
+		cm.commitIndex = record.Index
+	}
 	if termData, found := cm.storage.Get("currentTerm"); found {
 		d := gob.NewDecoder(bytes.NewBuffer(termData))
 		if err := d.Decode(&cm.currentTerm); err != nil {
@@ -213,7 +830,17 @@ func (cm *ConsensusModule) restoreFromStorage() {
 	} else {
 		log.Fatal("votedFor not found in storage")
 	}
-	if logData, found := cm.storage.Get("log"); found {
+	if ls, ok := cm.storage.(LogStorage); ok {
+		// The storage may still hold some entries covered by the snapshot.
+		firstIndex, entries := ls.Entries()
+		skip := cm.snapshotIndex + 1 - firstIndex
+		if skip < 0 {
+			log.Fatalf("stored log starts at index %d, after snapshot index %d", firstIndex, cm.snapshotIndex)
+		}
+		cm.log = entries[min(skip, len(entries)):]
+		cm.persistedLogLen = cm.logLen()
+		cm.persistedTerm, cm.persistedVotedFor = cm.currentTerm, cm.votedFor
+	} else if logData, found := cm.storage.Get("log"); found {
 		d := gob.NewDecoder(bytes.NewBuffer(logData))
 		if err := d.Decode(&cm.log); err != nil {
 			log.Fatal(err)
@@ -221,11 +848,19 @@ func (cm *ConsensusModule) restoreFromStorage() {
 	} else {
 		log.Fatal("log not found in storage")
 	}
+	cm.rebuildTermRuns()
 }
 
-// persistToStorage saves all of CM's persistent state in cm.storage.
+// persistToStorage saves all of CM's persistent state in cm.storage, except
+// for the snapshot (see persistSnapshot). Without a LogStorage, the "log" key
+// holds the entries after the snapshot.
 // Expects cm.mu to be locked.
 func (cm *ConsensusModule) persistToStorage() {
+	if ls, ok := cm.storage.(LogStorage); ok {
+		cm.persistIncrementally(ls)
+		return
+	}
+
 	var termData bytes.Buffer
 	if err := gob.NewEncoder(&termData).Encode(cm.currentTerm); err != nil {
 		log.Fatal(err)
@@ -245,6 +880,195 @@ func (cm *ConsensusModule) persistToStorage() {
 	cm.storage.Set("log", logData.Bytes())
 }
 
+// persistIncrementally is persistToStorage for a LogStorage: it appends the
+// log entries past persistedLogLen and rewrites currentTerm and votedFor only
+// when they changed, so heartbeats persist nothing. Code that replaces log
+// entries has to lower persistedLogLen to the first replaced index.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) persistIncrementally(ls LogStorage) {
+	if cm.currentTerm != cm.persistedTerm || cm.votedFor != cm.persistedVotedFor {
+		var termData bytes.Buffer
+		if err := gob.NewEncoder(&termData).Encode(cm.currentTerm); err != nil {
+			log.Fatal(err)
+		}
+		ls.Set("currentTerm", termData.Bytes())
+
+		var votedData bytes.Buffer
+		if err := gob.NewEncoder(&votedData).Encode(cm.votedFor); err != nil {
+			log.Fatal(err)
+		}
+		ls.Set("votedFor", votedData.Bytes())
+		cm.persistedTerm, cm.persistedVotedFor = cm.currentTerm, cm.votedFor
+	}
+
+	if cm.persistedLogLen != cm.logLen() {
+		ls.AppendEntries(cm.persistedLogLen, cm.entriesFrom(cm.persistedLogLen))
+		cm.persistedLogLen = cm.logLen()
+	}
+}
+
+// persistSnapshot saves the current snapshot, then discards the entries it
+// covers from storage and persists the rest of the state.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) persistSnapshot() {
+	var snapshotData bytes.Buffer
+	record := snapshotRecord{Index: cm.snapshotIndex, Term: cm.snapshotTerm, Data: cm.snapshot}
+	if err := gob.NewEncoder(&snapshotData).Encode(record); err != nil {
+		log.Fatal(err)
+	}
+	cm.storage.Set("snapshot", snapshotData.Bytes())
+
+	if ls, ok := cm.storage.(LogStorage); ok {
+		if cm.persistedLogLen > cm.logLen() {
+			// A snapshot from the leader replaced a conflicting log.
+			ls.AppendEntries(cm.logLen(), nil)
+			cm.persistedLogLen = cm.logLen()
+		}
+		ls.Compact(cm.snapshotIndex + 1)
+		cm.persistedLogLen = max(cm.persistedLogLen, cm.snapshotIndex+1)
+	}
+	cm.persistToStorage()
+}
+
+// logLen returns the index that follows the last log entry.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) logLen() int {
+	return cm.snapshotIndex + 1 + len(cm.log)
+}
+
+// termAt returns the term of the entry at index, which is either -1 (for
+// which it returns -1) or at least snapshotIndex.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) termAt(index int) int {
+	if index < 0 {
+		return -1
+	} else if index == cm.snapshotIndex {
+		return cm.snapshotTerm
+	}
+	return cm.log[index-cm.snapshotIndex-1].Term
+}
+
+// entriesFrom returns the log entries from index on; index has to be past
+// snapshotIndex.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) entriesFrom(index int) []LogEntry {
+	return cm.log[index-cm.snapshotIndex-1:]
+}
+
+// termRun records that the log entries from Index up to the next run's
+// Index (or the end of the log) have term Term.
+type termRun struct {
+	Term  int
+	Index int
+}
+
+// appendLog appends entries to the log.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) appendLog(entries ...LogEntry) {
+	for _, entry := range entries {
+		if n := len(cm.termRuns); n == 0 || cm.termRuns[n-1].Term != entry.Term {
+			cm.termRuns = append(cm.termRuns, termRun{Term: entry.Term, Index: cm.logLen()})
+		}
+		cm.log = append(cm.log, entry)
+	}
+}
+
+// truncateLog discards the log entries at index and beyond; index has to be
+// past snapshotIndex. The log's capacity is clipped too, so that entries
+// appended later don't overwrite the discarded ones in place while an
+// AppendEntries RPC sent earlier may still be encoding them.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) truncateLog(index int) {
+	n := index - cm.snapshotIndex - 1
+	cm.log = cm.log[:n:n]
+	n = len(cm.termRuns)
+	for n > 0 && cm.termRuns[n-1].Index >= index {
+		n--
+	}
+	cm.termRuns = cm.termRuns[:n]
+}
+
+// trimTermRuns drops the runs of entries that were discarded from the start
+// of the log when snapshotIndex advanced.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) trimTermRuns() {
+	if len(cm.log) == 0 {
+		cm.termRuns = nil
+		return
+	}
+	first := cm.snapshotIndex + 1
+	i := sort.Search(len(cm.termRuns), func(i int) bool { return cm.termRuns[i].Index > first }) - 1
+	cm.termRuns = append([]termRun(nil), cm.termRuns[i:]...)
+	cm.termRuns[0].Index = first
+}
+
+// rebuildTermRuns recomputes termRuns from the whole log.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) rebuildTermRuns() {
+	cm.termRuns = nil
+	for i, entry := range cm.log {
+		if n := len(cm.termRuns); n == 0 || cm.termRuns[n-1].Term != entry.Term {
+			cm.termRuns = append(cm.termRuns, termRun{Term: entry.Term, Index: cm.snapshotIndex + 1 + i})
+		}
+	}
+}
+
+// firstIndexOfRun returns the first index of the run of entries with the same
+// term as the entry at index, which is either snapshotIndex or in the log.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) firstIndexOfRun(index int) int {
+	if index <= cm.snapshotIndex {
+		return index
+	}
+	i := sort.Search(len(cm.termRuns), func(i int) bool { return cm.termRuns[i].Index > index }) - 1
+	return cm.termRuns[i].Index
+}
+
+// lastIndexOfTerm returns the index of the last log entry with the given
+// term, or -1 if there's none past snapshotIndex.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) lastIndexOfTerm(term int) int {
+	i := sort.Search(len(cm.termRuns), func(i int) bool { return cm.termRuns[i].Term >= term })
+	if i == len(cm.termRuns) || cm.termRuns[i].Term != term {
+		return -1
+	} else if i+1 < len(cm.termRuns) {
+		return cm.termRuns[i+1].Index - 1
+	}
+	return cm.logLen() - 1
+}
+
+// waitDurable waits until everything persisted so far is durable if cm's
+// storage is a DurableStorage, and then extends durableLogLen. On a leader,
+// the entries that became durable may complete a majority, so it advances the
+// commit index too. Expects cm.mu to be unlocked.
+func (cm *ConsensusModule) waitDurable() {
+	ds, ok := cm.storage.(DurableStorage)
+	if !ok {
+		return
+	}
+	cm.mu.Lock()
+	logLen := cm.persistedLogLen
+	cm.mu.Unlock()
+
+	ds.WaitDurable()
+
+	cm.mu.Lock()
+	cm.durableLogLen = max(cm.durableLogLen, logLen)
+	if cm.state != Leader {
+		cm.mu.Unlock()
+		return
+	}
+	savedCommitIndex := cm.commitIndex
+	cm.advanceCommitIndex()
+	commitIndex := cm.commitIndex
+	cm.mu.Unlock()
+	if commitIndex != savedCommitIndex {
+		cm.dlog("leader sets commitIndex := %d once durable", commitIndex)
+		cm.newCommitReadyChan <- struct{}{}
+		cm.triggerAE()
+	}
+}
+
 // dlog logs a debugging message if DebugCM > 0.
 func (cm *ConsensusModule) dlog(format string, args ...any) {
 	if DebugCM > 0 {
@@ -253,12 +1077,17 @@ func (cm *ConsensusModule) dlog(format string, args ...any) {
 	}
 }
 
-// See figure 2 in the paper.
+// See figure 2 in the paper. With PreVote set, the candidate asks whether the
+// peer would vote for it in Term, which is one above the candidate's current
+// term (see Config.PreVote); the peer doesn't change its state.
+// LeadershipTransfer is set in elections started by TimeoutNow.
 type RequestVoteArgs struct {
-	Term         int
-	CandidateId  int
-	LastLogIndex int
-	LastLogTerm  int
+	Term               int
+	CandidateId        int
+	LastLogIndex       int
+	LastLogTerm        int
+	PreVote            bool
+	LeadershipTransfer bool
 }
 
 type RequestVoteReply struct {
@@ -269,25 +1098,47 @@ type RequestVoteReply struct {
 // RequestVote RPC.
 func (cm *ConsensusModule) RequestVote(args RequestVoteArgs, reply *RequestVoteReply) error {
 	cm.mu.Lock()
+	defer cm.waitDurable()
 	defer cm.mu.Unlock()
 	if cm.state == Dead {
 		return nil
 	}
 	lastLogIndex, lastLogTerm := cm.lastLogIndexAndTerm()
 	cm.dlog("RequestVote: %+v [currentTerm=%d, votedFor=%d, log index/term=(%d, %d)]", args, cm.currentTerm, cm.votedFor, lastLogIndex, lastLogTerm)
+	logUpToDate := args.LastLogTerm > lastLogTerm ||
+		(args.LastLogTerm == lastLogTerm && args.LastLogIndex >= lastLogIndex)
+
+	if args.PreVote {
+		// Would we vote for this candidate in args.Term? Not while we know of a
+		// live leader: it's only the candidate that lost touch with it.
+		reply.Term = cm.currentTerm
+		reply.VoteGranted = args.Term > cm.currentTerm && logUpToDate && cm.state != Leader && !cm.learner &&
+			time.Since(cm.leaderContact) >= cm.minElectionTimeout()
+		cm.dlog("... RequestVote pre-vote reply: %+v", reply)
+		return nil
+	}
+
+	if cm.config.LeaseDuration > 0 && cm.state == Follower && args.Term > cm.currentTerm &&
+		!args.LeadershipTransfer && time.Since(cm.leaderContact) < cm.config.minElectionTimeout() {
+		// A leader may hold a lease based on our acknowledgements; don't help
+		// elect another one before that lease has certainly expired. A leader
+		// that transfers its leadership gives up its lease first.
+		cm.dlog("... ignoring RequestVote while current leader is active")
+		reply.Term = cm.currentTerm
+		reply.VoteGranted = false
+		return nil
+	}
 
 	if args.Term > cm.currentTerm {
 		cm.dlog("... term out of date in RequestVote")
 		cm.becomeFollower(args.Term)
 	}
 
-	if cm.currentTerm == args.Term &&
-		(cm.votedFor == -1 || cm.votedFor == args.CandidateId) &&
-		(args.LastLogTerm > lastLogTerm ||
-			(args.LastLogTerm == lastLogTerm && args.LastLogIndex >= lastLogIndex)) {
+	if cm.currentTerm == args.Term && !cm.learner &&
+		(cm.votedFor == -1 || cm.votedFor == args.CandidateId) && logUpToDate {
 		reply.VoteGranted = true
 		cm.votedFor = args.CandidateId
-		cm.electionResetEvent = time.Now()
+		cm.resetElectionTimer()
 	} else {
 		reply.VoteGranted = false
 	}
@@ -320,6 +1171,9 @@ type AppendEntriesReply struct {
 
 func (cm *ConsensusModule) AppendEntries(args AppendEntriesArgs, reply *AppendEntriesReply) error {
 	cm.mu.Lock()
+	// Deferred calls run in reverse order: the reply waits for durability
+	// after the lock is released.
+	defer cm.waitDurable()
 	defer cm.mu.Unlock()
 	if cm.state == Dead {
 		return nil
@@ -336,13 +1190,26 @@ func (cm *ConsensusModule) AppendEntries(args AppendEntriesArgs, reply *AppendEn
 		if cm.state != Follower {
 			cm.becomeFollower(args.Term)
 		}
-		cm.electionResetEvent = time.Now()
+		cm.heardFromLeader(args.LeaderId)
+		cm.leaderCommit = max(cm.leaderCommit, args.LeaderCommit)
+
+		// Entries up to snapshotIndex are committed and already covered by our
+		// snapshot; skip the ones the leader sent again.
+		if args.PrevLogIndex < cm.snapshotIndex {
+			skip := min(cm.snapshotIndex-args.PrevLogIndex, len(args.Entries))
+			args.PrevLogIndex += skip
+			args.Entries = args.Entries[skip:]
+			if args.PrevLogIndex < cm.snapshotIndex {
+				args.PrevLogIndex = cm.snapshotIndex
+			}
+			args.PrevLogTerm = cm.snapshotTerm
+		}
 
 		// Does our log contain an entry at PrevLogIndex whose term matches
 		// PrevLogTerm? Note that in the extreme case of PrevLogIndex=-1 this is
 		// vacuously true.
 		if args.PrevLogIndex == -1 ||
-			(args.PrevLogIndex < len(cm.log) && args.PrevLogTerm == cm.log[args.PrevLogIndex].Term) {
+			(args.PrevLogIndex < cm.logLen() && args.PrevLogTerm == cm.termAt(args.PrevLogIndex)) {
 			reply.Success = true
 
 			// Find an insertion point - where there's a term mismatch between
@@ -352,10 +1219,10 @@ func (cm *ConsensusModule) AppendEntries(args AppendEntriesArgs, reply *AppendEn
 			newEntriesIndex := 0
 
 			for {
-				if logInsertIndex >= len(cm.log) || newEntriesIndex >= len(args.Entries) {
+				if logInsertIndex >= cm.logLen() || newEntriesIndex >= len(args.Entries) {
 					break
 				}
-				if cm.log[logInsertIndex].Term != args.Entries[newEntriesIndex].Term {
+				if cm.termAt(logInsertIndex) != args.Entries[newEntriesIndex].Term {
 					break
 				}
 				logInsertIndex++
@@ -368,13 +1235,18 @@ func (cm *ConsensusModule) AppendEntries(args AppendEntriesArgs, reply *AppendEn
 			//   term mismatches with the corresponding log entry
 			if newEntriesIndex < len(args.Entries) {
 				cm.dlog("... inserting entries %v from index %d", args.Entries[newEntriesIndex:], logInsertIndex)
-				cm.log = append(cm.log[:logInsertIndex], args.Entries[newEntriesIndex:]...)
+				cm.truncateLog(logInsertIndex)
+				cm.appendLog(args.Entries[newEntriesIndex:]...)
+				cm.persistedLogLen = min(cm.persistedLogLen, logInsertIndex)
+				cm.durableLogLen = min(cm.durableLogLen, logInsertIndex)
 				cm.dlog("... log is now: %v", cm.log)
 			}
 
-			// Set commit index.
-			if args.LeaderCommit > cm.commitIndex {
-				cm.commitIndex = min(args.LeaderCommit, len(cm.log)-1)
+			// Set commit index. The leader only vouched for our log up to the
+			// last entry it sent: entries after it may be a stale tail that the
+			// leader hasn't overwritten yet, e.g. while catch-up is throttled.
+			if commitIndex := min(args.LeaderCommit, args.PrevLogIndex+len(args.Entries)); commitIndex > cm.commitIndex {
+				cm.commitIndex = commitIndex
 				cm.dlog("... setting commitIndex=%d", cm.commitIndex)
 				cm.newCommitReadyChan <- struct{}{}
 			}
@@ -382,21 +1254,14 @@ func (cm *ConsensusModule) AppendEntries(args AppendEntriesArgs, reply *AppendEn
 			// No match for PrevLogIndex/PrevLogTerm. Populate
 			// ConflictIndex/ConflictTerm to help the leader bring us up to date
 			// quickly.
-			if args.PrevLogIndex >= len(cm.log) {
-				reply.ConflictIndex = len(cm.log)
+			if args.PrevLogIndex >= cm.logLen() {
+				reply.ConflictIndex = cm.logLen()
 				reply.ConflictTerm = -1
 			} else {
 				// PrevLogIndex points within our log, but PrevLogTerm doesn't match
-				// cm.log[PrevLogIndex].
-				reply.ConflictTerm = cm.log[args.PrevLogIndex].Term
-
-				var i int
-				for i = args.PrevLogIndex - 1; i >= 0; i-- {
-					if cm.log[i].Term != reply.ConflictTerm {
-						break
-					}
-				}
-				reply.ConflictIndex = i + 1
+				// the term of our entry at PrevLogIndex.
+				reply.ConflictTerm = cm.termAt(args.PrevLogIndex)
+				reply.ConflictIndex = cm.firstIndexOfRun(args.PrevLogIndex)
 			}
 		}
 	}
@@ -407,73 +1272,325 @@ func (cm *ConsensusModule) AppendEntries(args AppendEntriesArgs, reply *AppendEn
 	return nil
 }
 
+// See figure 13 in the paper.
+type InstallSnapshotArgs struct {
+	Term     int
+	LeaderId int
+
+	LastIncludedIndex int
+	LastIncludedTerm  int
+
+	// Offset is where Data goes in the snapshot; Done is set on the last
+	// chunk.
+	Offset int
+	Data   []byte
+	Done   bool
+}
+
+type InstallSnapshotReply struct {
+	Term int
+}
+
+// InstallSnapshot RPC. The leader sends its snapshot in chunks to followers
+// that need entries it has already discarded. Once the last chunk arrives,
+// the follower keeps the part of its log that follows the snapshot if it
+// matches, discards the rest, and hands the snapshot to its client.
+func (cm *ConsensusModule) InstallSnapshot(args InstallSnapshotArgs, reply *InstallSnapshotReply) error {
+	cm.mu.Lock()
+	defer cm.waitDurable()
+	defer cm.mu.Unlock()
+	if cm.state == Dead {
+		return nil
+	}
+	cm.dlog("InstallSnapshot: index=%d term=%d offset=%d len=%d done=%v",
+		args.LastIncludedIndex, args.LastIncludedTerm, args.Offset, len(args.Data), args.Done)
+
+	if args.Term > cm.currentTerm {
+		cm.dlog("... term out of date in InstallSnapshot")
+		cm.becomeFollower(args.Term)
+	}
+	reply.Term = cm.currentTerm
+	if args.Term < cm.currentTerm {
+		return nil
+	}
+	if cm.state != Follower {
+		cm.becomeFollower(args.Term)
+	}
+	cm.heardFromLeader(args.LeaderId)
+
+	if args.Offset == 0 {
+		cm.incomingSnapshot = nil
+		cm.incomingSnapshotIndex = args.LastIncludedIndex
+	}
+	if args.LastIncludedIndex != cm.incomingSnapshotIndex || args.Offset != len(cm.incomingSnapshot) {
+		// A chunk of another transfer, or out of order; the leader starts over
+		// when it finds out we still lag behind.
+		cm.incomingSnapshot = nil
+		cm.incomingSnapshotIndex = -1
+		return nil
+	}
+	cm.incomingSnapshot = append(cm.incomingSnapshot, args.Data...)
+	if !args.Done {
+		return nil
+	}
+
+	snapshot := cm.incomingSnapshot
+	cm.incomingSnapshot = nil
+	cm.incomingSnapshotIndex = -1
+	if args.LastIncludedIndex <= cm.snapshotIndex {
+		return nil
+	}
+
+	if args.LastIncludedIndex < cm.logLen() && cm.termAt(args.LastIncludedIndex) == args.LastIncludedTerm {
+		cm.log = append([]LogEntry(nil), cm.entriesFrom(args.LastIncludedIndex+1)...)
+	} else {
+		cm.log = nil
+		cm.durableLogLen = min(cm.durableLogLen, args.LastIncludedIndex+1)
+	}
+	cm.snapshot, cm.snapshotIndex, cm.snapshotTerm = snapshot, args.LastIncludedIndex, args.LastIncludedTerm
+	cm.trimTermRuns()
+	cm.persistSnapshot()
+	cm.dlog("... installed snapshot at index=%d; log is now: %v", cm.snapshotIndex, cm.log)
+
+	if args.LastIncludedIndex > cm.commitIndex {
+		cm.commitIndex = args.LastIncludedIndex
+	}
+	cm.newCommitReadyChan <- struct{}{}
+	return nil
+}
+
+type TimeoutNowArgs struct {
+	Term     int
+	LeaderId int
+}
+
+type TimeoutNowReply struct {
+	Term int
+}
+
+// TimeoutNow RPC. A leader that transfers its leadership to this CM (see
+// TransferLeadership) sends it once this CM's log has caught up, and this CM
+// starts an election right away, skipping the pre-vote.
+func (cm *ConsensusModule) TimeoutNow(args TimeoutNowArgs, reply *TimeoutNowReply) error {
+	cm.mu.Lock()
+	defer cm.mu.Unlock()
+	if cm.state == Dead {
+		return nil
+	}
+	cm.dlog("TimeoutNow: %+v", args)
+	if args.Term == cm.currentTerm && cm.state == Follower && !cm.learner {
+		cm.startElection(true)
+	}
+	reply.Term = cm.currentTerm
+	return nil
+}
+
 // electionTimeout generates a pseudo-random election timeout duration.
+// Expects cm.mu to be locked.
 func (cm *ConsensusModule) electionTimeout() time.Duration {
+	minTimeout := cm.minElectionTimeout()
 	// If RAFT_FORCE_MORE_REELECTION is set, stress-test by deliberately
 	// generating a hard-coded number very often. This will create collisions
 	// between different servers and force more re-elections.
 	if len(os.Getenv("RAFT_FORCE_MORE_REELECTION")) > 0 && rand.Intn(3) == 0 {
-		return time.Duration(150) * time.Millisecond
+		return minTimeout
 	} else {
-		return time.Duration(150+rand.Intn(150)) * time.Millisecond
+		return minTimeout + time.Duration(rand.Int63n(int64(minTimeout)))
 	}
 }
 
-// runElectionTimer implements an election timer. It should be launched whenever
-// we want to start a timer towards becoming a candidate in a new election.
-//
-// This function is blocking and should be launched in a separate goroutine;
-// it's designed to work for a single (one-shot) election timer, as it exits
-// whenever the CM state changes from follower/candidate or the term changes.
-func (cm *ConsensusModule) runElectionTimer() {
-	timeoutDuration := cm.electionTimeout()
+// minElectionTimeout returns the shortest election timeout this CM may pick:
+// Config.ElectionTimeout, lengthened to fit the observed network with
+// Config.AdaptiveTiming.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) minElectionTimeout() time.Duration {
+	timeout := cm.config.minElectionTimeout()
+	if cm.config.AdaptiveTiming {
+		timeout = max(timeout,
+			adaptiveElectionRTTs*cm.peerRTTPercentile(),
+			adaptiveElectionGaps*cm.leaderGaps.percentile(adaptivePercentile))
+		timeout = min(timeout, adaptiveMaxElectionScale*cm.config.minElectionTimeout())
+	}
+	return timeout
+}
+
+// heartbeatInterval returns the interval between a leader's heartbeats:
+// Config.HeartbeatInterval, lengthened to fit the observed round trip times
+// with Config.AdaptiveTiming.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) heartbeatInterval() time.Duration {
+	interval := cm.config.heartbeatInterval()
+	if cm.config.AdaptiveTiming {
+		maxInterval := cm.config.minElectionTimeout() / adaptiveHeartbeatsPerElection
+		interval = max(interval, min(cm.peerRTTPercentile(), maxInterval))
+	}
+	return interval
+}
+
+// recordRTT records the round trip time of an RPC to a peer for
+// Config.AdaptiveTiming.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) recordRTT(peerId int, rtt time.Duration) {
+	if !cm.config.AdaptiveTiming {
+		return
+	}
+	w := cm.peerRTT[peerId]
+	if w == nil {
+		w = new(latencyWindow)
+		cm.peerRTT[peerId] = w
+	}
+	w.add(rtt)
+}
+
+// peerRTTPercentile returns the adaptivePercentile round trip time to the
+// slowest peer, or 0 without measurements.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) peerRTTPercentile() time.Duration {
+	var rtt time.Duration
+	for _, w := range cm.peerRTT {
+		rtt = max(rtt, w.percentile(adaptivePercentile))
+	}
+	return rtt
+}
+
+// heardFromLeader records contact with leaderId, the leader of the current
+// term, which postpones elections.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) heardFromLeader(leaderId int) {
+	now := time.Now()
+	if cm.config.AdaptiveTiming && leaderId == cm.leaderId && !cm.leaderContact.IsZero() {
+		cm.leaderGaps.add(now.Sub(cm.leaderContact))
+	}
+	cm.leaderContact = now
+	cm.leaderId = leaderId
+	cm.resetElectionTimer()
+}
+
+// latencyWindow holds the latest latencyWindowSize durations added to it.
+type latencyWindow struct {
+	samples [latencyWindowSize]time.Duration
+	n       int
+}
+
+func (w *latencyWindow) add(d time.Duration) {
+	w.samples[w.n%len(w.samples)] = d
+	w.n++
+}
+
+// percentile returns the p-th percentile (0 < p <= 1) of the durations in w,
+// or 0 if it's empty.
+func (w *latencyWindow) percentile(p float64) time.Duration {
+	var buf [latencyWindowSize]time.Duration
+	sorted := buf[:min(w.n, len(w.samples))]
+	if len(sorted) == 0 {
+		return 0
+	}
+	copy(sorted, w.samples[:])
+	slices.Sort(sorted)
+	rank := int(math.Ceil(p * float64(len(sorted))))
+	return sorted[max(rank, 1)-1]
+}
+
+// resetElectionTimer restarts the countdown to an election, with a new random
+// timeout. Followers and candidates call it whenever they hear from a leader,
+// grant a vote or start an election.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) resetElectionTimer() {
+	timeout := cm.electionTimeout()
+	cm.electionDeadline = time.Now().Add(timeout)
+	if cm.electionTimer != nil {
+		cm.electionTimer.Reset(timeout)
+	}
+	cm.dlog("election timer reset (%v), term=%d", timeout, cm.currentTerm)
+}
+
+// electionTimerFired runs when the election timer expires, and starts an
+// election if this CM hasn't heard from a leader or voted for someone since
+// the timer was last reset.
+func (cm *ConsensusModule) electionTimerFired() {
 	cm.mu.Lock()
-	termStarted := cm.currentTerm
-	cm.mu.Unlock()
-	cm.dlog("election timer started (%v), term=%d", timeoutDuration, termStarted)
-
-	// This loops until either:
-	// - we discover the election timer is no longer needed, or
-	// - the election timer expires and this CM becomes a candidate
-	// In a follower, this typically keeps running in the background for the
-	// duration of the CM's lifetime.
-	ticker := time.NewTicker(10 * time.Millisecond)
-	defer ticker.Stop()
-	for {
-		<-ticker.C
+	defer cm.mu.Unlock()
+	if cm.state != Candidate && cm.state != Follower {
+		cm.dlog("in election timer state=%s, bailing out", cm.state)
+		return
+	}
+	// The timer may have been reset while this call waited for the lock; it
+	// then runs again at the new deadline.
+	if time.Now().Before(cm.electionDeadline) {
+		return
+	}
+	if cm.config.PreVote {
+		cm.startPreVote()
+	} else {
+		cm.startElection(false)
+	}
+}
 
-		cm.mu.Lock()
-		if cm.state != Candidate && cm.state != Follower {
-			cm.dlog("in election timer state=%s, bailing out", cm.state)
-			cm.mu.Unlock()
-			return
-		}
+// startPreVote asks the peers whether they would vote for this CM in the next
+// term, and starts an election once a majority would; see Config.PreVote.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) startPreVote() {
+	cm.preVoteRound++
+	savedRound := cm.preVoteRound
+	savedCurrentTerm := cm.currentTerm
+	startedAt := time.Now()
+	lastLogIndex, lastLogTerm := cm.lastLogIndexAndTerm()
+	cm.dlog("starts pre-vote for term %d", savedCurrentTerm+1)
 
-		if termStarted != cm.currentTerm {
-			cm.dlog("in election timer term changed from %d to %d, bailing out", termStarted, cm.currentTerm)
-			cm.mu.Unlock()
-			return
-		}
+	votesReceived := 1
+	for _, peerId := range cm.peerIds {
+		go func() {
+			args := RequestVoteArgs{
+				Term:         savedCurrentTerm + 1,
+				CandidateId:  cm.id,
+				LastLogIndex: lastLogIndex,
+				LastLogTerm:  lastLogTerm,
+				PreVote:      true,
+			}
 
-		// Start an election if we haven't heard from a leader or haven't voted for
-		// someone for the duration of the timeout.
-		if elapsed := time.Since(cm.electionResetEvent); elapsed >= timeoutDuration {
-			cm.startElection()
-			cm.mu.Unlock()
-			return
-		}
-		cm.mu.Unlock()
+			cm.dlog("sending pre-vote RequestVote to %d: %+v", peerId, args)
+			sentAt := time.Now()
+			var reply RequestVoteReply
+			if err := cm.server.Call(peerId, "ConsensusModule.RequestVote", args, &reply); err == nil {
+				cm.mu.Lock()
+				defer cm.mu.Unlock()
+				cm.dlog("received pre-vote RequestVoteReply %+v", reply)
+				cm.recordRTT(peerId, time.Since(sentAt))
+
+				if (cm.state != Follower && cm.state != Candidate) ||
+					cm.currentTerm != savedCurrentTerm || cm.preVoteRound != savedRound {
+					return
+				}
+				if reply.Term > savedCurrentTerm && !reply.VoteGranted {
+					cm.dlog("term out of date in pre-vote RequestVoteReply")
+					cm.becomeFollower(reply.Term)
+					return
+				}
+				if reply.VoteGranted {
+					votesReceived += 1
+					// A leader may have reached us while we waited for the majority.
+					if votesReceived*2 > len(cm.peerIds)+1 && cm.leaderContact.Before(startedAt) {
+						cm.dlog("wins pre-vote with %d votes", votesReceived)
+						cm.startElection(false)
+					}
+				}
+			}
+		}()
 	}
+
+	// Try again after another election timeout, in case this pre-vote fails.
+	cm.resetElectionTimer()
 }
 
-// startElection starts a new election with this CM as a candidate.
+// startElection starts a new election with this CM as a candidate; transfer
+// is set if it was asked to by TimeoutNow.
 // Expects cm.mu to be locked.
-func (cm *ConsensusModule) startElection() {
+func (cm *ConsensusModule) startElection(transfer bool) {
 	cm.state = Candidate
 	cm.currentTerm += 1
 	savedCurrentTerm := cm.currentTerm
-	cm.electionResetEvent = time.Now()
 	cm.votedFor = cm.id
+	cm.leaderId = -1
 	cm.dlog("becomes Candidate (currentTerm=%d); log=%v", savedCurrentTerm, cm.log)
 
 	votesReceived := 1
@@ -486,18 +1603,21 @@ func (cm *ConsensusModule) startElection() {
 			cm.mu.Unlock()
 
 			args := RequestVoteArgs{
-				Term:         savedCurrentTerm,
-				CandidateId:  cm.id,
-				LastLogIndex: savedLastLogIndex,
-				LastLogTerm:  savedLastLogTerm,
+				Term:               savedCurrentTerm,
+				CandidateId:        cm.id,
+				LastLogIndex:       savedLastLogIndex,
+				LastLogTerm:        savedLastLogTerm,
+				LeadershipTransfer: transfer,
 			}
 
 			cm.dlog("sending RequestVote to %d: %+v", peerId, args)
+			sentAt := time.Now()
 			var reply RequestVoteReply
 			if err := cm.server.Call(peerId, "ConsensusModule.RequestVote", args, &reply); err == nil {
 				cm.mu.Lock()
 				defer cm.mu.Unlock()
 				cm.dlog("received RequestVoteReply %+v", reply)
+				cm.recordRTT(peerId, time.Since(sentAt))
 
 				if cm.state != Candidate {
 					cm.dlog("while waiting for reply, state = %v", cm.state)
@@ -523,8 +1643,8 @@ func (cm *ConsensusModule) startElection() {
 		}()
 	}
 
-	// Run another election timer, in case this election is not successful.
-	go cm.runElectionTimer()
+	// Time out this election, in case it's not successful.
+	cm.resetElectionTimer()
 }
 
 // becomeFollower makes cm a follower and resets its state.
@@ -534,25 +1654,66 @@ func (cm *ConsensusModule) becomeFollower(term int) {
 	cm.state = Follower
 	cm.currentTerm = term
 	cm.votedFor = -1
-	cm.electionResetEvent = time.Now()
+	cm.leaderId = -1
+	cm.endTransfer()
+	cm.resetElectionTimer()
+}
+
+// stepDown makes a leader a follower in its current term. Unlike
+// becomeFollower, it keeps votedFor, so cm can't vote for another candidate
+// in the term it was elected in.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) stepDown() {
+	cm.dlog("steps down in term=%d", cm.currentTerm)
+	cm.state = Follower
+	cm.leaderId = -1
+	cm.endTransfer()
+	cm.resetElectionTimer()
+}
 
-	go cm.runElectionTimer()
+// quorumActive reports whether a majority of the servers, counting this
+// leader, has been in contact within the minimal election timeout.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) quorumActive() bool {
+	active := 1
+	for _, peerId := range cm.peerIds {
+		if time.Since(cm.peerContact[peerId]) < cm.minElectionTimeout() {
+			active++
+		}
+	}
+	return active*2 > len(cm.peerIds)+1
 }
 
 // startLeader switches cm into a leader state and begins process of heartbeats.
 // Expects cm.mu to be locked.
 func (cm *ConsensusModule) startLeader() {
 	cm.state = Leader
-
-	for _, peerId := range cm.peerIds {
-		cm.nextIndex[peerId] = len(cm.log)
+	cm.leaderId = cm.id
+	if cm.electionTimer != nil {
+		cm.electionTimer.Stop()
+	}
+	// Entries of this term are appended by Submit, which extends
+	// durableLogLen once they are durable; earlier entries are never
+	// counted, so durability from past terms needn't be tracked.
+	cm.durableLogLen = 0
+	cm.leaseExpiry = time.Time{}
+
+	for _, peerId := range cm.replicaIds {
+		cm.peerContact[peerId] = time.Now()
+		cm.nextIndex[peerId] = cm.logLen()
 		cm.matchIndex[peerId] = -1
+		cm.probing[peerId] = true
+		cm.sentIndex[peerId] = cm.nextIndex[peerId]
+		cm.inflight[peerId] = 0
+		delete(cm.catchUpBudget, peerId)
+		delete(cm.catchUpRefilled, peerId)
+		delete(cm.ackSent, peerId)
 	}
 	cm.dlog("becomes Leader; term=%d, nextIndex=%v, matchIndex=%v; log=%v", cm.currentTerm, cm.nextIndex, cm.matchIndex, cm.log)
 
 	// This goroutine runs in the background and sends AEs to peers:
 	// * Whenever something is sent on triggerAEChan
-	// * ... Or every 50 ms, if no events occur on triggerAEChan
+	// * ... Or every heartbeat interval, if no events occur on triggerAEChan
 	go func(heartbeatTimeout time.Duration) {
 		// Immediately send AEs to peers.
 		cm.leaderSendAEs()
@@ -589,15 +1750,24 @@ func (cm *ConsensusModule) startLeader() {
 					cm.mu.Unlock()
 					return
 				}
+				if cm.config.CheckQuorum && !cm.quorumActive() {
+					cm.dlog("steps down: no reply from a majority within the election timeout")
+					cm.stepDown()
+					cm.mu.Unlock()
+					return
+				}
+				heartbeatTimeout = cm.heartbeatInterval()
 				cm.mu.Unlock()
 				cm.leaderSendAEs()
 			}
 		}
-	}(10 * time.Millisecond)
+	}(cm.heartbeatInterval())
 }
 
-// leaderSendAEs sends a round of AEs to all peers, collects their
-// replies and adjusts cm's state.
+// leaderSendAEs sends a round of AEs to all peers, learners included,
+// collects their replies and adjusts cm's state. A peer whose pipeline is
+// full (see cm.probing) is skipped; the AEs in flight to it serve as
+// heartbeats.
 func (cm *ConsensusModule) leaderSendAEs() {
 	cm.mu.Lock()
 	if cm.state != Leader {
@@ -607,16 +1777,30 @@ func (cm *ConsensusModule) leaderSendAEs() {
 	savedCurrentTerm := cm.currentTerm
 	cm.mu.Unlock()
 
-	for _, peerId := range cm.peerIds {
+	for _, peerId := range cm.replicaIds {
 		go func() {
 			cm.mu.Lock()
-			ni := cm.nextIndex[peerId]
-			prevLogIndex := ni - 1
-			prevLogTerm := -1
-			if prevLogIndex >= 0 {
-				prevLogTerm = cm.log[prevLogIndex].Term
+			if cm.state != Leader || cm.currentTerm != savedCurrentTerm {
+				cm.mu.Unlock()
+				return
+			}
+			ni, window := cm.sentIndex[peerId], cm.maxInflightAppends()
+			if cm.probing[peerId] {
+				ni, window = cm.nextIndex[peerId], 1
+			}
+			if cm.inflight[peerId] >= window {
+				cm.mu.Unlock()
+				return
+			}
+			if ni <= cm.snapshotIndex {
+				// The entries this peer needs were compacted away.
+				cm.mu.Unlock()
+				cm.sendSnapshot(peerId, savedCurrentTerm)
+				return
 			}
-			entries := cm.log[ni:]
+			prevLogIndex := ni - 1
+			prevLogTerm := cm.termAt(prevLogIndex)
+			entries := cm.appendBatch(peerId, ni)
 
 			args := AppendEntriesArgs{
 				Term:         savedCurrentTerm,
@@ -626,11 +1810,27 @@ func (cm *ConsensusModule) leaderSendAEs() {
 				Entries:      entries,
 				LeaderCommit: cm.commitIndex,
 			}
+			cm.sentIndex[peerId] = ni + len(entries)
+			cm.inflight[peerId]++
 			cm.mu.Unlock()
 			cm.dlog("sending AppendEntries to %v: ni=%d, args=%+v", peerId, ni, args)
+			sentAt := time.Now()
 			var reply AppendEntriesReply
-			if err := cm.server.Call(peerId, "ConsensusModule.AppendEntries", args, &reply); err == nil {
-				cm.mu.Lock()
+			err := cm.server.Call(peerId, "ConsensusModule.AppendEntries", args, &reply)
+			cm.mu.Lock()
+			if cm.state == Leader && cm.currentTerm == savedCurrentTerm {
+				cm.inflight[peerId]--
+				if err != nil {
+					// The peer may have missed these entries; go back to the last
+					// acknowledged point.
+					cm.probing[peerId] = true
+					cm.sentIndex[peerId] = cm.nextIndex[peerId]
+				}
+			}
+			if err != nil {
+				cm.mu.Unlock()
+			} else {
+				cm.recordRTT(peerId, time.Since(sentAt))
 				// Unfortunately, we cannot just defer mu.Unlock() here, because one
 				// of the conditional paths needs to send on some channels. So we have
 				// to carefully place mu.Unlock() on all exit paths from this point
@@ -643,24 +1843,17 @@ func (cm *ConsensusModule) leaderSendAEs() {
 				}
 
 				if cm.state == Leader && savedCurrentTerm == reply.Term {
+					cm.recordAck(peerId, sentAt)
 					if reply.Success {
-						cm.nextIndex[peerId] = ni + len(entries)
-						cm.matchIndex[peerId] = cm.nextIndex[peerId] - 1
+						// Replies to pipelined AEs may arrive out of order.
+						cm.nextIndex[peerId] = max(cm.nextIndex[peerId], ni+len(entries))
+						cm.matchIndex[peerId] = max(cm.matchIndex[peerId], ni+len(entries)-1)
+						cm.probing[peerId] = false
+						cm.sentIndex[peerId] = max(cm.sentIndex[peerId], cm.nextIndex[peerId])
+						cm.maybeSendTimeoutNow(peerId)
 
 						savedCommitIndex := cm.commitIndex
-						for i := cm.commitIndex + 1; i < len(cm.log); i++ {
-							if cm.log[i].Term == cm.currentTerm {
-								matchCount := 1
-								for _, peerId := range cm.peerIds {
-									if cm.matchIndex[peerId] >= i {
-										matchCount++
-									}
-								}
-								if matchCount*2 > len(cm.peerIds)+1 {
-									cm.commitIndex = i
-								}
-							}
-						}
+						cm.advanceCommitIndex()
 						cm.dlog("AppendEntries reply from %d success: nextIndex := %v, matchIndex := %v; commitIndex := %d", peerId, cm.nextIndex, cm.matchIndex, cm.commitIndex)
 						if cm.commitIndex != savedCommitIndex {
 							cm.dlog("leader sets commitIndex := %d", cm.commitIndex)
@@ -669,19 +1862,22 @@ func (cm *ConsensusModule) leaderSendAEs() {
 							// leader's clients, and notify followers by sending them AEs.
 							cm.mu.Unlock()
 							cm.newCommitReadyChan <- struct{}{}
-							cm.triggerAEChan <- struct{}{}
+							cm.triggerAE()
+						} else if len(entries) > 0 && cm.sentIndex[peerId] < cm.logLen() {
+							// Entries were held back by a full pipeline or the batch
+							// limits; send them now.
+							cm.mu.Unlock()
+							cm.triggerAE()
 						} else {
 							cm.mu.Unlock()
 						}
+					} else if args.PrevLogIndex <= cm.matchIndex[peerId] {
+						// A pipelined AE overtaken by a later one; the peer has matched
+						// past it since.
+						cm.mu.Unlock()
 					} else {
 						if reply.ConflictTerm >= 0 {
-							lastIndexOfTerm := -1
-							for i := len(cm.log) - 1; i >= 0; i-- {
-								if cm.log[i].Term == reply.ConflictTerm {
-									lastIndexOfTerm = i
-									break
-								}
-							}
+							lastIndexOfTerm := cm.lastIndexOfTerm(reply.ConflictTerm)
 							if lastIndexOfTerm >= 0 {
 								cm.nextIndex[peerId] = lastIndexOfTerm + 1
 							} else {
@@ -690,7 +1886,10 @@ func (cm *ConsensusModule) leaderSendAEs() {
 						} else {
 							cm.nextIndex[peerId] = reply.ConflictIndex
 						}
-						cm.dlog("AppendEntries reply from %d !success: nextIndex := %d", peerId, ni-1)
+						cm.nextIndex[peerId] = max(cm.nextIndex[peerId], cm.matchIndex[peerId]+1)
+						cm.probing[peerId] = true
+						cm.sentIndex[peerId] = cm.nextIndex[peerId]
+						cm.dlog("AppendEntries reply from %d !success: nextIndex := %d", peerId, cm.nextIndex[peerId])
 						cm.mu.Unlock()
 					}
 				} else {
@@ -701,48 +1900,245 @@ func (cm *ConsensusModule) leaderSendAEs() {
 	}
 }
 
+// advanceCommitIndex sets commitIndex to the highest index stored on a
+// majority of servers, if it's higher and from the current term (see
+// section 5.4.2 of the paper). The leader counts itself for the entries it
+// has made durable. This takes O(peers log peers), regardless of how many
+// entries are uncommitted.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) advanceCommitIndex() {
+	selfMatch := cm.logLen() - 1
+	if _, ok := cm.storage.(DurableStorage); ok {
+		selfMatch = min(selfMatch, cm.durableLogLen-1)
+	}
+	matches := append(cm.matchBuf[:0], selfMatch)
+	for _, peerId := range cm.peerIds {
+		matches = append(matches, cm.matchIndex[peerId])
+	}
+	cm.matchBuf = matches
+
+	// With n servers, the (n/2+1)-th largest match index is stored on a
+	// majority.
+	sort.Sort(sort.Reverse(sort.IntSlice(matches)))
+	quorumIndex := matches[len(matches)/2]
+	if quorumIndex > cm.commitIndex && cm.termAt(quorumIndex) == cm.currentTerm {
+		cm.commitIndex = quorumIndex
+	}
+}
+
+// appendBatch returns the entries from index ni on that the leader sends
+// peerId in one AppendEntries, within Config.MaxAppendEntries and
+// Config.MaxAppendBytes. If more entries remain after the batch, the peer is
+// catching up and the batch is charged to its catch-up budget; while the
+// budget is exhausted, appendBatch returns no entries, so the AppendEntries is
+// just a heartbeat.
+// Expects cm.mu to be locked.
+func (cm *ConsensusModule) appendBatch(peerId int, ni int) []LogEntry {
+	entries := cm.entriesFrom(ni)
+	maxEntries, maxBytes := cm.config.MaxAppendEntries, cm.config.MaxAppendBytes
+	if maxEntries <= 0 {
+		maxEntries = defaultMaxAppendEntries
+	}
+	if maxBytes <= 0 {
+		maxBytes = defaultMaxAppendBytes
+	}
+
+	n, size := 0, 0
+	for n < len(entries) && n < maxEntries {
+		entrySize := approxEntryBytes(entries[n])
+		if n > 0 && size+entrySize > maxBytes {
+			break
+		}
+		n++
+		size += entrySize
+	}
+	if n == len(entries) || cm.config.CatchUpBytesPerSecond <= 0 {
+		return entries[:n]
+	}
+
+	rate := float64(cm.config.CatchUpBytesPerSecond)
+	now := time.Now()
+	budget, ok := cm.catchUpBudget[peerId]
+	if !ok {
+		budget = float64(maxBytes)
+	} else {
+		budget += now.Sub(cm.catchUpRefilled[peerId]).Seconds() * rate
+		budget = min(budget, float64(maxBytes))
+	}
+	cm.catchUpRefilled[peerId] = now
+	if budget <= 0 {
+		cm.catchUpBudget[peerId] = budget
+		return nil
+	}
+	cm.catchUpBudget[peerId] = budget - float64(size)
+	return entries[:n]
+}
+
+// approxEntryBytes estimates the encoded size of entry. Payloads and common
+// command types are sized directly; others are gob-encoded.
+func approxEntryBytes(entry LogEntry) int {
+	const overhead = 16
+	switch cmd := entry.Command.(type) {
+	case nil:
+		return overhead + len(entry.Payload)
+	case string:
+		return overhead + len(cmd)
+	case []byte:
+		return overhead + len(cmd)
+	case int, int64, uint64, float64, bool:
+		return overhead + 8
+	}
+	var buf bytes.Buffer
+	if err := gob.NewEncoder(&buf).Encode(entry); err != nil {
+		return overhead
+	}
+	return buf.Len()
+}
+
+// maxInflightAppends returns the pipeline depth per peer; see
+// Config.MaxInflightAppends.
+func (cm *ConsensusModule) maxInflightAppends() int {
+	if cm.config.MaxInflightAppends <= 0 {
+		return defaultMaxInflightAppends
+	}
+	return cm.config.MaxInflightAppends
+}
+
 // lastLogIndexAndTerm returns the last log index and the last log entry's term
 // (or -1 if there's no log) for this server.
 // Expects cm.mu to be locked.
 func (cm *ConsensusModule) lastLogIndexAndTerm() (int, int) {
-	if len(cm.log) > 0 {
-		lastIndex := len(cm.log) - 1
-		return lastIndex, cm.log[lastIndex].Term
-	} else {
-		return -1, -1
+	lastIndex := cm.logLen() - 1
+	return lastIndex, cm.termAt(lastIndex)
+}
+
+// sendSnapshot sends cm's snapshot to peerId in chunks of
+// Config.SnapshotChunkBytes, one InstallSnapshot RPC at a time, and advances
+// the peer's nextIndex past it once the last chunk is acknowledged. It
+// returns early if another transfer to this peer is in progress, an RPC
+// fails or cm stops being the leader of term.
+func (cm *ConsensusModule) sendSnapshot(peerId int, term int) {
+	cm.mu.Lock()
+	if cm.snapshotSending[peerId] || cm.state != Leader || cm.currentTerm != term {
+		cm.mu.Unlock()
+		return
+	}
+	cm.snapshotSending[peerId] = true
+	snapshot, index, snapshotTerm := cm.snapshot, cm.snapshotIndex, cm.snapshotTerm
+	cm.mu.Unlock()
+	defer func() {
+		cm.mu.Lock()
+		delete(cm.snapshotSending, peerId)
+		cm.mu.Unlock()
+	}()
+
+	chunkBytes := cm.config.SnapshotChunkBytes
+	if chunkBytes <= 0 {
+		chunkBytes = defaultSnapshotChunkBytes
+	}
+	for offset := 0; ; offset += chunkBytes {
+		end := min(offset+chunkBytes, len(snapshot))
+		args := InstallSnapshotArgs{
+			Term:              term,
+			LeaderId:          cm.id,
+			LastIncludedIndex: index,
+			LastIncludedTerm:  snapshotTerm,
+			Offset:            offset,
+			Data:              snapshot[offset:end],
+			Done:              end == len(snapshot),
+		}
+		cm.dlog("sending InstallSnapshot to %v: index=%d offset=%d len=%d", peerId, index, offset, len(args.Data))
+		var reply InstallSnapshotReply
+		if err := cm.server.Call(peerId, "ConsensusModule.InstallSnapshot", args, &reply); err != nil {
+			return
+		}
+
+		cm.mu.Lock()
+		if reply.Term > cm.currentTerm {
+			cm.dlog("term out of date in InstallSnapshot reply")
+			cm.becomeFollower(reply.Term)
+			cm.mu.Unlock()
+			return
+		}
+		if cm.state != Leader || cm.currentTerm != term {
+			cm.mu.Unlock()
+			return
+		}
+		cm.peerContact[peerId] = time.Now()
+		if args.Done {
+			cm.nextIndex[peerId] = max(cm.nextIndex[peerId], index+1)
+			cm.matchIndex[peerId] = max(cm.matchIndex[peerId], index)
+			cm.sentIndex[peerId] = max(cm.sentIndex[peerId], cm.nextIndex[peerId])
+			cm.dlog("InstallSnapshot to %d done: nextIndex := %d", peerId, cm.nextIndex[peerId])
+			cm.mu.Unlock()
+			return
+		}
+		cm.mu.Unlock()
 	}
 }
 
 // commitChanSender is responsible for sending committed entries on
-// cm.commitChan. It watches newCommitReadyChan for notifications and calculates
-// which new entries are ready to be sent. This method should run in a separate
-// background goroutine; cm.commitChan may be buffered and will limit how fast
-// the client consumes new committed entries. Returns when newCommitReadyChan is
-// closed.
+// cm.commitChan, or cm.commitBatchChan. It watches newCommitReadyChan for
+// notifications and calculates which new entries are ready to be sent. This
+// method should run in a separate background goroutine; the commit channel may
+// be buffered and will limit how fast the client consumes new committed
+// entries. Returns when newCommitReadyChan is closed.
 func (cm *ConsensusModule) commitChanSender() {
 	defer cm.newCommitReadyChanWg.Done()
 
 	for range cm.newCommitReadyChan {
 		// Find which entries we have to apply.
 		cm.mu.Lock()
-		savedTerm := cm.currentTerm
+		var snapshot *CommitEntry
+		if cm.lastApplied < cm.snapshotIndex {
+			// The entries up to snapshotIndex are gone from the log; the client
+			// gets the snapshot instead.
+			snapshot = &CommitEntry{Snapshot: cm.snapshot, Index: cm.snapshotIndex, Term: cm.snapshotTerm}
+			cm.lastApplied = cm.snapshotIndex
+		}
 		savedLastApplied := cm.lastApplied
 		var entries []LogEntry
 		if cm.commitIndex > cm.lastApplied {
-			entries = cm.log[cm.lastApplied+1 : cm.commitIndex+1]
+			base := cm.snapshotIndex + 1
+			entries = cm.log[cm.lastApplied+1-base : cm.commitIndex+1-base]
 			cm.lastApplied = cm.commitIndex
 		}
 		cm.mu.Unlock()
 		cm.dlog("commitChanSender entries=%v, savedLastApplied=%d", entries, savedLastApplied)
 
+		if cm.commitBatchChan != nil {
+			if snapshot == nil && len(entries) == 0 {
+				continue
+			}
+			batch := make([]CommitEntry, 0, len(entries)+1)
+			if snapshot != nil {
+				batch = append(batch, *snapshot)
+			}
+			for i, entry := range entries {
+				batch = append(batch, commitEntryFor(entry, savedLastApplied+i+1))
+			}
+			cm.dlog("send batch of %d on commitBatchChan", len(batch))
+			cm.commitBatchChan <- batch
+			continue
+		}
+
+		if snapshot != nil {
+			cm.dlog("send snapshot on commitchan index=%d", snapshot.Index)
+			cm.commitChan <- *snapshot
+		}
+
 		for i, entry := range entries {
 			cm.dlog("send on commitchan i=%v, entry=%v", i, entry)
-			cm.commitChan <- CommitEntry{
-				Command: entry.Command,
-				Index:   savedLastApplied + i + 1,
-				Term:    savedTerm,
-			}
+			cm.commitChan <- commitEntryFor(entry, savedLastApplied+i+1)
 		}
 	}
 	cm.dlog("commitChanSender done")
 }
+
+// commitEntryFor returns the CommitEntry reporting entry, at log index index.
+func commitEntryFor(entry LogEntry, index int) CommitEntry {
+	if entry.Payload != nil {
+		return CommitEntry{Command: entry.Payload, Payload: entry.Payload, Index: index, Term: entry.Term}
+	}
+	return CommitEntry{Command: entry.Command, Index: index, Term: entry.Term}
+}
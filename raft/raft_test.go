@@ -3,6 +3,16 @@
 package raft
 
 import (
+	"encoding/gob"
+	"encoding/json"
+	"errors"
+	"fmt"
+	"net/rpc"
+	"path/filepath"
+	"reflect"
+	"strconv"
+	"sync"
+	"sync/atomic"
 	"testing"
 	"time"
 
@@ -201,6 +211,67 @@ func TestCommitAfterCallDrops(t *testing.T) {
 	h.CheckCommittedN(99, 3)
 }
 
+func TestReconnectBrokenPeerConnections(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarness(t, 3)
+	defer h.Shutdown()
+
+	// Break the leader's connections to its peers without disconnecting them.
+	lid, _ := h.CheckSingleLeader()
+	leader := h.cluster[lid]
+	leader.mu.Lock()
+	for _, client := range leader.peerClients {
+		client.Close()
+	}
+	leader.mu.Unlock()
+
+	h.SubmitToServer(lid, 7)
+	sleepMs(250)
+	h.CheckCommittedN(7, 3)
+}
+
+func TestPartitionLeaderWithFaultInjector(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarness(t, 3)
+	defer h.Shutdown()
+
+	// Partition the leader from both followers while all connections stay open.
+	origLeaderId, origTerm := h.CheckSingleLeader()
+	for i := 0; i < 3; i++ {
+		if i != origLeaderId {
+			h.Faults(origLeaderId).Partition(i)
+			h.Faults(i).Partition(origLeaderId)
+		}
+	}
+	h.SubmitToServer(origLeaderId, 5)
+	sleepMs(350)
+	h.CheckNotCommitted(5)
+
+	// The followers elect a new leader among themselves, but the partitioned
+	// leader doesn't hear of it and keeps its role.
+	newLeaderId, newTerm := -1, -1
+	for i := 0; i < 3; i++ {
+		if i != origLeaderId {
+			if _, term, isLeader := h.cluster[i].cm.Report(); isLeader {
+				newLeaderId, newTerm = i, term
+			}
+		}
+	}
+	if newLeaderId < 0 || newTerm <= origTerm {
+		t.Fatalf("got new leader %d in term %d, want one after term %d", newLeaderId, newTerm, origTerm)
+	}
+	h.SubmitToServer(newLeaderId, 6)
+
+	for i := 0; i < 3; i++ {
+		h.Faults(i).Heal()
+	}
+	sleepMs(350)
+	h.CheckNotCommitted(5)
+	h.CheckCommittedN(6, 3)
+}
+
 func TestSubmitNonLeaderFails(t *testing.T) {
 	h := NewHarness(t, 3)
 	defer h.Shutdown()
@@ -249,6 +320,36 @@ func TestCommitMultipleCommands(t *testing.T) {
 	}
 }
 
+func TestCommitBatch(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarness(t, 3)
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+
+	sid := (origLeaderId + 1) % 3
+	if h.SubmitBatchToServer(sid, []any{1, 2}) >= 0 {
+		t.Errorf("want id=%d !leader, but it is", sid)
+	}
+
+	first := h.SubmitBatchToServer(origLeaderId, []any{42, 55, 81})
+	if first < 0 {
+		t.Errorf("want id=%d leader, but it's not", origLeaderId)
+	}
+
+	sleepMs(250)
+	for i, v := range []int{42, 55, 81} {
+		nc, index := h.CheckCommitted(v)
+		if nc != 3 {
+			t.Errorf("want nc=3, got %d", nc)
+		}
+		if index != first+i {
+			t.Errorf("got index=%d for %d, want %d", index, v, first+i)
+		}
+	}
+}
+
 func TestCommitWithDisconnectionAndRecover(t *testing.T) {
 	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
 
@@ -656,3 +757,1284 @@ func TestDisconnectAfterSubmit(t *testing.T) {
 	h.CheckCommittedN(5, 3)
 	h.CheckCommittedN(6, 3)
 }
+
+func TestReadIndex(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 200*time.Millisecond)()
+
+	h := NewHarness(t, 3)
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+
+	// Nothing was committed in the leader's term yet.
+	if ri := h.cluster[origLeaderId].ReadIndex(); ri != -1 {
+		t.Errorf("got ReadIndex=%d before any commit, want -1", ri)
+	}
+
+	h.SubmitToServer(origLeaderId, 5)
+	h.SubmitToServer(origLeaderId, 6)
+	sleepMs(250)
+	_, index := h.CheckCommitted(6)
+
+	if ri := h.cluster[origLeaderId].ReadIndex(); ri != index {
+		t.Errorf("got ReadIndex=%d, want %d", ri, index)
+	}
+
+	otherId := (origLeaderId + 1) % 3
+	if ri := h.cluster[otherId].ReadIndex(); ri != -1 {
+		t.Errorf("got ReadIndex=%d from follower %d, want -1", ri, otherId)
+	}
+
+	// A partitioned leader can't confirm its leadership.
+	h.DisconnectPeer(origLeaderId)
+	if ri := h.cluster[origLeaderId].ReadIndex(); ri != -1 {
+		t.Errorf("got ReadIndex=%d from disconnected leader, want -1", ri)
+	}
+}
+
+// dropAppendsTransport fails the AppendEntries RPCs that carry entries to
+// peerId, and passes everything else on to the wrapped Transport.
+type dropAppendsTransport struct {
+	Transport
+	peerId int
+}
+
+func (t dropAppendsTransport) Call(peerId int, client *rpc.Client, serviceMethod string, args any, reply any) error {
+	if ae, ok := args.(AppendEntriesArgs); ok && peerId == t.peerId && len(ae.Entries) > 0 {
+		return errors.New("RPC failed")
+	}
+	return t.Transport.Call(peerId, client, serviceMethod, args, reply)
+}
+
+func TestReadIndexKeepsStaleTailUncommitted(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 200*time.Millisecond)()
+
+	// Pre-votes keep the ex-leader below, which the new leader can't send
+	// entries to, from disrupting it.
+	h := NewHarnessWithConfig(t, 3, Config{PreVote: true})
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(origLeaderId, 1)
+	sleepMs(150)
+	h.CheckCommittedN(1, 3)
+
+	// The partitioned leader keeps two entries the others never see, while
+	// they elect a new leader and commit an entry of its term.
+	h.DisconnectPeer(origLeaderId)
+	h.SubmitToServer(origLeaderId, 2)
+	h.SubmitToServer(origLeaderId, 3)
+	newLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(newLeaderId, 4)
+	sleepMs(150)
+	h.CheckCommittedN(4, 2)
+
+	// Once the ex-leader rejoins, the new leader finds the prefix their logs
+	// share, but the entries after it don't get through; only the heartbeats
+	// confirming ReadIndex, which carry the new leader's commit index, do.
+	h.cluster[newLeaderId].SetTransport(dropAppendsTransport{h.cluster[newLeaderId].Transport(), origLeaderId})
+	h.ReconnectPeer(origLeaderId)
+	sleepMs(100)
+	for i := 0; i < 3; i++ {
+		if ri := h.cluster[newLeaderId].ReadIndex(); ri < 0 {
+			t.Errorf("got ReadIndex=%d, want the commit index", ri)
+		}
+	}
+	sleepMs(50)
+	h.CheckNotCommitted(2)
+	h.CheckNotCommitted(3)
+}
+
+func TestLeaseRead(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 200*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 3, Config{LeaseDuration: 100 * time.Millisecond})
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(origLeaderId, 5)
+	sleepMs(250)
+	_, index := h.CheckCommitted(5)
+
+	if ri := h.cluster[origLeaderId].LeaseRead(); ri != index {
+		t.Errorf("got LeaseRead=%d, want %d", ri, index)
+	}
+	otherId := (origLeaderId + 1) % 3
+	if ri := h.cluster[otherId].LeaseRead(); ri != -1 {
+		t.Errorf("got LeaseRead=%d from follower %d, want -1", ri, otherId)
+	}
+
+	// Once partitioned, the leader's lease runs out well before the others
+	// can elect a new leader.
+	h.DisconnectPeer(origLeaderId)
+	sleepMs(120)
+	if ri := h.cluster[origLeaderId].LeaseRead(); ri != -1 {
+		t.Errorf("got LeaseRead=%d from partitioned leader, want -1", ri)
+	}
+
+	hits, misses := h.cluster[origLeaderId].LeaseStats()
+	if hits != 1 || misses != 1 {
+		t.Errorf("got hits=%d misses=%d, want 1 and 1", hits, misses)
+	}
+}
+
+func TestLeaseDisabledByDefault(t *testing.T) {
+	h := NewHarness(t, 3)
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(origLeaderId, 5)
+	sleepMs(250)
+
+	if ri := h.cluster[origLeaderId].LeaseRead(); ri != -1 {
+		t.Errorf("got LeaseRead=%d with leases disabled, want -1", ri)
+	}
+}
+
+func TestFollowerReadState(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarness(t, 3)
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(origLeaderId, 5)
+	h.SubmitToServer(origLeaderId, 6)
+	sleepMs(250)
+	_, index := h.CheckCommitted(6)
+
+	if rs := h.cluster[origLeaderId].ReadState(); !rs.IsLeader || rs.CommitIndex != index || rs.EntriesBehind() != 0 {
+		t.Errorf("got leader ReadState %+v, want leader at commit index %d", rs, index)
+	}
+
+	otherId := (origLeaderId + 1) % 3
+	rs := h.cluster[otherId].ReadState()
+	if rs.IsLeader || rs.CommitIndex != index || rs.EntriesBehind() != 0 {
+		t.Errorf("got follower ReadState %+v, want follower at commit index %d", rs, index)
+	}
+	if rs.SinceLeaderContact > 100*time.Millisecond {
+		t.Errorf("got SinceLeaderContact=%v, want recent heartbeats", rs.SinceLeaderContact)
+	}
+
+	// A partitioned follower's state grows stale.
+	h.DisconnectPeer(otherId)
+	sleepMs(200)
+	if rs := h.cluster[otherId].ReadState(); rs.SinceLeaderContact < 100*time.Millisecond {
+		t.Errorf("got SinceLeaderContact=%v from partitioned follower, want >= 100ms", rs.SinceLeaderContact)
+	}
+}
+
+func TestLeaderIdFollowsElections(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarness(t, 3)
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	sleepMs(100)
+	for i := 0; i < 3; i++ {
+		if id := h.cluster[i].LeaderId(); id != origLeaderId {
+			t.Errorf("server %d got LeaderId=%d, want %d", i, id, origLeaderId)
+		}
+	}
+
+	h.DisconnectPeer(origLeaderId)
+	sleepMs(350)
+	newLeaderId, _ := h.CheckSingleLeader()
+	otherId := 3 - origLeaderId - newLeaderId
+	sleepMs(100)
+	if id := h.cluster[otherId].LeaderId(); id != newLeaderId {
+		t.Errorf("server %d got LeaderId=%d after election, want %d", otherId, id, newLeaderId)
+	}
+}
+
+func TestTimingProfiles(t *testing.T) {
+	config, err := DefaultConfig().WithTimingProfile("lan")
+	if err != nil {
+		t.Fatal(err)
+	}
+	if config.HeartbeatInterval != 50*time.Millisecond || config.ElectionTimeout != 500*time.Millisecond {
+		t.Errorf("got heartbeat=%v election=%v for lan", config.HeartbeatInterval, config.ElectionTimeout)
+	}
+	if err := config.Validate(); err != nil {
+		t.Error(err)
+	}
+	if _, err := config.WithTimingProfile("moon"); err == nil {
+		t.Error("got no error for an unknown profile")
+	}
+
+	// Leases are bounded by the configured election timeout.
+	if err := (Config{ElectionTimeout: time.Second, LeaseDuration: 500 * time.Millisecond}).Validate(); err != nil {
+		t.Error(err)
+	}
+	if err := (Config{HeartbeatInterval: 200 * time.Millisecond}).Validate(); err == nil {
+		t.Error("got no error for a heartbeat interval above the election timeout")
+	}
+}
+
+func TestConfiguredElectionTimeout(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 3, Config{HeartbeatInterval: 20 * time.Millisecond, ElectionTimeout: 400 * time.Millisecond})
+	defer h.Shutdown()
+
+	sleepMs(800)
+	origLeaderId, origTerm := h.CheckSingleLeader()
+
+	// The default timeouts would have started an election by now.
+	h.DisconnectPeer(origLeaderId)
+	sleepMs(350)
+	for i := 0; i < 3; i++ {
+		if _, term, _ := h.cluster[i].cm.Report(); i != origLeaderId && term != origTerm {
+			t.Errorf("server %d in term %d after 350 ms, want %d", i, term, origTerm)
+		}
+	}
+
+	sleepMs(800)
+	if _, newTerm := h.CheckSingleLeader(); newTerm <= origTerm {
+		t.Errorf("got newTerm=%d, want > %d", newTerm, origTerm)
+	}
+}
+
+func TestAdaptiveTimingOnSlowNetwork(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 500*time.Millisecond)()
+
+	// RPCs take longer than the minimal election timeout. The CMs lengthen
+	// their election timeouts once they've measured that, and then a leader
+	// gets elected and stays.
+	h := NewHarnessWithConfig(t, 3, Config{AdaptiveTiming: true})
+	defer h.Shutdown()
+	for i := 0; i < 3; i++ {
+		h.Faults(i).SetDelay(150*time.Millisecond, 250*time.Millisecond)
+	}
+
+	sleepMs(3000)
+	origLeaderId, origTerm := h.CheckSingleLeader()
+	sleepMs(1000)
+	if leaderId, term := h.CheckSingleLeader(); leaderId != origLeaderId || term != origTerm {
+		t.Errorf("got leader %d in term %d, want %d in term %d", leaderId, term, origLeaderId, origTerm)
+	}
+
+	cm := h.cluster[origLeaderId].cm
+	cm.mu.Lock()
+	heartbeat, election := cm.heartbeatInterval(), cm.minElectionTimeout()
+	cm.mu.Unlock()
+	if heartbeat <= defaultHeartbeatInterval || election < 4*150*time.Millisecond {
+		t.Errorf("got heartbeat=%v election=%v, want longer than the defaults", heartbeat, election)
+	}
+}
+
+func TestPreVoteRejoiningFollower(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 3, Config{PreVote: true, CheckQuorum: true})
+	defer h.Shutdown()
+
+	origLeaderId, origTerm := h.CheckSingleLeader()
+	otherId := (origLeaderId + 1) % 3
+
+	// Cut off from the others, the follower's pre-votes fail and it stays in
+	// its term; when it comes back, the leader keeps its leadership.
+	h.DisconnectPeer(otherId)
+	sleepMs(1000)
+	if _, term, _ := h.cluster[otherId].cm.Report(); term != origTerm {
+		t.Errorf("partitioned follower in term %d, want %d", term, origTerm)
+	}
+	h.ReconnectPeer(otherId)
+	sleepMs(300)
+	if leaderId, term := h.CheckSingleLeader(); leaderId != origLeaderId || term != origTerm {
+		t.Errorf("got leader %d in term %d, want %d in term %d", leaderId, term, origLeaderId, origTerm)
+	}
+	h.SubmitToServer(origLeaderId, 5)
+	sleepMs(150)
+	h.CheckCommittedN(5, 3)
+}
+
+func TestPreVoteElectsAfterLeaderCrash(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 3, Config{PreVote: true, CheckQuorum: true})
+	defer h.Shutdown()
+
+	origLeaderId, origTerm := h.CheckSingleLeader()
+	h.CrashPeer(origLeaderId)
+	sleepMs(350)
+	if _, term := h.CheckSingleLeader(); term != origTerm+1 {
+		t.Errorf("got new leader in term %d, want %d", term, origTerm+1)
+	}
+}
+
+func TestCheckQuorumLeaderStepsDown(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 3, Config{PreVote: true, CheckQuorum: true})
+	defer h.Shutdown()
+
+	origLeaderId, origTerm := h.CheckSingleLeader()
+	h.DisconnectPeer(origLeaderId)
+	sleepMs(350)
+	if _, term, isLeader := h.cluster[origLeaderId].cm.Report(); isLeader || term != origTerm {
+		t.Errorf("partitioned leader got term=%d isLeader=%v, want term %d as a follower", term, isLeader, origTerm)
+	}
+	if h.SubmitToServer(origLeaderId, 5) >= 0 {
+		t.Error("partitioned leader accepted a command")
+	}
+
+	// Without CheckQuorum, a partitioned leader stays one.
+	h2 := NewHarness(t, 3)
+	defer h2.Shutdown()
+	origLeaderId, _ = h2.CheckSingleLeader()
+	h2.DisconnectPeer(origLeaderId)
+	sleepMs(350)
+	if _, _, isLeader := h2.cluster[origLeaderId].cm.Report(); !isLeader {
+		t.Error("partitioned leader stepped down without CheckQuorum")
+	}
+}
+
+func TestTransferLeadership(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 3, Config{LeaseDuration: 100 * time.Millisecond, PreVote: true})
+	defer h.Shutdown()
+
+	origLeaderId, origTerm := h.CheckSingleLeader()
+	targetId := (origLeaderId + 1) % 3
+
+	// The target misses some entries, which the leader sends it before handing
+	// over. Leases and pre-votes don't hold the transfer up.
+	h.DisconnectPeer(targetId)
+	h.SubmitToServer(origLeaderId, 5)
+	h.SubmitToServer(origLeaderId, 6)
+	sleepMs(50)
+	h.ReconnectPeer(targetId)
+
+	start := time.Now()
+	if !h.cluster[origLeaderId].TransferLeadership(targetId) {
+		t.Fatalf("leader %d failed to transfer its leadership to %d", origLeaderId, targetId)
+	}
+	if elapsed := time.Since(start); elapsed >= 150*time.Millisecond {
+		t.Errorf("transfer took %v, want it faster than an election timeout", elapsed)
+	}
+	if ri := h.cluster[origLeaderId].LeaseRead(); ri != -1 {
+		t.Errorf("got LeaseRead=%d from the old leader, want -1", ri)
+	}
+	sleepMs(50)
+	newLeaderId, newTerm := h.CheckSingleLeader()
+	if newLeaderId != targetId || newTerm != origTerm+1 {
+		t.Errorf("got leader %d in term %d, want %d in term %d", newLeaderId, newTerm, targetId, origTerm+1)
+	}
+
+	h.SubmitToServer(newLeaderId, 7)
+	sleepMs(150)
+	h.CheckCommittedN(5, 3)
+	h.CheckCommittedN(7, 3)
+}
+
+func TestTransferLeadershipTimesOut(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarness(t, 3)
+	defer h.Shutdown()
+
+	origLeaderId, origTerm := h.CheckSingleLeader()
+	if h.cluster[origLeaderId].TransferLeadership(origLeaderId) {
+		t.Error("leader transferred its leadership to itself")
+	}
+	if h.cluster[(origLeaderId+1)%3].TransferLeadership(origLeaderId) {
+		t.Error("follower transferred leadership")
+	}
+
+	// An unreachable target never takes over; the leader gives up and accepts
+	// commands again.
+	targetId := (origLeaderId + 1) % 3
+	h.DisconnectPeer(targetId)
+	if h.cluster[origLeaderId].TransferLeadership(targetId) {
+		t.Errorf("leader %d transferred its leadership to unreachable %d", origLeaderId, targetId)
+	}
+	if leaderId, term := h.CheckSingleLeader(); leaderId != origLeaderId || term != origTerm {
+		t.Errorf("got leader %d in term %d, want %d in term %d", leaderId, term, origLeaderId, origTerm)
+	}
+	if h.SubmitToServer(origLeaderId, 5) < 0 {
+		t.Error("leader refused a command after a failed transfer")
+	}
+	sleepMs(150)
+	h.CheckCommittedN(5, 2)
+}
+
+func TestLearnersReplicateWithoutVoting(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	// With pre-votes, the voter that's disconnected below rejoins without
+	// disrupting the leader.
+	h := NewHarnessWithConfig(t, 5, Config{Learners: []int{3, 4}, PreVote: true})
+	defer h.Shutdown()
+
+	leaderId, term := h.CheckSingleLeader()
+	if leaderId >= 3 {
+		t.Fatalf("learner %d was elected", leaderId)
+	}
+	h.SubmitToServer(leaderId, 5)
+	sleepMs(150)
+	h.CheckCommittedN(5, 5)
+
+	// Two of the three voters commit, though they are a minority of the five
+	// servers.
+	otherId := (leaderId + 1) % 3
+	h.DisconnectPeer(3)
+	h.DisconnectPeer(4)
+	h.DisconnectPeer(otherId)
+	h.SubmitToServer(leaderId, 6)
+	sleepMs(150)
+	h.CheckCommittedN(6, 2)
+
+	h.ReconnectPeer(3)
+	h.ReconnectPeer(4)
+	h.ReconnectPeer(otherId)
+	sleepMs(150)
+	h.CheckCommittedN(6, 5)
+
+	// Without a majority of the voters, no leader is elected: learners
+	// neither start elections nor vote.
+	h.DisconnectPeer(leaderId)
+	h.DisconnectPeer(otherId)
+	sleepMs(450)
+	h.CheckNoLeader()
+	for _, id := range []int{3, 4} {
+		if _, learnerTerm, _ := h.cluster[id].cm.Report(); learnerTerm != term {
+			t.Errorf("learner %d got term %d, want %d", id, learnerTerm, term)
+		}
+	}
+}
+
+func TestLearnerProgress(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 4, Config{Learners: []int{3}})
+	defer h.Shutdown()
+
+	leaderId, _ := h.CheckSingleLeader()
+	if leaderId == 3 {
+		t.Fatal("learner 3 was elected")
+	}
+	followerId := (leaderId + 1) % 3
+	if progress := h.cluster[followerId].LearnerProgress(); progress != nil {
+		t.Errorf("got LearnerProgress=%v from a follower, want nil", progress)
+	}
+
+	h.SubmitToServer(leaderId, 5)
+	sleepMs(150)
+	h.CheckCommittedN(5, 4)
+	progress := h.cluster[leaderId].LearnerProgress()
+	if p := progress[3]; len(progress) != 1 || p.MatchIndex != 0 || p.EntriesBehind != 0 {
+		t.Errorf("got LearnerProgress=%v, want learner 3 at index 0", progress)
+	}
+
+	// With the learner and one voter gone, the two other voters still commit,
+	// and the leader sees the learner fall behind.
+	h.DisconnectPeer(3)
+	h.DisconnectPeer(followerId)
+	for cmd := 6; cmd < 9; cmd++ {
+		h.SubmitToServer(leaderId, cmd)
+	}
+	sleepMs(150)
+	h.CheckCommittedN(8, 2)
+	if p := h.cluster[leaderId].LearnerProgress()[3]; p.MatchIndex != 0 || p.EntriesBehind != 3 || p.SinceContact < 100*time.Millisecond {
+		t.Errorf("got learner progress %+v, want 3 entries behind index 0 for at least 100ms", p)
+	}
+
+	h.ReconnectPeer(3)
+	sleepMs(150)
+	if p := h.cluster[leaderId].LearnerProgress()[3]; p.MatchIndex != 3 || p.EntriesBehind != 0 {
+		t.Errorf("got learner progress %+v after reconnecting, want it caught up", p)
+	}
+}
+
+// dropTimeoutNowTransport loses the TimeoutNow RPCs, and passes everything
+// else on to the wrapped Transport.
+type dropTimeoutNowTransport struct {
+	Transport
+}
+
+func (t dropTimeoutNowTransport) Call(peerId int, client *rpc.Client, serviceMethod string, args any, reply any) error {
+	if serviceMethod == "ConsensusModule.TimeoutNow" {
+		return errors.New("RPC failed")
+	}
+	return t.Transport.Call(peerId, client, serviceMethod, args, reply)
+}
+
+func TestTransferLeadershipTimeoutKeepsLeaseOff(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 3, Config{LeaseDuration: 100 * time.Millisecond})
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(origLeaderId, 5)
+	sleepMs(150)
+	_, index := h.CheckCommitted(5)
+	if ri := h.cluster[origLeaderId].LeaseRead(); ri != index {
+		t.Fatalf("got LeaseRead=%d before the transfer, want %d", ri, index)
+	}
+
+	// For all the leader knows, a lost TimeoutNow may still arrive and get
+	// the target elected, so it gets no lease until an election timeout after
+	// the last one.
+	h.cluster[origLeaderId].SetTransport(dropTimeoutNowTransport{h.cluster[origLeaderId].Transport()})
+	targetId := (origLeaderId + 1) % 3
+	if h.cluster[origLeaderId].TransferLeadership(targetId) {
+		t.Fatalf("leader %d transferred its leadership without TimeoutNow", origLeaderId)
+	}
+	if ri := h.cluster[origLeaderId].LeaseRead(); ri != -1 {
+		t.Errorf("got LeaseRead=%d right after a failed transfer, want -1", ri)
+	}
+	sleepMs(250)
+	if ri := h.cluster[origLeaderId].LeaseRead(); ri != index {
+		t.Errorf("got LeaseRead=%d long after a failed transfer, want %d", ri, index)
+	}
+}
+
+func TestSnapshotCatchesUpFollower(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 3, Config{SnapshotChunkBytes: 16})
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	// Crash rather than disconnect the follower, so that it doesn't disrupt
+	// the cluster with elections of its own when it's back.
+	otherId := (origLeaderId + 1) % 3
+	h.CrashPeer(otherId)
+	for v := 5; v < 30; v++ {
+		h.SubmitToServer(origLeaderId, v)
+	}
+	sleepMs(250)
+	for v := 5; v < 30; v++ {
+		h.CheckCommittedN(v, 2)
+	}
+
+	// The entries the crashed follower misses are compacted away, so
+	// whoever leads after it reconnects has to send it the snapshot, in
+	// several chunks.
+	for i := 0; i < 3; i++ {
+		if i != otherId {
+			h.SnapshotServer(i)
+		}
+	}
+	h.SubmitToServer(origLeaderId, 30)
+	sleepMs(100)
+
+	h.RestartPeer(otherId)
+	sleepMs(250)
+	for v := 5; v <= 30; v++ {
+		h.CheckCommittedN(v, 3)
+	}
+	cm := h.cluster[otherId].cm
+	cm.mu.Lock()
+	defer cm.mu.Unlock()
+	if cm.snapshotIndex < 0 {
+		t.Errorf("follower caught up without installing a snapshot")
+	}
+}
+
+func TestCrashThenRestartAllWithSnapshot(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarness(t, 3)
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	for v := 5; v < 15; v++ {
+		h.SubmitToServer(origLeaderId, v)
+	}
+	sleepMs(250)
+	for i := 0; i < 3; i++ {
+		h.SnapshotServer(i)
+	}
+	h.SubmitToServer(origLeaderId, 15)
+	sleepMs(250)
+	h.CheckCommittedN(15, 3)
+
+	for i := 0; i < 3; i++ {
+		h.CrashPeer((origLeaderId + i) % 3)
+	}
+	sleepMs(350)
+	for i := 0; i < 3; i++ {
+		h.RestartPeer((origLeaderId + i) % 3)
+	}
+
+	sleepMs(150)
+	newLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(newLeaderId, 16)
+	sleepMs(250)
+	for v := 5; v <= 16; v++ {
+		h.CheckCommittedN(v, 3)
+	}
+}
+
+func TestPipelinedReplication(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	for _, window := range []int{1, 8} {
+		t.Run(fmt.Sprintf("window=%d", window), func(t *testing.T) {
+			h := NewHarnessWithConfig(t, 3, Config{MaxInflightAppends: window})
+			defer h.Shutdown()
+
+			origLeaderId, _ := h.CheckSingleLeader()
+			for v := 5; v < 205; v++ {
+				h.SubmitToServer(origLeaderId, v)
+			}
+			sleepMs(300)
+			for v := 5; v < 205; v += 20 {
+				h.CheckCommittedN(v, 3)
+			}
+			h.CheckCommittedN(204, 3)
+
+			cm := h.cluster[origLeaderId].cm
+			cm.mu.Lock()
+			defer cm.mu.Unlock()
+			for _, peerId := range cm.peerIds {
+				if cm.sentIndex[peerId] != cm.logLen() || cm.matchIndex[peerId] != cm.logLen()-1 {
+					t.Errorf("peer %d: sentIndex=%d matchIndex=%d, want all %d entries replicated",
+						peerId, cm.sentIndex[peerId], cm.matchIndex[peerId], cm.logLen())
+				}
+			}
+		})
+	}
+}
+
+// hangTransport makes the calls to peerId hang until release is closed while
+// hang is set, as on a connection that stalled, and passes everything else on
+// to the wrapped Transport.
+type hangTransport struct {
+	Transport
+	peerId  int
+	hang    *atomic.Bool
+	release chan struct{}
+}
+
+func (t hangTransport) Call(peerId int, client *rpc.Client, serviceMethod string, args any, reply any) error {
+	if peerId == t.peerId && t.hang.Load() {
+		<-t.release
+		return errors.New("RPC failed")
+	}
+	return t.Transport.Call(peerId, client, serviceMethod, args, reply)
+}
+
+func TestHungAppendEntriesTimeOut(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	// The follower hears nothing while the calls hang; PreVote keeps its
+	// elections from unseating the leader in the meantime.
+	h := NewHarnessWithConfig(t, 3, Config{PreVote: true})
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	otherId := (origLeaderId + 1) % 3
+	transport := hangTransport{h.cluster[origLeaderId].Transport(), otherId, new(atomic.Bool), make(chan struct{})}
+	defer close(transport.release)
+	transport.hang.Store(true)
+	h.cluster[origLeaderId].SetTransport(transport)
+
+	// The calls that hang fill the follower's replication pipeline; they have
+	// to time out for the follower to get any further AppendEntries.
+	h.SubmitToServer(origLeaderId, 5)
+	sleepMs(100)
+	transport.hang.Store(false)
+	h.SubmitToServer(origLeaderId, 6)
+	sleepMs(500)
+	h.CheckCommittedN(5, 3)
+	h.CheckCommittedN(6, 3)
+}
+
+func TestAppendBatchLimits(t *testing.T) {
+	cm := &ConsensusModule{
+		config:          Config{MaxAppendEntries: 10, MaxAppendBytes: 100, CatchUpBytesPerSecond: 2000},
+		snapshotIndex:   -1,
+		catchUpBudget:   make(map[int]float64),
+		catchUpRefilled: make(map[int]time.Time),
+	}
+	for i := 0; i < 30; i++ {
+		cm.log = append(cm.log, LogEntry{Command: i, Term: 1})
+	}
+
+	// 24-byte entries: the byte limit is hit before the entry limit.
+	if got := len(cm.appendBatch(1, 0)); got != 4 {
+		t.Errorf("got a batch of %d entries, want 4", got)
+	}
+	// The second batch overdraws the catch-up budget.
+	if got := len(cm.appendBatch(1, 4)); got != 4 {
+		t.Errorf("got a batch of %d entries, want 4", got)
+	}
+	if got := cm.appendBatch(1, 8); got != nil {
+		t.Errorf("got %d entries with no catch-up budget left, want none", len(got))
+	}
+	// The last batch doesn't count as catching up.
+	if got := len(cm.appendBatch(1, 28)); got != 2 {
+		t.Errorf("got a batch of %d entries at the tail, want 2", got)
+	}
+	// An entry larger than MaxAppendBytes goes on its own.
+	cm.log[29].Command = string(make([]byte, 200))
+	if got := len(cm.appendBatch(2, 29)); got != 1 {
+		t.Errorf("got a batch of %d entries for a large entry, want 1", got)
+	}
+
+	sleepMs(60)
+	if got := len(cm.appendBatch(1, 8)); got != 4 {
+		t.Errorf("got a batch of %d entries after the budget refilled, want 4", got)
+	}
+}
+
+func TestCatchUpInBatches(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithConfig(t, 3, Config{MaxAppendEntries: 8, CatchUpBytesPerSecond: 100000})
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	otherId := (origLeaderId + 1) % 3
+	h.CrashPeer(otherId)
+	for v := 5; v < 205; v++ {
+		h.SubmitToServer(origLeaderId, v)
+	}
+	sleepMs(250)
+	h.CheckCommittedN(204, 2)
+
+	h.RestartPeer(otherId)
+	sleepMs(400)
+	for v := 5; v < 205; v += 20 {
+		h.CheckCommittedN(v, 3)
+	}
+	h.CheckCommittedN(204, 3)
+}
+
+func TestAppendEntriesCommitsOnlyMatchedEntries(t *testing.T) {
+	ready := make(chan any)
+	commitChan := make(chan CommitEntry, 16)
+	server := NewServer(0, []int{1, 2}, NewMapStorage(), ready, nil)
+	cm := NewConsensusModule(0, []int{1, 2}, server, NewMapStorage(), ready, commitChan)
+	defer cm.Stop()
+
+	// An ex-leader of term 2 kept an entry it never committed.
+	var reply AppendEntriesReply
+	cm.AppendEntries(AppendEntriesArgs{Term: 1, LeaderId: 1, PrevLogIndex: -1, PrevLogTerm: -1,
+		Entries: []LogEntry{{Command: 1, Term: 1}, {Command: 2, Term: 1}}, LeaderCommit: -1}, &reply)
+	cm.AppendEntries(AppendEntriesArgs{Term: 2, LeaderId: 2, PrevLogIndex: 1, PrevLogTerm: 1,
+		Entries: []LogEntry{{Command: 3, Term: 2}}, LeaderCommit: -1}, &reply)
+
+	for _, tt := range []struct {
+		args       AppendEntriesArgs
+		wantCommit int
+	}{
+		// A throttled catch-up AppendEntries without entries only vouches for
+		// the log up to PrevLogIndex.
+		{AppendEntriesArgs{Term: 3, LeaderId: 1, PrevLogIndex: 1, PrevLogTerm: 1, LeaderCommit: 2}, 1},
+		// The leader's entry at index 2 replaces ours, and commits.
+		{AppendEntriesArgs{Term: 3, LeaderId: 1, PrevLogIndex: 1, PrevLogTerm: 1,
+			Entries: []LogEntry{{Command: 4, Term: 3}}, LeaderCommit: 2}, 2},
+	} {
+		cm.AppendEntries(tt.args, &reply)
+		cm.mu.Lock()
+		commitIndex := cm.commitIndex
+		cm.mu.Unlock()
+		if !reply.Success || commitIndex != tt.wantCommit {
+			t.Errorf("AppendEntries(%+v) gave success=%v, commitIndex=%d; want true, %d", tt.args, reply.Success, commitIndex, tt.wantCommit)
+		}
+	}
+	for i, want := range []int{1, 2, 4} {
+		if c := <-commitChan; c.Command != want || c.Index != i {
+			t.Errorf("got commit %+v, want command %d at index %d", c, want, i)
+		}
+	}
+}
+
+func TestThrottledCatchUpKeepsStaleTailUncommitted(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	// Every catch-up batch holds one entry and exhausts the catch-up budget,
+	// which practically never refills.
+	h := NewHarnessWithConfig(t, 3, Config{MaxAppendEntries: 1, MaxAppendBytes: 1, CatchUpBytesPerSecond: 1})
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(origLeaderId, 1)
+	sleepMs(150)
+	h.CheckCommittedN(1, 3)
+
+	// The partitioned leader keeps two entries the others never see, while
+	// they elect a new leader and commit four entries of its term.
+	h.DisconnectPeer(origLeaderId)
+	h.SubmitToServer(origLeaderId, 2)
+	h.SubmitToServer(origLeaderId, 3)
+	newLeaderId, _ := h.CheckSingleLeader()
+	for cmd := 4; cmd < 8; cmd++ {
+		h.SubmitToServer(newLeaderId, cmd)
+		sleepMs(50)
+	}
+	h.CheckCommittedN(7, 2)
+
+	// The ex-leader rejoins. Probing its log uses up the catch-up budget, so
+	// the new leader reaches the matching prefix with AppendEntries that
+	// carry no entries, but its full commit index.
+	h.ReconnectPeer(origLeaderId)
+	sleepMs(300)
+	h.CheckNotCommitted(2)
+	h.CheckNotCommitted(3)
+}
+
+// newLeaderCMForCommit returns a leader CM of an n-server cluster, in term 2,
+// with backlog entries of which the first half are from term 1.
+func newLeaderCMForCommit(n int, backlog int) *ConsensusModule {
+	cm := &ConsensusModule{
+		storage:       NewMapStorage(),
+		state:         Leader,
+		currentTerm:   2,
+		commitIndex:   -1,
+		snapshotIndex: -1,
+		matchIndex:    make(map[int]int),
+	}
+	for i := 0; i < backlog; i++ {
+		cm.log = append(cm.log, LogEntry{Command: i, Term: 1 + 2*i/backlog})
+	}
+	for p := 1; p < n; p++ {
+		cm.peerIds = append(cm.peerIds, p)
+		cm.matchIndex[p] = -1
+	}
+	return cm
+}
+
+func TestAdvanceCommitIndex(t *testing.T) {
+	cm := newLeaderCMForCommit(5, 100)
+
+	// Entries of an earlier term aren't committed by counting replicas.
+	cm.matchIndex[1], cm.matchIndex[2] = 40, 45
+	cm.advanceCommitIndex()
+	if cm.commitIndex != -1 {
+		t.Errorf("got commitIndex=%d for a quorum at an old-term index, want -1", cm.commitIndex)
+	}
+
+	cm.matchIndex[1], cm.matchIndex[2], cm.matchIndex[3] = 70, 80, 10
+	cm.advanceCommitIndex()
+	if cm.commitIndex != 70 {
+		t.Errorf("got commitIndex=%d, want 70", cm.commitIndex)
+	}
+
+	// The commit index never moves back.
+	cm.matchIndex[1], cm.matchIndex[2] = 60, 60
+	cm.advanceCommitIndex()
+	if cm.commitIndex != 70 {
+		t.Errorf("got commitIndex=%d after lower matches, want 70", cm.commitIndex)
+	}
+}
+
+// BenchmarkAdvanceCommitIndex measures how long a leader holds its lock to
+// advance the commit index after a successful AppendEntries reply, with a
+// long uncommitted tail and one follower lagging far behind.
+func BenchmarkAdvanceCommitIndex(b *testing.B) {
+	for _, n := range []int{5, 7} {
+		for _, backlog := range []int{10000, 100000} {
+			b.Run(fmt.Sprintf("servers=%d/backlog=%d", n, backlog), func(b *testing.B) {
+				cm := newLeaderCMForCommit(n, backlog)
+				for i, peerId := range cm.peerIds {
+					cm.matchIndex[peerId] = backlog - 1 - i*backlog/(2*n)
+				}
+				cm.matchIndex[cm.peerIds[0]] = 0
+				for i := 0; i < b.N; i++ {
+					cm.mu.Lock()
+					cm.commitIndex = backlog / 2
+					cm.advanceCommitIndex()
+					cm.mu.Unlock()
+				}
+			})
+		}
+	}
+}
+
+func TestTermRuns(t *testing.T) {
+	cm := &ConsensusModule{snapshotIndex: -1}
+	// check compares the term index lookups with scans of the log.
+	check := func() {
+		t.Helper()
+		runs := cm.termRuns
+		cm.rebuildTermRuns()
+		if len(runs)+len(cm.termRuns) > 0 && !reflect.DeepEqual(runs, cm.termRuns) {
+			t.Fatalf("got termRuns %v, want %v", runs, cm.termRuns)
+		}
+		for index := cm.snapshotIndex + 1; index < cm.logLen(); index++ {
+			first := index
+			for first-1 > cm.snapshotIndex && cm.termAt(first-1) == cm.termAt(index) {
+				first--
+			}
+			if got := cm.firstIndexOfRun(index); got != first {
+				t.Errorf("got firstIndexOfRun(%d)=%d, want %d", index, got, first)
+			}
+		}
+		for term := 0; term < 8; term++ {
+			last := -1
+			for index := cm.snapshotIndex + 1; index < cm.logLen(); index++ {
+				if cm.termAt(index) == term {
+					last = index
+				}
+			}
+			if got := cm.lastIndexOfTerm(term); got != last {
+				t.Errorf("got lastIndexOfTerm(%d)=%d, want %d", term, got, last)
+			}
+		}
+	}
+
+	cm.appendLog(walEntries(1, 1, 2, 3)...)
+	cm.appendLog(walEntries(3, 4, 5)...)
+	cm.appendLog(walEntries(4, 6)...)
+	check()
+
+	// A follower replaces a conflicting tail.
+	cm.truncateLog(4)
+	cm.appendLog(walEntries(5, 50, 60, 70)...)
+	check()
+
+	// Compaction drops whole runs and part of one.
+	cm.log = append([]LogEntry(nil), cm.entriesFrom(5)...)
+	cm.snapshotIndex, cm.snapshotTerm = 4, 5
+	cm.trimTermRuns()
+	check()
+	cm.appendLog(walEntries(7, 80)...)
+	check()
+
+	cm.truncateLog(5)
+	check()
+	cm.appendLog(walEntries(7, 90)...)
+	check()
+}
+
+// benchCommand is shaped like the commands the HTTP bridge submits.
+type benchCommand struct {
+	Kind  string
+	Key   string
+	Value string
+	Id    int
+}
+
+func init() {
+	gob.Register(benchCommand{})
+}
+
+// BenchmarkReplication submits commands to the leader of a 3- and a 5-server
+// cluster and waits until every server has applied them, once with commands
+// as Go values and once pre-encoded (as JSON, like the bridge receives them)
+// and submitted as payloads. Profile it with -cpuprofile to compare the cost
+// of encoding entries for AppendEntries RPCs and storage.
+func BenchmarkReplication(b *testing.B) {
+	for _, n := range []int{3, 5} {
+		for _, payload := range []bool{false, true} {
+			b.Run(fmt.Sprintf("servers=%d/payload=%v", n, payload), func(b *testing.B) {
+				dir := b.TempDir()
+				var wals []*WALStorage
+				defer func() {
+					for _, ws := range wals {
+						ws.Close()
+					}
+				}()
+				h := NewHarnessWithStorage(b, n, func(id int) Storage {
+					ws, err := NewWALStorage(filepath.Join(dir, strconv.Itoa(id)), 0)
+					if err != nil {
+						b.Fatal(err)
+					}
+					wals = append(wals, ws)
+					return ws
+				})
+				defer h.Shutdown()
+				leaderId, _ := h.CheckSingleLeader()
+
+				b.ResetTimer()
+				for i := 0; i < b.N; i++ {
+					var cmd any = benchCommand{Kind: "put", Key: fmt.Sprintf("key%d", i), Value: "value", Id: i}
+					if payload {
+						data, err := json.Marshal(cmd)
+						if err != nil {
+							b.Fatal(err)
+						}
+						cmd = data
+					}
+					if h.SubmitToServer(leaderId, cmd) < 0 {
+						b.Fatalf("leader %d lost leadership", leaderId)
+					}
+				}
+				for applied := false; !applied; {
+					sleepMs(1)
+					h.mu.Lock()
+					applied = true
+					for i := 0; i < n; i++ {
+						applied = applied && len(h.commits[i]) >= b.N
+					}
+					h.mu.Unlock()
+				}
+			})
+		}
+	}
+}
+
+func TestCrashThenRestartLeaderWithCommitBatches(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	h := NewHarnessWithCommitBatches(t, 3)
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitBatchToServer(origLeaderId, []any{5, 6, 7})
+
+	vals := []int{5, 6, 7}
+
+	sleepMs(350)
+	for _, v := range vals {
+		h.CheckCommittedN(v, 3)
+	}
+
+	h.CrashPeer(origLeaderId)
+	sleepMs(350)
+	newLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(newLeaderId, 8)
+	sleepMs(250)
+	h.CheckCommittedN(8, 2)
+
+	h.RestartPeer(origLeaderId)
+	sleepMs(550)
+	for _, v := range append(vals, 8) {
+		h.CheckCommittedN(v, 3)
+	}
+}
+
+// startCommitSender starts the commit sender of a CM made by
+// newLeaderCMForCommit, and returns a function that stops it.
+func startCommitSender(cm *ConsensusModule) (stop func()) {
+	cm.lastApplied = -1
+	cm.newCommitReadyChan = make(chan struct{}, 16)
+	cm.newCommitReadyChanWg.Add(1)
+	go cm.commitChanSender()
+	return func() {
+		close(cm.newCommitReadyChan)
+		cm.newCommitReadyChanWg.Wait()
+	}
+}
+
+func TestCommitBatches(t *testing.T) {
+	cm := newLeaderCMForCommit(3, 100)
+	batches := make(chan []CommitEntry)
+	cm.commitBatchChan = batches
+	defer startCommitSender(cm)()
+
+	// Each range of entries committed together arrives as one batch, with
+	// the terms of the entries.
+	for _, commitIndex := range []int{59, 99} {
+		cm.mu.Lock()
+		first := cm.commitIndex + 1
+		cm.commitIndex = commitIndex
+		cm.mu.Unlock()
+		cm.newCommitReadyChan <- struct{}{}
+
+		batch := <-batches
+		if len(batch) != commitIndex+1-first {
+			t.Fatalf("got batch of %d entries, want %d", len(batch), commitIndex+1-first)
+		}
+		for i, c := range batch {
+			if c.Index != first+i || c.Command != cm.log[first+i].Command || c.Term != cm.log[first+i].Term {
+				t.Errorf("got %+v at batch position %d, want log entry %d: %+v", c, i, first+i, cm.log[first+i])
+			}
+		}
+	}
+}
+
+// BenchmarkCommitDelivery measures the cost per entry of delivering committed
+// entries to a client that consumes them as they come, one by one on a commit
+// channel or in batches, as the commit index advances 64 entries at a time.
+// startLoad starts a client that submits a command every millisecond to
+// whichever server in h is the leader, and measures how long commits stall:
+// it samples the commits every 10 ms, and counts the periods of 50 ms or more
+// without any; shorter ones are scheduling noise. The returned function stops
+// the client and returns the total stall time.
+func startLoad(h *Harness) (stop func() time.Duration) {
+	committed := func() int {
+		h.mu.Lock()
+		defer h.mu.Unlock()
+		n := 0
+		for i := 0; i < h.n; i++ {
+			n = max(n, len(h.commits[i]))
+		}
+		return n
+	}
+	done := make(chan struct{})
+	var wg sync.WaitGroup
+	wg.Add(2)
+	go func() {
+		defer wg.Done()
+		for cmd := 0; ; cmd++ {
+			select {
+			case <-done:
+				return
+			default:
+			}
+			for id := 0; id < h.n && h.SubmitToServer(id, cmd) < 0; id++ {
+			}
+			sleepMs(1)
+		}
+	}()
+	var stalled time.Duration
+	go func() {
+		defer wg.Done()
+		const interval, minStall = 10 * time.Millisecond, 50 * time.Millisecond
+		t := time.NewTicker(interval)
+		defer t.Stop()
+		last, stall := committed(), time.Duration(0)
+		for {
+			select {
+			case <-done:
+				return
+			case <-t.C:
+			}
+			n := committed()
+			if n == last {
+				stall += interval
+				continue
+			}
+			last = n
+			if stall >= minStall {
+				stalled += stall
+			}
+			stall = 0
+		}
+	}()
+	return func() time.Duration {
+		close(done)
+		wg.Wait()
+		return stalled
+	}
+}
+
+// currentLeader returns the id of a connected server in h that considers
+// itself the leader, or -1.
+func currentLeader(h *Harness) int {
+	for id := 0; id < h.n; id++ {
+		if _, _, isLeader := h.cluster[id].cm.Report(); h.connected[id] && isLeader {
+			return id
+		}
+	}
+	return -1
+}
+
+// BenchmarkPartitionHeal measures how commits stall when a follower is
+// partitioned away and rejoins. Each iteration disconnects a follower for
+// 600 ms and then reconnects it for 600 ms, under the load of startLoad. It
+// reports the time per cycle in which commits stalled, and the elections per
+// cycle.
+func BenchmarkPartitionHeal(b *testing.B) {
+	for _, c := range []struct {
+		name   string
+		config Config
+	}{
+		{"default", Config{}},
+		{"prevote+checkquorum", Config{PreVote: true, CheckQuorum: true}},
+	} {
+		b.Run(c.name, func(b *testing.B) {
+			h := NewHarnessWithConfig(b, 3, c.config)
+			defer h.Shutdown()
+			leaderId, startTerm := h.CheckSingleLeader()
+			stop := startLoad(h)
+
+			b.ResetTimer()
+			for i := 0; i < b.N; i++ {
+				if id := currentLeader(h); id >= 0 {
+					leaderId = id
+				}
+				followerId := (leaderId + 1 + i%2) % 3
+				h.DisconnectPeer(followerId)
+				sleepMs(600)
+				h.ReconnectPeer(followerId)
+				sleepMs(600)
+			}
+			b.StopTimer()
+			stalled := stop()
+
+			_, endTerm := h.CheckSingleLeader()
+			b.ReportMetric(float64(stalled.Milliseconds())/float64(b.N), "stall-ms/cycle")
+			b.ReportMetric(float64(endTerm-startTerm)/float64(b.N), "elections/cycle")
+		})
+	}
+}
+
+// BenchmarkLeaderHandover measures how commits stall when the leader goes
+// away for maintenance, under the load of startLoad: either it's disconnected
+// and the others elect a new leader after an election timeout, or it first
+// transfers its leadership with TransferLeadership. CheckQuorum makes the
+// disconnected leader stop accepting commands.
+func BenchmarkLeaderHandover(b *testing.B) {
+	for _, transfer := range []bool{false, true} {
+		b.Run(fmt.Sprintf("transfer=%v", transfer), func(b *testing.B) {
+			h := NewHarnessWithConfig(b, 3, Config{CheckQuorum: true})
+			defer h.Shutdown()
+			h.CheckSingleLeader()
+			stop := startLoad(h)
+
+			var handover time.Duration
+			b.ResetTimer()
+			for i := 0; i < b.N; i++ {
+				leaderId := currentLeader(h)
+				if leaderId < 0 {
+					b.Fatal("no leader")
+				}
+				start := time.Now()
+				if transfer && !h.cluster[leaderId].TransferLeadership((leaderId+1)%3) {
+					b.Fatalf("leader %d failed to transfer its leadership", leaderId)
+				}
+				h.DisconnectPeer(leaderId)
+				for currentLeader(h) < 0 {
+					time.Sleep(time.Millisecond)
+				}
+				handover += time.Since(start)
+				h.ReconnectPeer(leaderId)
+				sleepMs(500)
+			}
+			b.StopTimer()
+			stalled := stop()
+
+			b.ReportMetric(float64(stalled.Milliseconds())/float64(b.N), "stall-ms/op")
+			b.ReportMetric(float64(handover.Microseconds())/1000/float64(b.N), "handover-ms/op")
+		})
+	}
+}
+
+func BenchmarkCommitDelivery(b *testing.B) {
+	for _, batches := range []bool{false, true} {
+		b.Run(fmt.Sprintf("batches=%v", batches), func(b *testing.B) {
+			cm := newLeaderCMForCommit(3, b.N)
+			done := make(chan struct{})
+			if batches {
+				commitBatchChan := make(chan []CommitEntry)
+				cm.commitBatchChan = commitBatchChan
+				go func() {
+					for applied := 0; applied < b.N; {
+						applied += len(<-commitBatchChan)
+					}
+					close(done)
+				}()
+			} else {
+				commitChan := make(chan CommitEntry)
+				cm.commitChan = commitChan
+				go func() {
+					for applied := 0; applied < b.N; applied++ {
+						<-commitChan
+					}
+					close(done)
+				}()
+			}
+			stop := startCommitSender(cm)
+			defer stop()
+
+			b.ResetTimer()
+			for i := 0; i < b.N; i += 64 {
+				cm.mu.Lock()
+				cm.commitIndex = min(i+63, b.N-1)
+				cm.mu.Unlock()
+				cm.newCommitReadyChan <- struct{}{}
+			}
+			<-done
+		})
+	}
+}
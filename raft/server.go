@@ -7,12 +7,12 @@ package raft
 
 import (
 	"fmt"
+	"io"
 	"log"
-	"math/rand"
 	"net"
 	"net/rpc"
-	"os"
 	"sync"
+	"sync/atomic"
 	"time"
 )
 
@@ -30,13 +30,19 @@ type Server struct {
 
 	cm       *ConsensusModule
 	storage  Storage
+	config   Config
 	rpcProxy *RPCProxy
 
+	transport atomic.Pointer[transportRef]
+
 	rpcServer *rpc.Server
 	listener  net.Listener
 
-	commitChan  chan<- CommitEntry
+	commitChan      chan<- CommitEntry
+	commitBatchChan chan<- []CommitEntry
+
 	peerClients map[int]*rpc.Client
+	peerAddrs   map[int]net.Addr
 
 	ready <-chan any
 	quit  chan any
@@ -44,25 +50,47 @@ type Server struct {
 }
 
 func NewServer(serverId int, peerIds []int, storage Storage, ready <-chan any, commitChan chan<- CommitEntry) *Server {
+	return NewServerWithConfig(serverId, peerIds, storage, ready, commitChan, DefaultConfig())
+}
+
+// NewServerWithConfig is like NewServer, but its CM uses the given config
+// instead of DefaultConfig.
+func NewServerWithConfig(serverId int, peerIds []int, storage Storage, ready <-chan any, commitChan chan<- CommitEntry, config Config) *Server {
 	s := new(Server)
 	s.serverId = serverId
 	s.peerIds = peerIds
 	s.peerClients = make(map[int]*rpc.Client)
+	s.peerAddrs = make(map[int]net.Addr)
 	s.storage = storage
+	s.config = config
 	s.ready = ready
 	s.commitChan = commitChan
 	s.quit = make(chan any)
+	s.SetTransport(DirectTransport{})
+	return s
+}
+
+// NewServerWithCommitBatches is like NewServerWithConfig, but its CM reports
+// committed entries in batches on commitBatchChan; see
+// NewConsensusModuleWithCommitBatches.
+func NewServerWithCommitBatches(serverId int, peerIds []int, storage Storage, ready <-chan any, commitBatchChan chan<- []CommitEntry, config Config) *Server {
+	s := NewServerWithConfig(serverId, peerIds, storage, ready, nil, config)
+	s.commitBatchChan = commitBatchChan
 	return s
 }
 
 func (s *Server) Serve() {
 	s.mu.Lock()
-	s.cm = NewConsensusModule(s.serverId, s.peerIds, s, s.storage, s.ready, s.commitChan)
+	if s.commitBatchChan != nil {
+		s.cm = NewConsensusModuleWithCommitBatches(s.serverId, s.peerIds, s, s.storage, s.ready, s.commitBatchChan, s.config)
+	} else {
+		s.cm = NewConsensusModuleWithConfig(s.serverId, s.peerIds, s, s.storage, s.ready, s.commitChan, s.config)
+	}
 
 	// Create a new RPC server and register a RPCProxy that forwards all methods
-	// to n.cm
+	// to n.cm through the server's transport
 	s.rpcServer = rpc.NewServer()
-	s.rpcProxy = NewProxy(s.cm)
+	s.rpcProxy = NewProxy(s.cm, s)
 	s.rpcServer.RegisterName("ConsensusModule", s.rpcProxy)
 
 	var err error
@@ -89,7 +117,7 @@ func (s *Server) Serve() {
 			}
 			s.wg.Add(1)
 			go func() {
-				s.rpcServer.ServeConn(conn)
+				s.rpcServer.ServeCodec(newPeerCodec(conn))
 				s.wg.Done()
 			}()
 		}
@@ -101,6 +129,54 @@ func (s *Server) Submit(cmd any) int {
 	return s.cm.Submit(cmd)
 }
 
+// SubmitBatch wraps the underlying CM's SubmitBatch; see that method for
+// documentation.
+func (s *Server) SubmitBatch(cmds []any) int {
+	return s.cm.SubmitBatch(cmds)
+}
+
+// ReadIndex wraps the underlying CM's ReadIndex; see that method for
+// documentation.
+func (s *Server) ReadIndex() int {
+	return s.cm.ReadIndex()
+}
+
+// ReadState wraps the underlying CM's ReadState; see that method for
+// documentation.
+func (s *Server) ReadState() ReadState {
+	return s.cm.ReadState()
+}
+
+// LearnerProgress wraps the underlying CM's LearnerProgress; see that method
+// for documentation.
+func (s *Server) LearnerProgress() map[int]LearnerProgress {
+	return s.cm.LearnerProgress()
+}
+
+// TransferLeadership wraps the underlying CM's TransferLeadership; see that
+// method for documentation.
+func (s *Server) TransferLeadership(targetId int) bool {
+	return s.cm.TransferLeadership(targetId)
+}
+
+// LeaseRead wraps the underlying CM's LeaseRead; see that method for
+// documentation.
+func (s *Server) LeaseRead() int {
+	return s.cm.LeaseRead()
+}
+
+// LeaseStats wraps the underlying CM's LeaseStats; see that method for
+// documentation.
+func (s *Server) LeaseStats() (hits uint64, misses uint64) {
+	return s.cm.LeaseStats()
+}
+
+// Snapshot wraps the underlying CM's Snapshot; see that method for
+// documentation.
+func (s *Server) Snapshot(index int, snapshot []byte) error {
+	return s.cm.Snapshot(index, snapshot)
+}
+
 // DisconnectAll closes all the client connections to peers for this server.
 func (s *Server) DisconnectAll() {
 	s.mu.Lock()
@@ -110,6 +186,7 @@ func (s *Server) DisconnectAll() {
 			s.peerClients[id].Close()
 			s.peerClients[id] = nil
 		}
+		delete(s.peerAddrs, id)
 	}
 }
 
@@ -127,23 +204,29 @@ func (s *Server) GetListenAddr() net.Addr {
 	return s.listener.Addr()
 }
 
+// ConnectToPeer connects this server to the peer identified by peerId,
+// listening at addr. If the connection breaks later, for example because the
+// peer restarted, the server reconnects to addr on its own.
 func (s *Server) ConnectToPeer(peerId int, addr net.Addr) error {
 	s.mu.Lock()
 	defer s.mu.Unlock()
 	if s.peerClients[peerId] == nil {
-		client, err := rpc.Dial(addr.Network(), addr.String())
+		client, err := dialPeer(addr)
 		if err != nil {
 			return err
 		}
 		s.peerClients[peerId] = client
+		s.peerAddrs[peerId] = addr
 	}
 	return nil
 }
 
 // DisconnectPeer disconnects this server from the peer identified by peerId.
+// Calls to the peer fail until ConnectToPeer is called again.
 func (s *Server) DisconnectPeer(peerId int) error {
 	s.mu.Lock()
 	defer s.mu.Unlock()
+	delete(s.peerAddrs, peerId)
 	if s.peerClients[peerId] != nil {
 		err := s.peerClients[peerId].Close()
 		s.peerClients[peerId] = nil
@@ -152,6 +235,9 @@ func (s *Server) DisconnectPeer(peerId int) error {
 	return nil
 }
 
+// Call makes the RPC serviceMethod to peer id. It fails if no reply arrives
+// within callTimeout; a connection that stalls without breaking would
+// otherwise hold up the caller, and every later call on it, indefinitely.
 func (s *Server) Call(id int, serviceMethod string, args any, reply any) error {
 	s.mu.Lock()
 	peer := s.peerClients[id]
@@ -161,9 +247,64 @@ func (s *Server) Call(id int, serviceMethod string, args any, reply any) error {
 	// return an error.
 	if peer == nil {
 		return fmt.Errorf("call client %d after it's closed", id)
-	} else {
-		return s.rpcProxy.Call(peer, serviceMethod, args, reply)
 	}
+	done := make(chan error, 1)
+	go func() {
+		done <- s.Transport().Call(id, peer, serviceMethod, args, reply)
+	}()
+	timeout := time.NewTimer(s.callTimeout())
+	defer timeout.Stop()
+	var err error
+	select {
+	case err = <-done:
+	case <-timeout.C:
+		// The reply is abandoned; replacing the connection makes the pending
+		// call fail with rpc.ErrShutdown.
+		s.reconnect(id, peer)
+		return fmt.Errorf("call %s to %d timed out", serviceMethod, id)
+	}
+	if err == rpc.ErrShutdown || err == io.ErrUnexpectedEOF {
+		s.reconnect(id, peer)
+	}
+	return err
+}
+
+// callTimeout returns how long Call waits for a reply: the longest election
+// timeout the CM may pick. By then, the outcome of the RPC no longer matters
+// and the CM has moved on, retrying or starting another election.
+func (s *Server) callTimeout() time.Duration {
+	timeout := 2 * s.config.minElectionTimeout()
+	if s.config.AdaptiveTiming {
+		timeout *= adaptiveMaxElectionScale
+	}
+	return timeout
+}
+
+// reconnect replaces the client of peer peerId, whose connection broke or
+// stalled, with a new connection to the peer's address. Nothing is done if the
+// peer was disconnected or reconnected meanwhile, or can't be reached; the
+// next failing call tries again.
+func (s *Server) reconnect(peerId int, broken *rpc.Client) {
+	s.mu.Lock()
+	addr := s.peerAddrs[peerId]
+	current := s.peerClients[peerId]
+	s.mu.Unlock()
+	if addr == nil || current != broken {
+		return
+	}
+	client, err := dialPeer(addr)
+	if err != nil {
+		return
+	}
+
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	if s.peerClients[peerId] != broken || s.peerAddrs[peerId] != addr {
+		client.Close()
+		return
+	}
+	broken.Close()
+	s.peerClients[peerId] = client
 }
 
 // IsLeader checks if s thinks it's the leader in the Raft cluster.
@@ -172,98 +313,72 @@ func (s *Server) IsLeader() bool {
 	return isLeader
 }
 
-// Proxy provides access to the RPC proxy this server is using; this is only
-// for testing purposes to simulate faults.
-func (s *Server) Proxy() *RPCProxy {
-	return s.rpcProxy
+// LeaderId wraps the underlying CM's LeaderId; see that method for
+// documentation.
+func (s *Server) LeaderId() int {
+	return s.cm.LeaderId()
+}
+
+// SetTransport makes the server use t for its RPCs to and from peers,
+// replacing its current transport; it can be called while the server runs.
+func (s *Server) SetTransport(t Transport) {
+	s.transport.Store(&transportRef{t})
+}
+
+// Transport returns the transport the server currently uses.
+func (s *Server) Transport() Transport {
+	return s.transport.Load().t
+}
+
+// transportRef lets Server swap its transport atomically, since incoming RPCs
+// look it up without taking s.mu.
+type transportRef struct {
+	t Transport
 }
 
 // RPCProxy is a pass-thru proxy server for ConsensusModule's RPC methods. It
-// serves RPC requests made to a CM and manipulates them before forwarding to
-// the CM itself.
-//
-// It's useful for things like:
-//   - Simulating dropping of RPC calls
-//   - Simulating a small delay in RPC transmission.
-//   - Simulating possible unreliable connections by delaying some messages
-//     significantly and dropping others when RAFT_UNRELIABLE_RPC is set.
+// serves RPC requests made to a CM, letting the server's transport fail or
+// delay them before forwarding them to the CM itself.
 type RPCProxy struct {
-	mu sync.Mutex
-	cm *ConsensusModule
-
-	// numCallsBeforeDrop is used to control dropping RPC calls:
-	//   -1: means we're not dropping any calls
-	//    0: means we're dropping all calls now
-	//   >0: means we'll start dropping calls after this number is made
-	numCallsBeforeDrop int
+	cm     *ConsensusModule
+	server *Server
 }
 
-func NewProxy(cm *ConsensusModule) *RPCProxy {
+func NewProxy(cm *ConsensusModule, server *Server) *RPCProxy {
 	return &RPCProxy{
-		cm:                 cm,
-		numCallsBeforeDrop: -1,
+		cm:     cm,
+		server: server,
 	}
 }
 
 func (rpp *RPCProxy) RequestVote(args RequestVoteArgs, reply *RequestVoteReply) error {
-	if len(os.Getenv("RAFT_UNRELIABLE_RPC")) > 0 {
-		dice := rand.Intn(10)
-		if dice == 9 {
-			rpp.cm.dlog("drop RequestVote")
-			return fmt.Errorf("RPC failed")
-		} else if dice == 8 {
-			rpp.cm.dlog("delay RequestVote")
-			time.Sleep(75 * time.Millisecond)
-		}
-	} else {
-		time.Sleep(time.Duration(1+rand.Intn(5)) * time.Millisecond)
+	if err := rpp.server.Transport().Receive(args.CandidateId, "RequestVote"); err != nil {
+		rpp.cm.dlog("drop RequestVote: %v", err)
+		return err
 	}
 	return rpp.cm.RequestVote(args, reply)
 }
 
 func (rpp *RPCProxy) AppendEntries(args AppendEntriesArgs, reply *AppendEntriesReply) error {
-	if len(os.Getenv("RAFT_UNRELIABLE_RPC")) > 0 {
-		dice := rand.Intn(10)
-		if dice == 9 {
-			rpp.cm.dlog("drop AppendEntries")
-			return fmt.Errorf("RPC failed")
-		} else if dice == 8 {
-			rpp.cm.dlog("delay AppendEntries")
-			time.Sleep(75 * time.Millisecond)
-		}
-	} else {
-		time.Sleep(time.Duration(1+rand.Intn(5)) * time.Millisecond)
+	if err := rpp.server.Transport().Receive(args.LeaderId, "AppendEntries"); err != nil {
+		rpp.cm.dlog("drop AppendEntries: %v", err)
+		return err
 	}
 	return rpp.cm.AppendEntries(args, reply)
 }
 
-func (rpp *RPCProxy) Call(peer *rpc.Client, method string, args any, reply any) error {
-	rpp.mu.Lock()
-	if rpp.numCallsBeforeDrop == 0 {
-		rpp.mu.Unlock()
-		rpp.cm.dlog("drop Call %s: %v", method, args)
-		return fmt.Errorf("RPC failed")
-	} else {
-		if rpp.numCallsBeforeDrop > 0 {
-			rpp.numCallsBeforeDrop--
-		}
-		rpp.mu.Unlock()
-		return peer.Call(method, args, reply)
+func (rpp *RPCProxy) InstallSnapshot(args InstallSnapshotArgs, reply *InstallSnapshotReply) error {
+	if err := rpp.server.Transport().Receive(args.LeaderId, "InstallSnapshot"); err != nil {
+		rpp.cm.dlog("drop InstallSnapshot: %v", err)
+		return err
 	}
+	return rpp.cm.InstallSnapshot(args, reply)
 }
 
-// DropCallsAfterN instruct the proxy to drop calls after n are made from this
-// point.
-func (rpp *RPCProxy) DropCallsAfterN(n int) {
-	rpp.mu.Lock()
-	defer rpp.mu.Unlock()
-
-	rpp.numCallsBeforeDrop = n
-}
-
-func (rpp *RPCProxy) DontDropCalls() {
-	rpp.mu.Lock()
-	defer rpp.mu.Unlock()
-
-	rpp.numCallsBeforeDrop = -1
+func (rpp *RPCProxy) TimeoutNow(args TimeoutNowArgs, reply *TimeoutNowReply) error {
+	if err := rpp.server.Transport().Receive(args.LeaderId, "TimeoutNow"); err != nil {
+		rpp.cm.dlog("drop TimeoutNow: %v", err)
+		return err
+	}
+	return rpp.cm.TimeoutNow(args, reply)
 }
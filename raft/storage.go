@@ -14,6 +14,39 @@ type Storage interface {
 	HasData() bool
 }
 
+// LogStorage is implemented by Storage providers that persist the log
+// incrementally. A CM whose storage implements it hands over only the entries
+// that changed, instead of re-encoding its whole log under the "log" key.
+type LogStorage interface {
+	Storage
+
+	// AppendEntries stores entries at consecutive log indices starting from
+	// index, first discarding any stored entries at index and beyond. index
+	// is at most the index that follows the last stored entry.
+	AppendEntries(index int, entries []LogEntry)
+
+	// Entries returns the index of the first stored log entry, and all
+	// stored entries.
+	Entries() (firstIndex int, entries []LogEntry)
+
+	// Compact allows the storage to discard the entries before index, which
+	// are covered by a snapshot. If index is past the last stored entry, all
+	// entries are discarded and the next AppendEntries starts at index.
+	Compact(index int)
+}
+
+// DurableStorage is implemented by Storage providers whose writes become
+// durable asynchronously, so that several writers can share one sync. The CM
+// calls WaitDurable without holding its lock before it acknowledges anything
+// it persisted.
+type DurableStorage interface {
+	Storage
+
+	// WaitDurable blocks until all writes made before the call are on stable
+	// storage.
+	WaitDurable()
+}
+
 // MapStorage is a simple in-memory implementation of Storage for testing.
 type MapStorage struct {
 	mu sync.Mutex
@@ -5,7 +5,10 @@
 package raft
 
 import (
+	"bytes"
+	"encoding/gob"
 	"log"
+	"os"
 	"sync"
 	"testing"
 	"time"
@@ -20,11 +23,13 @@ type Harness struct {
 
 	// cluster is a list of all the raft servers participating in a cluster.
 	cluster []*Server
-	storage []*MapStorage
+	storage []Storage
 
 	// commitChans has a channel per server in cluster with the commit channel for
-	// that server.
-	commitChans []chan CommitEntry
+	// that server. In a harness created with NewHarnessWithCommitBatches,
+	// servers report commits on commitBatchChans instead.
+	commitChans      []chan CommitEntry
+	commitBatchChans []chan []CommitEntry
 
 	// commits at index i holds the sequence of commits made by server i so far.
 	// It is populated by goroutines that listen on the corresponding commitChans
@@ -41,20 +46,53 @@ type Harness struct {
 	// connected implies alive.
 	alive []bool
 
+	// config is the CM configuration used by all servers.
+	config Config
+
 	n int
-	t *testing.T
+	t testing.TB
 }
 
 // NewHarness creates a new test Harness, initialized with n servers connected
 // to each other.
-func NewHarness(t *testing.T, n int) *Harness {
+func NewHarness(t testing.TB, n int) *Harness {
+	return NewHarnessWithConfig(t, n, DefaultConfig())
+}
+
+// NewHarnessWithConfig is like NewHarness, but all servers use the given CM
+// config.
+func NewHarnessWithConfig(t testing.TB, n int, config Config) *Harness {
+	return newHarness(t, n, config, func(int) Storage { return NewMapStorage() })
+}
+
+// NewHarnessWithStorage is like NewHarness, but server i uses the storage
+// returned by newStorage(i), which it keeps across crashes and restarts.
+func NewHarnessWithStorage(t testing.TB, n int, newStorage func(id int) Storage) *Harness {
+	return newHarness(t, n, DefaultConfig(), newStorage)
+}
+
+// NewHarnessWithCommitBatches is like NewHarness, but servers report committed
+// entries in batches; see NewServerWithCommitBatches.
+func NewHarnessWithCommitBatches(t testing.TB, n int) *Harness {
+	return newHarnessWithCommitBatches(t, n, DefaultConfig(), func(int) Storage { return NewMapStorage() }, true)
+}
+
+func newHarness(t testing.TB, n int, config Config, newStorage func(id int) Storage) *Harness {
+	return newHarnessWithCommitBatches(t, n, config, newStorage, false)
+}
+
+func newHarnessWithCommitBatches(t testing.TB, n int, config Config, newStorage func(id int) Storage, batches bool) *Harness {
 	ns := make([]*Server, n)
 	connected := make([]bool, n)
 	alive := make([]bool, n)
 	commitChans := make([]chan CommitEntry, n)
+	var commitBatchChans []chan []CommitEntry
+	if batches {
+		commitBatchChans = make([]chan []CommitEntry, n)
+	}
 	commits := make([][]CommitEntry, n)
 	ready := make(chan any)
-	storage := make([]*MapStorage, n)
+	storage := make([]Storage, n)
 
 	// Create all Servers in this cluster, assign ids and peer ids.
 	for i := 0; i < n; i++ {
@@ -65,9 +103,15 @@ func NewHarness(t *testing.T, n int) *Harness {
 			}
 		}
 
-		storage[i] = NewMapStorage()
-		commitChans[i] = make(chan CommitEntry)
-		ns[i] = NewServer(i, peerIds, storage[i], ready, commitChans[i])
+		storage[i] = newStorage(i)
+		if batches {
+			commitBatchChans[i] = make(chan []CommitEntry)
+			ns[i] = NewServerWithCommitBatches(i, peerIds, storage[i], ready, commitBatchChans[i], config)
+		} else {
+			commitChans[i] = make(chan CommitEntry)
+			ns[i] = NewServerWithConfig(i, peerIds, storage[i], ready, commitChans[i], config)
+		}
+		ns[i].SetTransport(newHarnessFaultInjector())
 		ns[i].Serve()
 		alive[i] = true
 	}
@@ -84,17 +128,23 @@ func NewHarness(t *testing.T, n int) *Harness {
 	close(ready)
 
 	h := &Harness{
-		cluster:     ns,
-		storage:     storage,
-		commitChans: commitChans,
-		commits:     commits,
-		connected:   connected,
-		alive:       alive,
-		n:           n,
-		t:           t,
+		cluster:          ns,
+		storage:          storage,
+		commitChans:      commitChans,
+		commitBatchChans: commitBatchChans,
+		commits:          commits,
+		connected:        connected,
+		alive:            alive,
+		config:           config,
+		n:                n,
+		t:                t,
 	}
 	for i := 0; i < n; i++ {
-		go h.collectCommits(i)
+		if batches {
+			go h.collectCommitBatches(i)
+		} else {
+			go h.collectCommits(i)
+		}
 	}
 	return h
 }
@@ -113,7 +163,11 @@ func (h *Harness) Shutdown() {
 		}
 	}
 	for i := 0; i < h.n; i++ {
-		close(h.commitChans[i])
+		if h.commitBatchChans != nil {
+			close(h.commitBatchChans[i])
+		} else {
+			close(h.commitChans[i])
+		}
 	}
 }
 
@@ -178,7 +232,12 @@ func (h *Harness) RestartPeer(id int) {
 	}
 
 	ready := make(chan any)
-	h.cluster[id] = NewServer(id, peerIds, h.storage[id], ready, h.commitChans[id])
+	if h.commitBatchChans != nil {
+		h.cluster[id] = NewServerWithCommitBatches(id, peerIds, h.storage[id], ready, h.commitBatchChans[id], h.config)
+	} else {
+		h.cluster[id] = NewServerWithConfig(id, peerIds, h.storage[id], ready, h.commitChans[id], h.config)
+	}
+	h.cluster[id].SetTransport(newHarnessFaultInjector())
 	h.cluster[id].Serve()
 	h.ReconnectPeer(id)
 	close(ready)
@@ -190,13 +249,31 @@ func (h *Harness) RestartPeer(id int) {
 // are made.
 func (h *Harness) PeerDropCallsAfterN(id int, n int) {
 	tlog("peer %d drop calls after %d", id, n)
-	h.cluster[id].Proxy().DropCallsAfterN(n)
+	h.Faults(id).DropCallsAfterN(n)
 }
 
 // PeerDontDropCalls instructs peer `id` to stop dropping calls.
 func (h *Harness) PeerDontDropCalls(id int) {
 	tlog("peer %d don't drop calls")
-	h.cluster[id].Proxy().DontDropCalls()
+	h.Faults(id).DontDropCalls()
+}
+
+// Faults returns the fault injector of peer `id`.
+func (h *Harness) Faults(id int) *FaultInjector {
+	return h.cluster[id].Transport().(*FaultInjector)
+}
+
+// newHarnessFaultInjector creates the transport of harness servers: incoming
+// RPCs get a small delay, or when RAFT_UNRELIABLE_RPC is set, some are
+// dropped and others delayed significantly.
+func newHarnessFaultInjector() *FaultInjector {
+	fi := NewFaultInjector(DirectTransport{})
+	if len(os.Getenv("RAFT_UNRELIABLE_RPC")) > 0 {
+		fi.SetUnreliable(10, 10, 75*time.Millisecond)
+	} else {
+		fi.SetDelay(1*time.Millisecond, 5*time.Millisecond)
+	}
+	return fi
 }
 
 // CheckSingleLeader checks that only a single server thinks it's the leader.
@@ -341,6 +418,31 @@ func (h *Harness) SubmitToServer(serverId int, cmd any) int {
 	return h.cluster[serverId].Submit(cmd)
 }
 
+// SubmitBatchToServer submits the commands to serverId as a single batch.
+func (h *Harness) SubmitBatchToServer(serverId int, cmds []any) int {
+	return h.cluster[serverId].SubmitBatch(cmds)
+}
+
+// SnapshotServer makes serverId take a snapshot of all the commands it has
+// committed so far, encoded as a gob []int.
+func (h *Harness) SnapshotServer(serverId int) {
+	h.mu.Lock()
+	cmds := make([]int, len(h.commits[serverId]))
+	for i, c := range h.commits[serverId] {
+		cmds[i] = c.Command.(int)
+	}
+	h.mu.Unlock()
+
+	var data bytes.Buffer
+	if err := gob.NewEncoder(&data).Encode(cmds); err != nil {
+		h.t.Fatal(err)
+	}
+	tlog("snapshot %d at index %d", serverId, len(cmds)-1)
+	if err := h.cluster[serverId].Snapshot(len(cmds)-1, data.Bytes()); err != nil {
+		h.t.Fatal(err)
+	}
+}
+
 func tlog(format string, a ...any) {
 	format = "[TEST] " + format
 	log.Printf(format, a...)
@@ -352,12 +454,43 @@ func sleepMs(n int) {
 
 // collectCommits reads channel commitChans[i] and adds all received entries
 // to the corresponding commits[i]. It's blocking and should be run in a
-// separate goroutine. It returns when commitChans[i] is closed.
+// separate goroutine. It returns when commitChans[i] is closed. A snapshot
+// made by SnapshotServer replaces commits[i] with the commands it holds.
 func (h *Harness) collectCommits(i int) {
 	for c := range h.commitChans[i] {
 		h.mu.Lock()
 		tlog("collectCommits(%d) got %+v", i, c)
-		h.commits[i] = append(h.commits[i], c)
+		h.applyCommit(i, c)
+		h.mu.Unlock()
+	}
+}
+
+// collectCommitBatches is like collectCommits, for a harness whose servers
+// report commits in batches.
+func (h *Harness) collectCommitBatches(i int) {
+	for batch := range h.commitBatchChans[i] {
+		h.mu.Lock()
+		tlog("collectCommitBatches(%d) got %d entries", i, len(batch))
+		for _, c := range batch {
+			h.applyCommit(i, c)
+		}
 		h.mu.Unlock()
 	}
 }
+
+// applyCommit records commit c of server i.
+// Expects h.mu to be locked.
+func (h *Harness) applyCommit(i int, c CommitEntry) {
+	if c.Snapshot != nil {
+		var cmds []int
+		if err := gob.NewDecoder(bytes.NewReader(c.Snapshot)).Decode(&cmds); err != nil {
+			log.Fatal(err)
+		}
+		h.commits[i] = h.commits[i][:0]
+		for index, cmd := range cmds {
+			h.commits[i] = append(h.commits[i], CommitEntry{Command: cmd, Index: index, Term: c.Term})
+		}
+	} else {
+		h.commits[i] = append(h.commits[i], c)
+	}
+}
@@ -0,0 +1,183 @@
+// Transports that carry RPCs between Raft peers.
+package raft
+
+import (
+	"fmt"
+	"math/rand"
+	"net/rpc"
+	"sync"
+	"time"
+)
+
+// Transport carries the RPCs between a Server and its peers. A Server uses
+// DirectTransport unless it's given another one with SetTransport; a
+// FaultInjector can be layered on top of it to simulate network faults.
+type Transport interface {
+	// Call makes the RPC serviceMethod to peer peerId over its client
+	// connection.
+	Call(peerId int, client *rpc.Client, serviceMethod string, args any, reply any) error
+
+	// Receive is called before the CM handles an incoming RPC named method
+	// from peer peerId. If it returns an error, the RPC fails with it instead.
+	Receive(peerId int, method string) error
+}
+
+// DirectTransport makes RPCs on the peer connections as they are, without
+// adding anything to them. It's the transport servers use in production.
+type DirectTransport struct{}
+
+func (DirectTransport) Call(peerId int, client *rpc.Client, serviceMethod string, args any, reply any) error {
+	return client.Call(serviceMethod, args, reply)
+}
+
+func (DirectTransport) Receive(peerId int, method string) error {
+	return nil
+}
+
+// FaultInjector is a Transport middleware that simulates an unreliable network
+// in front of another Transport. It's meant for tests; all its faults can be
+// switched on and off while the server runs, and none is on initially:
+//   - Dropping all outgoing calls after a number of them are made
+//     (DropCallsAfterN).
+//   - Partitioning the server from some of its peers, in both directions
+//     (Partition).
+//   - Delaying incoming RPCs by a random duration (SetDelay).
+//   - Dropping a percentage of incoming RPCs and delaying another percentage
+//     significantly (SetUnreliable).
+type FaultInjector struct {
+	next Transport
+
+	mu sync.Mutex
+
+	// numCallsBeforeDrop is used to control dropping RPC calls:
+	//   -1: means we're not dropping any calls
+	//    0: means we're dropping all calls now
+	//   >0: means we'll start dropping calls after this number is made
+	numCallsBeforeDrop int
+
+	// partitioned is the set of peers whose RPCs are dropped in both
+	// directions.
+	partitioned map[int]bool
+
+	// Incoming RPCs are delayed by a random duration in [minDelay, maxDelay].
+	minDelay time.Duration
+	maxDelay time.Duration
+
+	// dropPercent of the incoming RPCs are dropped, and slowPercent of them
+	// are delayed by slowDelay.
+	dropPercent int
+	slowPercent int
+	slowDelay   time.Duration
+}
+
+// NewFaultInjector creates a FaultInjector that passes RPCs on to next.
+func NewFaultInjector(next Transport) *FaultInjector {
+	return &FaultInjector{
+		next:               next,
+		numCallsBeforeDrop: -1,
+		partitioned:        make(map[int]bool),
+	}
+}
+
+func (fi *FaultInjector) Call(peerId int, client *rpc.Client, serviceMethod string, args any, reply any) error {
+	fi.mu.Lock()
+	if fi.numCallsBeforeDrop == 0 || fi.partitioned[peerId] {
+		fi.mu.Unlock()
+		return fmt.Errorf("RPC failed")
+	}
+	if fi.numCallsBeforeDrop > 0 {
+		fi.numCallsBeforeDrop--
+	}
+	fi.mu.Unlock()
+	return fi.next.Call(peerId, client, serviceMethod, args, reply)
+}
+
+func (fi *FaultInjector) Receive(peerId int, method string) error {
+	fi.mu.Lock()
+	if fi.partitioned[peerId] {
+		fi.mu.Unlock()
+		return fmt.Errorf("RPC failed")
+	}
+	delay := fi.minDelay
+	if fi.maxDelay > fi.minDelay {
+		delay += time.Duration(rand.Int63n(int64(fi.maxDelay-fi.minDelay) + 1))
+	}
+	dice := rand.Intn(100)
+	drop := dice < fi.dropPercent
+	if !drop && dice < fi.dropPercent+fi.slowPercent {
+		delay = fi.slowDelay
+	}
+	fi.mu.Unlock()
+
+	if drop {
+		return fmt.Errorf("RPC failed")
+	}
+	if delay > 0 {
+		time.Sleep(delay)
+	}
+	return fi.next.Receive(peerId, method)
+}
+
+// DropCallsAfterN instructs the injector to drop outgoing calls after n are
+// made from this point.
+func (fi *FaultInjector) DropCallsAfterN(n int) {
+	fi.mu.Lock()
+	defer fi.mu.Unlock()
+
+	fi.numCallsBeforeDrop = n
+}
+
+// DontDropCalls stops dropping calls after DropCallsAfterN.
+func (fi *FaultInjector) DontDropCalls() {
+	fi.mu.Lock()
+	defer fi.mu.Unlock()
+
+	fi.numCallsBeforeDrop = -1
+}
+
+// Partition drops all RPCs to and from the given peers until they're healed.
+// Unlike Server.DisconnectPeer, the peer connections stay open.
+func (fi *FaultInjector) Partition(peerIds ...int) {
+	fi.mu.Lock()
+	defer fi.mu.Unlock()
+
+	for _, peerId := range peerIds {
+		fi.partitioned[peerId] = true
+	}
+}
+
+// Heal undoes Partition for the given peers, or for all peers if none is
+// given.
+func (fi *FaultInjector) Heal(peerIds ...int) {
+	fi.mu.Lock()
+	defer fi.mu.Unlock()
+
+	if len(peerIds) == 0 {
+		clear(fi.partitioned)
+	}
+	for _, peerId := range peerIds {
+		delete(fi.partitioned, peerId)
+	}
+}
+
+// SetDelay delays every incoming RPC by a random duration in [min, max]; zero
+// durations turn the delay off.
+func (fi *FaultInjector) SetDelay(min, max time.Duration) {
+	fi.mu.Lock()
+	defer fi.mu.Unlock()
+
+	fi.minDelay = min
+	fi.maxDelay = max
+}
+
+// SetUnreliable drops dropPercent of the incoming RPCs, and delays another
+// slowPercent of them by slowDelay instead of the delay set with SetDelay.
+// Zero percentages turn these faults off.
+func (fi *FaultInjector) SetUnreliable(dropPercent int, slowPercent int, slowDelay time.Duration) {
+	fi.mu.Lock()
+	defer fi.mu.Unlock()
+
+	fi.dropPercent = dropPercent
+	fi.slowPercent = slowPercent
+	fi.slowDelay = slowDelay
+}
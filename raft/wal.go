@@ -0,0 +1,602 @@
+// Segmented append-only write-ahead log storage.
+package raft
+
+import (
+	"bufio"
+	"bytes"
+	"encoding/binary"
+	"encoding/gob"
+	"fmt"
+	"hash/crc32"
+	"io"
+	"log"
+	"os"
+	"path/filepath"
+	"runtime"
+	"sort"
+	"strings"
+	"sync"
+	"time"
+)
+
+// DefaultWALSegmentBytes is the size at which WALStorage starts a new log
+// segment.
+const DefaultWALSegmentBytes = 16 << 20
+
+// WALConfig holds the tunable parameters of a WALStorage. Start from
+// DefaultWALConfig and override the fields of interest.
+type WALConfig struct {
+	// SegmentBytes is the size at which a new log segment is started.
+	SegmentBytes int64
+
+	// SyncWindow is how long the syncer waits after the first unsynced write
+	// before it syncs, so that more writers share the sync. With zero, it
+	// syncs as soon as the previous sync is done, which still groups the
+	// writes made while a sync is in progress.
+	SyncWindow time.Duration
+
+	// SyncBytes ends the window early once this many bytes are unsynced.
+	SyncBytes int64
+}
+
+// DefaultWALConfig returns the configuration used by NewWALStorage.
+func DefaultWALConfig() WALConfig {
+	return WALConfig{
+		SegmentBytes: DefaultWALSegmentBytes,
+		SyncBytes:    1 << 20,
+	}
+}
+
+const (
+	walSegmentSuffix = ".wal"
+	walMetaSuffix    = ".meta"
+
+	// walRecordHeader is the size of a record header: payload length and
+	// CRC-32 of the payload, both little-endian uint32.
+	walRecordHeader = 8
+)
+
+// WALStorage is a LogStorage that keeps the Raft log in an append-only
+// write-ahead log made of segment files in a directory. Appending entries
+// writes only those entries, and a conflict truncates the tail of the log, so
+// the cost of persisting doesn't grow with the log; Compact deletes the
+// segments a snapshot made obsolete. Other keys (currentTerm, votedFor,
+// snapshot) are kept in one metadata file per key, which is synced and
+// replaced atomically on every Set of that key.
+//
+// Appends are made durable with group commit: AppendEntries only writes, and a
+// background syncer syncs everything written within a window (see WALConfig)
+// at once, along with the directory when segments were created or removed.
+// WaitDurable blocks until the writes made before it are synced, so the CM
+// calls it outside its lock and concurrent writers share one sync.
+//
+// Each segment is named after the log index of its first entry and holds
+// length- and checksum-prefixed gob records, one per entry. A torn record at
+// the end of the last segment, left by a crash during an append, is dropped
+// when the directory is opened.
+type WALStorage struct {
+	mu sync.Mutex
+
+	dir    string
+	config WALConfig
+
+	meta map[string][]byte
+
+	// segments are ordered by the index of their first entry and together
+	// hold the log without gaps, starting at the first segment's firstIndex.
+	// The last one is open for appending.
+	segments []*walSegment
+	tail     *os.File
+
+	// written and synced count the bytes appended so far and the bytes known
+	// to be durable, and dirChanges and dirSynced likewise count the segment
+	// files created or removed. retired holds segment files replaced as the
+	// tail since the last sync; the syncer syncs and closes them. cond is
+	// signaled when there is something to sync and when a sync completes.
+	// syncs counts the completed group syncs.
+	written    int64
+	synced     int64
+	dirChanges int
+	dirSynced  int
+	syncs      int
+	retired    []*os.File
+	cond       *sync.Cond
+	kick       chan struct{}
+	closed     bool
+	syncWg     sync.WaitGroup
+}
+
+type walSegment struct {
+	firstIndex int
+
+	// offsets holds the file offset of each entry in the segment, and size
+	// the offset just past the last one.
+	offsets []int64
+	size    int64
+}
+
+func (seg *walSegment) path(dir string) string {
+	return filepath.Join(dir, fmt.Sprintf("%020d%s", seg.firstIndex, walSegmentSuffix))
+}
+
+// NewWALStorage opens the write-ahead log in dir, creating the directory if
+// needed. Segments grow up to about segmentBytes; a non-positive value means
+// DefaultWALSegmentBytes. Close has to be called to stop its syncer.
+func NewWALStorage(dir string, segmentBytes int64) (*WALStorage, error) {
+	config := DefaultWALConfig()
+	if segmentBytes > 0 {
+		config.SegmentBytes = segmentBytes
+	}
+	return NewWALStorageWithConfig(dir, config)
+}
+
+// NewWALStorageWithConfig is like NewWALStorage, but uses the given config.
+func NewWALStorageWithConfig(dir string, config WALConfig) (*WALStorage, error) {
+	if config.SegmentBytes <= 0 || config.SyncWindow < 0 {
+		return nil, fmt.Errorf("invalid WAL config %+v", config)
+	}
+	if err := os.MkdirAll(dir, 0o755); err != nil {
+		return nil, err
+	}
+	ws := &WALStorage{
+		dir:    dir,
+		config: config,
+		meta:   make(map[string][]byte),
+		kick:   make(chan struct{}, 1),
+	}
+	ws.cond = sync.NewCond(&ws.mu)
+	if err := ws.loadMeta(); err != nil {
+		return nil, err
+	}
+	if err := ws.loadSegments(); err != nil {
+		return nil, err
+	}
+	ws.syncWg.Add(1)
+	go ws.runSyncer()
+	return ws, nil
+}
+
+func (ws *WALStorage) loadMeta() error {
+	names, err := filepath.Glob(filepath.Join(ws.dir, "*"+walMetaSuffix))
+	if err != nil {
+		return err
+	}
+	for _, name := range names {
+		data, err := os.ReadFile(name)
+		if err != nil {
+			return err
+		}
+		ws.meta[strings.TrimSuffix(filepath.Base(name), walMetaSuffix)] = data
+	}
+	return nil
+}
+
+func (ws *WALStorage) loadSegments() error {
+	names, err := filepath.Glob(filepath.Join(ws.dir, "*"+walSegmentSuffix))
+	if err != nil {
+		return err
+	}
+	sort.Strings(names)
+
+	nextIndex := 0
+	for i, name := range names {
+		var firstIndex int
+		base := strings.TrimSuffix(filepath.Base(name), walSegmentSuffix)
+		if _, err := fmt.Sscanf(base, "%d", &firstIndex); err != nil {
+			return fmt.Errorf("bad WAL segment name %s", name)
+		}
+		if i == 0 {
+			// Earlier segments may have been compacted away.
+			nextIndex = firstIndex
+		}
+		if firstIndex != nextIndex {
+			return fmt.Errorf("WAL segment %s doesn't start at index %d", name, nextIndex)
+		}
+		seg := &walSegment{firstIndex: firstIndex}
+		torn, err := seg.scan(name)
+		if err != nil {
+			return err
+		}
+		if torn {
+			if i != len(names)-1 {
+				return fmt.Errorf("corrupt record in WAL segment %s", name)
+			}
+			if err := os.Truncate(name, seg.size); err != nil {
+				return err
+			}
+		}
+		ws.segments = append(ws.segments, seg)
+		nextIndex += len(seg.offsets)
+	}
+
+	if len(ws.segments) > 0 {
+		last := ws.segments[len(ws.segments)-1]
+		ws.tail, err = os.OpenFile(last.path(ws.dir), os.O_WRONLY|os.O_APPEND, 0o644)
+		return err
+	}
+	return nil
+}
+
+// scan reads the segment file at path and records its entry offsets. It
+// reports whether the segment ends with a torn or corrupt record, in which
+// case seg.size is the offset where that record starts.
+func (seg *walSegment) scan(path string) (torn bool, err error) {
+	f, err := os.Open(path)
+	if err != nil {
+		return false, err
+	}
+	defer f.Close()
+	info, err := f.Stat()
+	if err != nil {
+		return false, err
+	}
+
+	r := bufio.NewReader(f)
+	var header [walRecordHeader]byte
+	for {
+		if _, err := io.ReadFull(r, header[:]); err == io.EOF {
+			return false, nil
+		} else if err == io.ErrUnexpectedEOF {
+			return true, nil
+		} else if err != nil {
+			return false, err
+		}
+		length := binary.LittleEndian.Uint32(header[0:4])
+		if int64(length) > info.Size()-seg.size-walRecordHeader {
+			// A torn or corrupt header; don't allocate what it claims.
+			return true, nil
+		}
+		payload := make([]byte, length)
+		if _, err := io.ReadFull(r, payload); err == io.EOF || err == io.ErrUnexpectedEOF {
+			return true, nil
+		} else if err != nil {
+			return false, err
+		}
+		if crc32.ChecksumIEEE(payload) != binary.LittleEndian.Uint32(header[4:8]) {
+			return true, nil
+		}
+		seg.offsets = append(seg.offsets, seg.size)
+		seg.size += walRecordHeader + int64(length)
+	}
+}
+
+// lenLocked returns the index that follows the last entry in the log.
+// Expects ws.mu to be locked.
+func (ws *WALStorage) lenLocked() int {
+	if len(ws.segments) == 0 {
+		return 0
+	}
+	last := ws.segments[len(ws.segments)-1]
+	return last.firstIndex + len(last.offsets)
+}
+
+func (ws *WALStorage) Get(key string) ([]byte, bool) {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	v, found := ws.meta[key]
+	return v, found
+}
+
+// Set stores a metadata key. The key's file is written to a temporary file,
+// synced and renamed over the previous one, and the rename is synced.
+func (ws *WALStorage) Set(key string, value []byte) {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	ws.meta[key] = value
+
+	path := filepath.Join(ws.dir, key+walMetaSuffix)
+	tmpPath := path + ".tmp"
+	f, err := os.Create(tmpPath)
+	if err != nil {
+		log.Fatal(err)
+	}
+	if _, err := f.Write(value); err != nil {
+		log.Fatal(err)
+	}
+	if err := f.Sync(); err != nil {
+		log.Fatal(err)
+	}
+	if err := f.Close(); err != nil {
+		log.Fatal(err)
+	}
+	if err := os.Rename(tmpPath, path); err != nil {
+		log.Fatal(err)
+	}
+	if err := syncDir(ws.dir); err != nil {
+		log.Fatal(err)
+	}
+}
+
+func (ws *WALStorage) HasData() bool {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	return len(ws.meta) > 0 || ws.lenLocked() > 0
+}
+
+// AppendEntries implements LogStorage.
+func (ws *WALStorage) AppendEntries(index int, entries []LogEntry) {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+
+	if len(ws.segments) == 0 {
+		// Nothing stored yet, or a crash interrupted Compact.
+		ws.startSegmentLocked(index)
+	}
+	if n := ws.lenLocked(); index > n {
+		log.Fatalf("WAL append at index %d past the end of the log (at %d)", index, n)
+	} else if index < ws.segments[0].firstIndex {
+		log.Fatalf("WAL append at index %d before the start of the log (at %d)", index, ws.segments[0].firstIndex)
+	} else if index < n {
+		ws.truncateLocked(index)
+	}
+
+	var buf bytes.Buffer
+	for i, entry := range entries {
+		if ws.segments[len(ws.segments)-1].size >= ws.config.SegmentBytes {
+			ws.writeTailLocked(&buf)
+			ws.startSegmentLocked(index + i)
+		}
+		seg := ws.segments[len(ws.segments)-1]
+		seg.offsets = append(seg.offsets, seg.size+int64(buf.Len()))
+		record := encodeWALRecord(entry)
+		buf.Write(record)
+		if seg.size+int64(buf.Len()) >= ws.config.SegmentBytes {
+			ws.writeTailLocked(&buf)
+		}
+	}
+	ws.writeTailLocked(&buf)
+}
+
+// writeTailLocked appends buf to the last segment, hands it to the syncer and
+// resets buf. Expects ws.mu to be locked.
+func (ws *WALStorage) writeTailLocked(buf *bytes.Buffer) {
+	if buf.Len() == 0 {
+		return
+	}
+	if _, err := ws.tail.Write(buf.Bytes()); err != nil {
+		log.Fatal(err)
+	}
+	ws.segments[len(ws.segments)-1].size += int64(buf.Len())
+	ws.written += int64(buf.Len())
+	buf.Reset()
+	ws.cond.Broadcast()
+	if ws.written-ws.synced >= ws.config.SyncBytes {
+		select {
+		case ws.kick <- struct{}{}:
+		default:
+		}
+	}
+}
+
+// retireTailLocked hands the tail segment file over to the syncer, which
+// syncs and closes it. Expects ws.mu to be locked.
+func (ws *WALStorage) retireTailLocked() {
+	if ws.tail != nil {
+		ws.retired = append(ws.retired, ws.tail)
+		ws.tail = nil
+	}
+}
+
+// WaitDurable implements DurableStorage. It blocks until everything written
+// before the call has been synced, including the directory entries.
+func (ws *WALStorage) WaitDurable() {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	target, dirTarget := ws.written, ws.dirChanges
+	for ws.synced < target || ws.dirSynced < dirTarget {
+		ws.cond.Wait()
+	}
+}
+
+// runSyncer syncs written data in groups until the WAL is closed.
+func (ws *WALStorage) runSyncer() {
+	defer ws.syncWg.Done()
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	idle := func() bool {
+		return ws.written == ws.synced && ws.dirChanges == ws.dirSynced && len(ws.retired) == 0
+	}
+	for {
+		for idle() && !ws.closed {
+			ws.cond.Wait()
+		}
+		if ws.closed && idle() {
+			return
+		}
+
+		if ws.config.SyncWindow > 0 && !ws.closed {
+			ws.mu.Unlock()
+			select {
+			case <-time.After(ws.config.SyncWindow):
+			case <-ws.kick:
+			}
+			ws.mu.Lock()
+		}
+
+		target, dirTarget, dirDirty := ws.written, ws.dirChanges, ws.dirChanges != ws.dirSynced
+		retired, tail := ws.retired, ws.tail
+		ws.retired = nil
+		ws.mu.Unlock()
+		for _, f := range retired {
+			if err := f.Sync(); err != nil {
+				log.Fatal(err)
+			}
+			if err := f.Close(); err != nil {
+				log.Fatal(err)
+			}
+		}
+		if tail != nil {
+			if err := tail.Sync(); err != nil {
+				log.Fatal(err)
+			}
+		}
+		// A segment's data is of no use after a crash unless its directory
+		// entry survives too.
+		if dirDirty {
+			if err := syncDir(ws.dir); err != nil {
+				log.Fatal(err)
+			}
+		}
+		ws.mu.Lock()
+		ws.synced = target
+		ws.dirSynced = dirTarget
+		ws.syncs++
+		ws.cond.Broadcast()
+	}
+}
+
+// startSegmentLocked closes the current tail segment and creates a new one
+// whose first entry is at firstIndex. Expects ws.mu to be locked.
+func (ws *WALStorage) startSegmentLocked(firstIndex int) {
+	ws.retireTailLocked()
+	seg := &walSegment{firstIndex: firstIndex}
+	f, err := os.OpenFile(seg.path(ws.dir), os.O_WRONLY|os.O_CREATE|os.O_TRUNC|os.O_APPEND, 0o644)
+	if err != nil {
+		log.Fatal(err)
+	}
+	ws.tail = f
+	ws.segments = append(ws.segments, seg)
+	ws.dirChanges++
+	ws.cond.Broadcast()
+}
+
+// truncateLocked discards all entries at index and beyond; index is not
+// before the first segment. The first segment is kept, possibly empty, since
+// its name records where the log starts. Expects ws.mu to be locked.
+func (ws *WALStorage) truncateLocked(index int) {
+	ws.retireTailLocked()
+	for len(ws.segments) > 1 {
+		seg := ws.segments[len(ws.segments)-1]
+		if seg.firstIndex < index {
+			break
+		}
+		if err := os.Remove(seg.path(ws.dir)); err != nil {
+			log.Fatal(err)
+		}
+		ws.segments = ws.segments[:len(ws.segments)-1]
+		ws.dirChanges++
+		ws.cond.Broadcast()
+	}
+
+	seg := ws.segments[len(ws.segments)-1]
+	if keep := index - seg.firstIndex; keep < len(seg.offsets) {
+		seg.size = seg.offsets[keep]
+		seg.offsets = seg.offsets[:keep]
+		if err := os.Truncate(seg.path(ws.dir), seg.size); err != nil {
+			log.Fatal(err)
+		}
+	}
+	f, err := os.OpenFile(seg.path(ws.dir), os.O_WRONLY|os.O_APPEND, 0o644)
+	if err != nil {
+		log.Fatal(err)
+	}
+	ws.tail = f
+}
+
+// Compact implements LogStorage. It deletes the oldest segments as long as
+// all their entries are before index, so up to a segment's worth of older
+// entries may remain. The deletions are synced before Compact returns.
+func (ws *WALStorage) Compact(index int) {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	defer func() {
+		if err := syncDir(ws.dir); err != nil {
+			log.Fatal(err)
+		}
+	}()
+
+	if index >= ws.lenLocked() {
+		// Nothing stored is needed any more; start over with an empty
+		// segment at index.
+		ws.retireTailLocked()
+		for _, seg := range ws.segments {
+			if err := os.Remove(seg.path(ws.dir)); err != nil {
+				log.Fatal(err)
+			}
+		}
+		ws.segments = nil
+		ws.startSegmentLocked(index)
+		return
+	}
+	for len(ws.segments) > 1 && ws.segments[1].firstIndex <= index {
+		if err := os.Remove(ws.segments[0].path(ws.dir)); err != nil {
+			log.Fatal(err)
+		}
+		ws.segments = ws.segments[1:]
+	}
+}
+
+// Entries implements LogStorage.
+func (ws *WALStorage) Entries() (int, []LogEntry) {
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+
+	if len(ws.segments) == 0 {
+		return 0, nil
+	}
+	firstIndex := ws.segments[0].firstIndex
+	entries := make([]LogEntry, 0, ws.lenLocked()-firstIndex)
+	for _, seg := range ws.segments {
+		data, err := os.ReadFile(seg.path(ws.dir))
+		if err != nil {
+			log.Fatal(err)
+		}
+		for _, offset := range seg.offsets {
+			length := binary.LittleEndian.Uint32(data[offset : offset+4])
+			payload := data[offset+walRecordHeader : offset+walRecordHeader+int64(length)]
+			var entry LogEntry
+			if err := gob.NewDecoder(bytes.NewReader(payload)).Decode(&entry); err != nil {
+				log.Fatal(err)
+			}
+			entries = append(entries, entry)
+		}
+	}
+	return firstIndex, entries
+}
+
+// Close syncs outstanding writes, stops the syncer and closes the open
+// segment file.
+func (ws *WALStorage) Close() error {
+	ws.mu.Lock()
+	ws.closed = true
+	ws.cond.Broadcast()
+	ws.mu.Unlock()
+	ws.syncWg.Wait()
+
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	if ws.tail == nil {
+		return nil
+	}
+	err := ws.tail.Close()
+	ws.tail = nil
+	return err
+}
+
+// syncDir makes the creation, removal and renaming of files in dir durable.
+// Windows can't sync a directory, but its file systems journal these changes.
+func syncDir(dir string) error {
+	if runtime.GOOS == "windows" {
+		return nil
+	}
+	d, err := os.Open(dir)
+	if err != nil {
+		return err
+	}
+	defer d.Close()
+	return d.Sync()
+}
+
+// encodeWALRecord returns the record for entry: a header with the payload
+// length and checksum, followed by the gob-encoded entry.
+func encodeWALRecord(entry LogEntry) []byte {
+	var payload bytes.Buffer
+	if err := gob.NewEncoder(&payload).Encode(entry); err != nil {
+		log.Fatal(err)
+	}
+	record := make([]byte, walRecordHeader+payload.Len())
+	binary.LittleEndian.PutUint32(record[0:4], uint32(payload.Len()))
+	binary.LittleEndian.PutUint32(record[4:8], crc32.ChecksumIEEE(payload.Bytes()))
+	copy(record[walRecordHeader:], payload.Bytes())
+	return record
+}
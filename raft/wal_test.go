@@ -0,0 +1,427 @@
+package raft
+
+import (
+	"fmt"
+	"os"
+	"path/filepath"
+	"reflect"
+	"runtime"
+	"strconv"
+	"sync"
+	"sync/atomic"
+	"testing"
+	"time"
+
+	"github.com/fortytw2/leaktest"
+)
+
+func walEntries(term int, cmds ...int) []LogEntry {
+	entries := make([]LogEntry, len(cmds))
+	for i, cmd := range cmds {
+		entries[i] = LogEntry{Command: cmd, Term: term}
+	}
+	return entries
+}
+
+func TestWALAppendTruncateReopen(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	dir := t.TempDir()
+	ws, err := NewWALStorage(dir, 128)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if ws.HasData() {
+		t.Errorf("new WAL has data")
+	}
+
+	ws.Set("currentTerm", []byte{2})
+	ws.AppendEntries(0, walEntries(1, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10))
+	ws.AppendEntries(10, walEntries(1, 11, 12))
+	// Replace the tail of the log, as a follower does on a conflict.
+	ws.AppendEntries(7, walEntries(2, 80, 90))
+	want := append(walEntries(1, 1, 2, 3, 4, 5, 6, 7), walEntries(2, 80, 90)...)
+	if _, got := ws.Entries(); !reflect.DeepEqual(got, want) {
+		t.Errorf("got entries %v, want %v", got, want)
+	}
+	if segments, _ := filepath.Glob(filepath.Join(dir, "*.wal")); len(segments) < 2 {
+		t.Errorf("got %d segments, want several", len(segments))
+	}
+	ws.Close()
+
+	ws, err = NewWALStorage(dir, 128)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer ws.Close()
+	if _, got := ws.Entries(); !reflect.DeepEqual(got, want) {
+		t.Errorf("got entries %v after reopening, want %v", got, want)
+	}
+	if v, found := ws.Get("currentTerm"); !found || !reflect.DeepEqual(v, []byte{2}) {
+		t.Errorf("got currentTerm %v (found=%v) after reopening, want [2]", v, found)
+	}
+
+	// Truncating at a segment boundary or to an empty log works too.
+	ws.AppendEntries(0, walEntries(3, 100))
+	if _, got := ws.Entries(); !reflect.DeepEqual(got, walEntries(3, 100)) {
+		t.Errorf("got entries %v, want %v", got, walEntries(3, 100))
+	}
+}
+
+func TestWALSyncsDirectory(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	ws, err := NewWALStorage(t.TempDir(), 128)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer ws.Close()
+
+	// Appends that start segments and a truncation that removes them are
+	// only durable once the directory is synced.
+	ws.AppendEntries(0, walEntries(1, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10))
+	ws.AppendEntries(2, walEntries(2, 30))
+	ws.WaitDurable()
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	if ws.dirChanges < 3 || ws.dirSynced != ws.dirChanges {
+		t.Errorf("got %d directory changes, %d synced; want several, all synced", ws.dirChanges, ws.dirSynced)
+	}
+}
+
+func TestWALDropsTornRecord(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	dir := t.TempDir()
+	ws, err := NewWALStorage(dir, 0)
+	if err != nil {
+		t.Fatal(err)
+	}
+	ws.AppendEntries(0, walEntries(1, 1, 2, 3))
+	ws.Close()
+
+	// Simulate a crash in the middle of appending a record.
+	segments, _ := filepath.Glob(filepath.Join(dir, "*.wal"))
+	f, err := os.OpenFile(segments[len(segments)-1], os.O_WRONLY|os.O_APPEND, 0o644)
+	if err != nil {
+		t.Fatal(err)
+	}
+	f.Write([]byte{42, 0, 0, 0, 1, 2})
+	f.Close()
+
+	ws, err = NewWALStorage(dir, 0)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer ws.Close()
+	ws.AppendEntries(3, walEntries(1, 4))
+	if _, got := ws.Entries(); !reflect.DeepEqual(got, walEntries(1, 1, 2, 3, 4)) {
+		t.Errorf("got entries %v, want %v", got, walEntries(1, 1, 2, 3, 4))
+	}
+}
+
+func TestWALDropsCorruptRecordLength(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	dir := t.TempDir()
+	ws, err := NewWALStorage(dir, 0)
+	if err != nil {
+		t.Fatal(err)
+	}
+	ws.AppendEntries(0, walEntries(1, 1, 2))
+	ws.Close()
+
+	// A complete header whose length field was torn: it claims almost 4 GiB.
+	segments, _ := filepath.Glob(filepath.Join(dir, "*.wal"))
+	f, err := os.OpenFile(segments[len(segments)-1], os.O_WRONLY|os.O_APPEND, 0o644)
+	if err != nil {
+		t.Fatal(err)
+	}
+	f.Write([]byte{0xf0, 0xff, 0xff, 0xff, 1, 2, 3, 4, 5, 6})
+	f.Close()
+
+	var before, after runtime.MemStats
+	runtime.ReadMemStats(&before)
+	ws, err = NewWALStorage(dir, 0)
+	runtime.ReadMemStats(&after)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer ws.Close()
+	if allocated := after.TotalAlloc - before.TotalAlloc; allocated > 1<<20 {
+		t.Errorf("opening the WAL allocated %d bytes", allocated)
+	}
+	if _, got := ws.Entries(); !reflect.DeepEqual(got, walEntries(1, 1, 2)) {
+		t.Errorf("got entries %v, want %v", got, walEntries(1, 1, 2))
+	}
+}
+
+func TestWALCompact(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	dir := t.TempDir()
+	ws, err := NewWALStorage(dir, 128)
+	if err != nil {
+		t.Fatal(err)
+	}
+	cmds := make([]int, 20)
+	for i := range cmds {
+		cmds[i] = i
+	}
+	ws.AppendEntries(0, walEntries(1, cmds...))
+	segments, _ := filepath.Glob(filepath.Join(dir, "*.wal"))
+
+	// Only whole segments before the compaction index are deleted.
+	ws.Compact(12)
+	firstIndex, entries := ws.Entries()
+	if firstIndex > 12 || firstIndex+len(entries) != 20 {
+		t.Errorf("got entries [%d, %d) after Compact(12), want a range ending at 20 from at most 12", firstIndex, firstIndex+len(entries))
+	}
+	if remaining, _ := filepath.Glob(filepath.Join(dir, "*.wal")); len(remaining) >= len(segments) {
+		t.Errorf("got %d segments after Compact, had %d", len(remaining), len(segments))
+	}
+	if !reflect.DeepEqual(entries, walEntries(1, cmds[firstIndex:]...)) {
+		t.Errorf("got entries %v from %d", entries, firstIndex)
+	}
+
+	// Compacting past the end leaves an empty log that resumes at the index,
+	// also after reopening.
+	ws.Compact(30)
+	ws.Close()
+	ws, err = NewWALStorage(dir, 128)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer ws.Close()
+	if firstIndex, entries := ws.Entries(); firstIndex != 30 || len(entries) != 0 {
+		t.Errorf("got %d entries from %d after Compact(30), want none from 30", len(entries), firstIndex)
+	}
+	ws.AppendEntries(30, walEntries(2, 300, 310))
+	ws.AppendEntries(30, walEntries(3, 301))
+	if firstIndex, entries := ws.Entries(); firstIndex != 30 || !reflect.DeepEqual(entries, walEntries(3, 301)) {
+		t.Errorf("got entries %v from %d, want [301] from 30", entries, firstIndex)
+	}
+}
+
+func TestCrashThenRestartAllWithWAL(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	dir := t.TempDir()
+	var wals []*WALStorage
+	defer func() {
+		for _, ws := range wals {
+			ws.Close()
+		}
+	}()
+	h := NewHarnessWithStorage(t, 3, func(id int) Storage {
+		ws, err := NewWALStorage(filepath.Join(dir, strconv.Itoa(id)), 256)
+		if err != nil {
+			t.Fatal(err)
+		}
+		wals = append(wals, ws)
+		return ws
+	})
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	for v := 5; v < 25; v++ {
+		h.SubmitToServer(origLeaderId, v)
+	}
+
+	sleepMs(350)
+	for v := 5; v < 25; v++ {
+		h.CheckCommittedN(v, 3)
+	}
+
+	for i := 0; i < 3; i++ {
+		h.CrashPeer((origLeaderId + i) % 3)
+	}
+
+	sleepMs(350)
+
+	for i := 0; i < 3; i++ {
+		h.RestartPeer((origLeaderId + i) % 3)
+	}
+
+	sleepMs(150)
+	newLeaderId, _ := h.CheckSingleLeader()
+
+	h.SubmitToServer(newLeaderId, 25)
+	sleepMs(250)
+
+	for v := 5; v <= 25; v++ {
+		h.CheckCommittedN(v, 3)
+	}
+}
+
+func TestSnapshotCompactsWAL(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	dir := t.TempDir()
+	var wals []*WALStorage
+	defer func() {
+		for _, ws := range wals {
+			ws.Close()
+		}
+	}()
+	h := NewHarnessWithStorage(t, 3, func(id int) Storage {
+		ws, err := NewWALStorage(filepath.Join(dir, strconv.Itoa(id)), 256)
+		if err != nil {
+			t.Fatal(err)
+		}
+		wals = append(wals, ws)
+		return ws
+	})
+	defer h.Shutdown()
+
+	origLeaderId, _ := h.CheckSingleLeader()
+	for v := 5; v < 45; v++ {
+		h.SubmitToServer(origLeaderId, v)
+	}
+	sleepMs(350)
+	for i := 0; i < 3; i++ {
+		h.SnapshotServer(i)
+		if firstIndex, _ := wals[i].Entries(); firstIndex == 0 {
+			t.Errorf("WAL %d wasn't compacted by the snapshot", i)
+		}
+	}
+
+	for i := 0; i < 3; i++ {
+		h.CrashPeer((origLeaderId + i) % 3)
+	}
+	sleepMs(350)
+	for i := 0; i < 3; i++ {
+		h.RestartPeer((origLeaderId + i) % 3)
+	}
+
+	sleepMs(150)
+	newLeaderId, _ := h.CheckSingleLeader()
+	h.SubmitToServer(newLeaderId, 45)
+	sleepMs(250)
+	for v := 5; v <= 45; v++ {
+		h.CheckCommittedN(v, 3)
+	}
+}
+
+// slowSyncWAL is a WALStorage whose WaitDurable takes at least delay.
+type slowSyncWAL struct {
+	*WALStorage
+	delay atomic.Int64
+}
+
+func (ws *slowSyncWAL) WaitDurable() {
+	time.Sleep(time.Duration(ws.delay.Load()))
+	ws.WALStorage.WaitDurable()
+}
+
+func TestLeaderReplicatesWhileSyncing(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	dir := t.TempDir()
+	var wals []*slowSyncWAL
+	defer func() {
+		for _, ws := range wals {
+			ws.Close()
+		}
+	}()
+	// Heartbeats are rare, so that only Submit triggers replication.
+	config := Config{HeartbeatInterval: 200 * time.Millisecond, ElectionTimeout: 400 * time.Millisecond}
+	h := newHarness(t, 3, config, func(id int) Storage {
+		ws, err := NewWALStorage(filepath.Join(dir, strconv.Itoa(id)), 0)
+		if err != nil {
+			t.Fatal(err)
+		}
+		wals = append(wals, &slowSyncWAL{WALStorage: ws})
+		return wals[len(wals)-1]
+	})
+	defer h.Shutdown()
+
+	// The followers store the entry while the leader is still syncing it,
+	// and being a majority, commit it.
+	origLeaderId, _ := h.CheckSingleLeader()
+	wals[origLeaderId].delay.Store(int64(300 * time.Millisecond))
+	start := time.Now()
+	submitted := make(chan int)
+	go func() {
+		submitted <- h.SubmitToServer(origLeaderId, 5)
+	}()
+	sleepMs(60)
+	h.CheckCommittedN(5, 3)
+	if index := <-submitted; index != 0 {
+		t.Errorf("got submit index %d, want 0", index)
+	}
+	if elapsed := time.Since(start); elapsed < 300*time.Millisecond {
+		t.Errorf("Submit returned after %v, before the leader's sync", elapsed)
+	}
+}
+
+// walWriters appends n entries to ws from the given number of goroutines, the
+// way concurrent Submits do: appends are serialized by a lock, and each writer
+// waits for durability after releasing it.
+func walWriters(ws *WALStorage, writers int, n int) {
+	var mu sync.Mutex
+	firstIndex, entries := ws.Entries()
+	next := firstIndex + len(entries)
+	var wg sync.WaitGroup
+	for w := 0; w < writers; w++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			for i := w; i < n; i += writers {
+				mu.Lock()
+				ws.AppendEntries(next, walEntries(1, i))
+				next++
+				mu.Unlock()
+				ws.WaitDurable()
+			}
+		}()
+	}
+	wg.Wait()
+}
+
+func TestWALGroupCommit(t *testing.T) {
+	defer leaktest.CheckTimeout(t, 100*time.Millisecond)()
+
+	config := DefaultWALConfig()
+	config.SyncWindow = 5 * time.Millisecond
+	ws, err := NewWALStorageWithConfig(t.TempDir(), config)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer ws.Close()
+
+	walWriters(ws, 20, 200)
+	if _, entries := ws.Entries(); len(entries) != 200 {
+		t.Errorf("got %d entries, want 200", len(entries))
+	}
+	ws.mu.Lock()
+	defer ws.mu.Unlock()
+	if ws.synced != ws.written {
+		t.Errorf("got %d of %d bytes synced after WaitDurable", ws.synced, ws.written)
+	}
+	if ws.syncs >= 200 {
+		t.Errorf("got %d syncs for 200 appends, want them grouped", ws.syncs)
+	}
+}
+
+// BenchmarkWALGroupCommit measures durable appends per second from 64
+// concurrent writers for several sync windows.
+func BenchmarkWALGroupCommit(b *testing.B) {
+	for _, window := range []time.Duration{0, 100 * time.Microsecond, time.Millisecond, 5 * time.Millisecond} {
+		b.Run(fmt.Sprintf("window=%v", window), func(b *testing.B) {
+			config := DefaultWALConfig()
+			config.SyncWindow = window
+			ws, err := NewWALStorageWithConfig(b.TempDir(), config)
+			if err != nil {
+				b.Fatal(err)
+			}
+			defer ws.Close()
+
+			b.ResetTimer()
+			start := time.Now()
+			walWriters(ws, 64, b.N)
+			b.ReportMetric(float64(b.N)/time.Since(start).Seconds(), "ops/s")
+			b.ReportMetric(float64(ws.syncs)/float64(b.N), "syncs/op")
+		})
+	}
+}
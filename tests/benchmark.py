@@ -118,8 +118,8 @@ def run_benchmark(num_ops=100, warmup_ops=10):
     print(f"✓ Leader found: Node {leader_id} on port {leader_port}")
     print()
     
-    # Connect to leader
-    kv = KVStore(f"http://localhost:{leader_port}", server_id=leader_id)
+    # Connect to the cluster; the store follows the leader if it changes
+    kv = KVStore([f"http://localhost:{port}" for port in (8080, 8081, 8082)], server_id=leader_id)
     
     # Warmup
     if warmup_ops > 0:
@@ -7,6 +7,7 @@ This can achieve much higher throughput than sequential operations.
 import sys
 import os
 import time
+import asyncio
 import requests
 import concurrent.futures
 from statistics import mean
@@ -14,7 +15,7 @@ from statistics import mean
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from python_kv import KVStore
+from python_kv import KVStore, AsyncKVStore
 
 def find_leader():
     """Find which node is the leader."""
@@ -62,7 +63,31 @@ def benchmark_concurrent(kv, num_ops=100, num_threads=10):
     
     return successful, elapsed, ops_per_sec
 
-def run_benchmark(num_ops=100, num_threads=10):
+def benchmark_asyncio(url, server_id, num_ops=100, concurrency=1000):
+    """Benchmark with AsyncKVStore, keeping up to `concurrency` operations in flight."""
+    print(f"Benchmarking {num_ops} operations with {concurrency} in-flight asyncio operations...")
+    
+    async def run():
+        async with AsyncKVStore(url, server_id=server_id) as kv:
+            semaphore = asyncio.Semaphore(concurrency)
+            
+            async def worker(i):
+                async with semaphore:
+                    try:
+                        await kv.put(f"concurrent_key_{i}", f"value_{i}")
+                        return True
+                    except Exception:
+                        return False
+            
+            start_time = time.time()
+            results = await asyncio.gather(*(worker(i) for i in range(num_ops)))
+            return sum(results), time.time() - start_time
+    
+    successful, elapsed = asyncio.run(run())
+    ops_per_sec = successful / elapsed if elapsed > 0 else 0
+    return successful, elapsed, ops_per_sec
+
+def run_benchmark(num_ops=100, num_threads=10, use_asyncio=False, concurrency=1000):
     """Run concurrent benchmark."""
     print("=" * 60)
     print("Raft KV Store - Concurrent Performance Benchmark")
@@ -95,7 +120,11 @@ def run_benchmark(num_ops=100, num_threads=10):
     print()
     
     # Run concurrent benchmark
-    successful, elapsed, ops_per_sec = benchmark_concurrent(kv, num_ops, num_threads)
+    if use_asyncio:
+        successful, elapsed, ops_per_sec = benchmark_asyncio(
+            f"http://localhost:{leader_port}", leader_id, num_ops, concurrency)
+    else:
+        successful, elapsed, ops_per_sec = benchmark_concurrent(kv, num_ops, num_threads)
     
     print("=" * 60)
     print("Results")
@@ -103,7 +132,10 @@ def run_benchmark(num_ops=100, num_threads=10):
     print(f"Operations: {successful}/{num_ops} successful")
     print(f"Time: {elapsed:.2f} seconds")
     print(f"Throughput: {ops_per_sec:.2f} ops/sec")
-    print(f"Concurrency: {num_threads} threads")
+    if use_asyncio:
+        print(f"Concurrency: {concurrency} in-flight asyncio operations")
+    else:
+        print(f"Concurrency: {num_threads} threads")
     print()
 
 def main():
@@ -114,10 +146,15 @@ def main():
                        help='Number of operations (default: 100)')
     parser.add_argument('-t', '--threads', type=int, default=10,
                        help='Number of concurrent threads (default: 10)')
+    parser.add_argument('--asyncio', action='store_true',
+                       help='Use AsyncKVStore instead of a thread pool')
+    parser.add_argument('-c', '--concurrency', type=int, default=1000,
+                       help='Number of in-flight asyncio operations (default: 1000)')
     
     args = parser.parse_args()
     
-    run_benchmark(num_ops=args.num_ops, num_threads=args.threads)
+    run_benchmark(num_ops=args.num_ops, num_threads=args.threads,
+                  use_asyncio=args.asyncio, concurrency=args.concurrency)
 
 if __name__ == "__main__":
     main()
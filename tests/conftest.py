@@ -0,0 +1,23 @@
+"""Fixtures for the client unit tests."""
+
+import pytest
+
+from .fake_bridge import FakeBridge, FakeLog
+
+
+@pytest.fixture
+def bridge():
+    """A single-node fake bridge that is the leader."""
+    node = FakeBridge()
+    yield node
+    node.close()
+
+
+@pytest.fixture
+def cluster():
+    """Three fake bridge nodes sharing one log, with node 0 leading."""
+    log = FakeLog(leader_id=0)
+    nodes = [FakeBridge(server_id, log) for server_id in range(3)]
+    yield nodes
+    for node in nodes:
+        node.close()
@@ -0,0 +1,231 @@
+"""In-process fake raft-bridge for the client unit tests.
+
+FakeBridge serves the bridge's HTTP API from a ThreadingHTTPServer on
+localhost. Nodes of a fake cluster share one FakeLog: submissions commit at
+once, and the leader is whichever node FakeLog.leader_id names.
+"""
+
+import json
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeLog:
+    """Committed entries and leadership shared by the nodes of a fake cluster."""
+
+    def __init__(self, leader_id: Optional[int] = 0):
+        self.entries: List[dict] = []
+        self.leader_id = leader_id
+        self.cond = threading.Condition()
+
+    def append(self, command: dict) -> int:
+        with self.cond:
+            self.entries.append({"index": len(self.entries), "term": 1, "command": command})
+            self.cond.notify_all()
+            return len(self.entries) - 1
+
+    def wait(self, index: int, timeout: float) -> Optional[dict]:
+        with self.cond:
+            self.cond.wait_for(lambda: index < len(self.entries), timeout)
+            return self.entries[index] if index < len(self.entries) else None
+
+
+class FakeBridge:
+    """One fake bridge node.
+
+    Tests steer it through its attributes: missing holds paths answered with
+    404, commit_index caps what a follower has applied (None means the whole
+    log), truncate_streams is the number of upcoming commit streams to cut off
+    mid-chunk, and stall_streams the number to leave silent. Every request
+    path is recorded in requests.
+    """
+
+    def __init__(self, server_id: int = 0, log: Optional[FakeLog] = None):
+        self.server_id = server_id
+        self.log = log or FakeLog(leader_id=server_id)
+        self.missing = set()
+        self.commit_index: Optional[int] = None
+        self.since_leader_contact_ms = 0.0
+        self.truncate_streams = 0
+        self.stall_streams = 0
+        self.requests: List[str] = []
+        self.open_streams = 0
+        self.connections = set()
+        self._stopped = threading.Event()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(self))
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def is_leader(self) -> bool:
+        return self.log.leader_id == self.server_id
+
+    def committed(self) -> List[dict]:
+        """Entries this node has committed."""
+        with self.log.cond:
+            entries = list(self.log.entries)
+        if self.commit_index is not None:
+            entries = entries[:self.commit_index + 1]
+        return entries
+
+    def not_leader(self) -> dict:
+        return {"is_leader": False, "leader_id": self.log.leader_id}
+
+    def handle_post(self, path: str, body: dict):
+        """Return (status, response) for a POST request."""
+        if path == "/submit":
+            if not self.is_leader:
+                return 200, self.not_leader()
+            return 200, {"is_leader": True, "log_index": self.log.append(body)}
+        if path == "/submit_batch":
+            if not self.is_leader:
+                return 200, self.not_leader()
+            indices = [self.log.append(command) for command in body["commands"]]
+            return 200, {"is_leader": True, "first_index": indices[0]}
+        if path == "/submit_wait":
+            if not self.is_leader:
+                return 200, self.not_leader()
+            command = {key: value for key, value in body.items() if key != "timeout_ms"}
+            entry = self.log.wait(self.log.append(command), 5)
+            return 200, {"is_leader": True, "committed": True, **entry}
+        if path == "/wait_commit":
+            entry = self.log.wait(body["log_index"], body["timeout_ms"] / 1000)
+            if entry is None:
+                return 408, {"error": "timeout"}
+            return 200, entry
+        if path == "/read_state":
+            commit_index = len(self.committed()) - 1
+            return 200, {
+                "is_leader": self.is_leader,
+                "commit_index": commit_index,
+                "leader_commit": len(self.log.entries) - 1,
+                "since_leader_contact_ms": 0.0 if self.is_leader else self.since_leader_contact_ms,
+            }
+        return 404, {"error": "not found"}
+
+    def handle_get(self, path: str, query: dict):
+        """Return (status, response) for a GET request."""
+        if path == "/is_leader":
+            return 200, {"is_leader": self.is_leader}
+        if path == "/get_commits_since":
+            since_index = int(query["since_index"][0])
+            commits = [entry for entry in self.committed() if entry["index"] > since_index]
+            return 200, {"commits": commits, "count": len(commits)}
+        return 404, {"error": "not found"}
+
+    def stream_commits(self, handler: BaseHTTPRequestHandler, since_index: int):
+        """Serve /commits_stream as chunked NDJSON until the bridge stops."""
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        truncate = self.truncate_streams > 0
+        stall = not truncate and self.stall_streams > 0
+        if truncate:
+            self.truncate_streams -= 1
+        elif stall:
+            self.stall_streams -= 1
+        self.open_streams += 1
+        try:
+            next_index = since_index + 1
+            while not self._stopped.is_set():
+                entries = self.committed()
+                if next_index >= len(entries) or stall:
+                    if _client_gone(handler.connection):
+                        return
+                    with self.log.cond:
+                        self.log.cond.wait(0.05)
+                    continue
+                line = json.dumps(entries[next_index]).encode() + b"\n"
+                if truncate:
+                    # Announce the whole line but send only half of it.
+                    handler.wfile.write(b"%x\r\n%s" % (len(line), line[:len(line) // 2]))
+                    handler.wfile.flush()
+                    handler.close_connection = True
+                    return
+                handler.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                handler.wfile.flush()
+                next_index += 1
+        except OSError:
+            pass
+        finally:
+            self.open_streams -= 1
+        handler.close_connection = True
+
+    def close(self):
+        """Stop the node, dropping its open keep-alive connections too."""
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+        for conn in list(self.connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _client_gone(conn: socket.socket) -> bool:
+    """Whether the client closed its end of conn."""
+    readable, _, _ = select.select([conn], [], [], 0)
+    return bool(readable) and not conn.recv(1, socket.MSG_PEEK)
+
+
+def _make_handler(bridge: FakeBridge):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            bridge.connections.add(self.connection)
+
+        def finish(self):
+            bridge.connections.discard(self.connection)
+            super().finish()
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, data: dict):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            bridge.requests.append(parts.path)
+            if parts.path in bridge.missing:
+                return self._reply(404, {"error": "not found"})
+            query = parse_qs(parts.query)
+            if parts.path == "/commits_stream":
+                return bridge.stream_commits(self, int(query["since_index"][0]))
+            self._reply(*bridge.handle_get(parts.path, query))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            bridge.requests.append(self.path)
+            if self.path in bridge.missing:
+                return self._reply(404, {"error": "not found"})
+            self._reply(*bridge.handle_post(self.path, body))
+
+    return Handler
+
+
+def wait_until(predicate, timeout: float = 2.0) -> bool:
+    """Poll predicate until it is true or timeout seconds pass."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
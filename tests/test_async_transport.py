@@ -0,0 +1,186 @@
+"""Unit tests for the pipelined asyncio transport and AsyncKVStore."""
+
+import asyncio
+
+import pytest
+
+from python_kv import AsyncKVStore, CommitFailedError
+from python_kv.async_transport import AsyncHTTPTransport, HTTPError
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """Read one request off the connection; return its target, or None at EOF."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get("content-length", "0")))
+    return request_line.split()[1].decode()
+
+
+def _response(body: bytes, status: str = "200 OK") -> bytes:
+    return b"HTTP/1.1 %s\r\nContent-Length: %d\r\n\r\n%s" % (status.encode(), len(body), body)
+
+
+class _ScriptedServer:
+    """Raw HTTP server that reads `batch` pipelined requests, then answers them with respond(targets).
+
+    The first hang_up connections are closed after their first answer.
+    """
+
+    def __init__(self, respond, batch: int = 1, hang_up: int = 0):
+        self.respond = respond
+        self.batch = batch
+        self.hang_up = hang_up
+        self.connections = 0
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                targets = []
+                for _ in range(self.batch):
+                    target = await _read_request(reader)
+                    if target is None:
+                        return
+                    targets.append(target)
+                writer.write(self.respond(targets))
+                await writer.drain()
+                if self.hang_up:
+                    self.hang_up -= 1
+                    return
+        finally:
+            writer.close()
+
+
+def test_parses_content_length_and_chunked_responses():
+    def respond(targets):
+        if targets == ["/chunked"]:
+            return (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                    b"5;ext=1\r\nhello\r\n6\r\n world\r\n0\r\nX-Trailer: yes\r\n\r\n")
+        return _response(b'{"path": "%s"}' % targets[0].encode())
+
+    async def run():
+        async with _ScriptedServer(respond) as server:
+            transport = AsyncHTTPTransport(pool_size=1)
+            try:
+                first = await transport.get(f"{server.url}/plain", timeout=2)
+                chunked = await transport.get(f"{server.url}/chunked", timeout=2)
+                last = await transport.post(f"{server.url}/after", json={"a": 1}, timeout=2)
+            finally:
+                await transport.close()
+            return first, chunked, last, server.connections
+
+    first, chunked, last, connections = asyncio.run(run())
+    assert first.json() == {"path": "/plain"}
+    assert chunked.body == b"hello world"
+    # The trailer was consumed, so the next response on the connection parses.
+    assert last.json() == {"path": "/after"}
+    assert connections == 1
+
+
+def test_pipelines_requests_on_one_connection():
+    # The server only answers once all five requests have arrived, so the
+    # transport must have sent them without waiting for responses.
+    def respond(targets):
+        return b"".join(_response(target.encode()) for target in targets)
+
+    async def run():
+        async with _ScriptedServer(respond, batch=5) as server:
+            transport = AsyncHTTPTransport(pool_size=1, max_pipeline=8)
+            try:
+                responses = await asyncio.gather(
+                    *(transport.get(f"{server.url}/r{i}", timeout=2) for i in range(5)))
+            finally:
+                await transport.close()
+            return responses, server.connections
+
+    responses, connections = asyncio.run(run())
+    assert [response.body for response in responses] == [b"/r%d" % i for i in range(5)]
+    assert connections == 1
+
+
+def test_error_status_raises_http_error():
+    async def run():
+        async with _ScriptedServer(lambda targets: _response(b"no such endpoint", "404 Not Found")) as server:
+            transport = AsyncHTTPTransport()
+            try:
+                return await transport.get(f"{server.url}/missing", timeout=2)
+            finally:
+                await transport.close()
+
+    response = asyncio.run(run())
+    assert response.status == 404
+    with pytest.raises(HTTPError) as excinfo:
+        response.raise_for_status()
+    assert excinfo.value.status == 404
+
+
+def test_truncated_chunked_response_fails_pending_requests():
+    responses = iter([
+        # Cut the first connection off in the middle of a chunk.
+        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\na\r\nhalf",
+        _response(b"ok") * 2,
+    ])
+
+    async def run():
+        async with _ScriptedServer(lambda targets: next(responses), batch=2, hang_up=1) as server:
+            transport = AsyncHTTPTransport(pool_size=1, max_pipeline=8)
+            try:
+                failed = await asyncio.gather(
+                    *(transport.get(f"{server.url}/r{i}", timeout=2) for i in range(2)),
+                    return_exceptions=True)
+                retried = await asyncio.gather(
+                    *(transport.get(f"{server.url}/r{i}", timeout=2) for i in range(2)))
+            finally:
+                await transport.close()
+            return failed, retried, server.connections
+
+    failed, retried, connections = asyncio.run(run())
+    assert all(isinstance(result, ConnectionError) for result in failed), failed
+    # The broken connection is dropped and later requests open a new one.
+    assert [response.body for response in retried] == [b"ok", b"ok"]
+    assert connections == 2
+
+
+def test_async_kvstore_against_fake_bridge(bridge):
+    async def run():
+        async with AsyncKVStore(bridge.url, server_id=0, timeout_ms=2000) as kv:
+            puts = await asyncio.gather(*(kv.put(f"key{i}", str(i)) for i in range(50)))
+            value = await kv.get("key42")
+            swapped = await kv.cas("key1", "1", "one")
+            return puts, value, swapped, await kv.get("key1")
+
+    puts, value, swapped, after = asyncio.run(run())
+    assert puts == [(None, False)] * 50
+    assert value == ("42", True)
+    assert swapped == ("1", True)
+    assert after == ("one", True)
+
+
+def test_async_kvstore_commit_timeout(bridge):
+    # Without the commit endpoints the applier never gets past the entry.
+    bridge.missing.update({"/get_commits_since", "/wait_commit"})
+
+    async def run():
+        async with AsyncKVStore(bridge.url, server_id=0, timeout_ms=200) as kv:
+            await kv.put("a", "1")
+
+    with pytest.raises(CommitFailedError, match="last error: HTTP 404"):
+        asyncio.run(run())
@@ -0,0 +1,67 @@
+"""Unit tests for KVCluster's round-robin bounded-staleness reads."""
+
+import pytest
+
+from python_kv import KVCluster, NotLeaderError, StaleReadError
+
+
+def _cluster_client(nodes, **kwargs):
+    return KVCluster([node.url for node in nodes], timeout_ms=2000, follower_wait_ms=20, **kwargs)
+
+
+def test_bounded_reads_rotate_across_nodes(cluster):
+    with _cluster_client(cluster) as kv:
+        assert kv.put("a", "1") == (None, False)
+        assert [kv.get("a") for _ in range(6)] == [("1", True)] * 6
+    assert [node.requests.count("/read_state") for node in cluster] == [2, 2, 2]
+    # Writes only go to the leader.
+    assert [node.requests.count("/submit") for node in cluster] == [1, 0, 0]
+
+
+def test_stale_node_hands_read_to_next(cluster):
+    with _cluster_client(cluster) as kv:
+        kv.put("a", "1")
+        cluster[1].commit_index = -1  # node 1 hasn't applied the put
+        assert [kv.get("a") for _ in range(3)] == [("1", True)] * 3
+    assert cluster[1].requests.count("/read_state") >= 1
+    assert "/commits_stream" not in cluster[1].requests
+
+
+def test_entry_bound_allows_lagging_node(cluster):
+    with _cluster_client(cluster) as kv:
+        kv.put("a", "1")
+        kv.put("a", "2")
+        cluster[1].commit_index = 0
+        assert kv.get("a", max_staleness_entries=1) == ("2", True)  # served by the leader
+        assert kv.get("a", max_staleness_entries=1) == ("1", True)  # node 1 is one entry behind
+    assert cluster[1].requests.count("/read_state") == 1
+
+
+def test_no_node_within_bounds(cluster):
+    with _cluster_client(cluster, max_staleness_ms=100) as kv:
+        kv.put("a", "1")
+        cluster[0].close()
+        for node in cluster[1:]:
+            node.since_leader_contact_ms = 500.0
+        with pytest.raises(StaleReadError):
+            kv.get("a")
+
+
+def test_maybe_committed_cas_is_not_resubmitted(cluster):
+    leader = cluster[0]
+
+    def lose_leadership_before_commit(path, body):
+        if path != "/submit_wait":
+            return handle_post(path, body)
+        # The entry is appended, but the node steps down before it commits.
+        leader.log.append({key: value for key, value in body.items() if key != "timeout_ms"})
+        leader.log.leader_id = 1
+        return 200, {"is_leader": True, "committed": False}
+
+    handle_post = leader.handle_post
+    leader.handle_post = lose_leadership_before_commit
+    with _cluster_client(cluster, stream_commits=False) as kv:
+        with pytest.raises(NotLeaderError) as excinfo:
+            kv.cas("a", "", "1")
+    assert excinfo.value.maybe_committed
+    assert len(leader.log.entries) == 1
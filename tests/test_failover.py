@@ -0,0 +1,123 @@
+"""Unit tests for KVStore following the leader across several nodes."""
+
+import time
+
+import pytest
+import requests
+
+from python_kv import HTTPTransport, KVStore, NotLeaderError
+
+
+def _store(nodes, **kwargs):
+    kwargs.setdefault("failover_timeout_ms", 2000)
+    return KVStore([node.url for node in nodes], server_id=0, timeout_ms=2000, **kwargs)
+
+
+def test_follows_leader_hint(cluster):
+    cluster[0].log.leader_id = 1
+    with _store(cluster) as kv:
+        assert kv.put("a", "1") == (None, False)
+        assert kv.bridge_url == cluster[1].url
+        assert kv.get("a") == ("1", True)
+    assert cluster[0].requests.count("/submit") == 1
+    assert cluster[1].requests.count("/submit") == 2
+
+
+def test_probes_for_leader_without_hint(cluster):
+    cluster[0].log.leader_id = 2
+    cluster[0].not_leader = lambda: {"is_leader": False}
+    with _store(cluster) as kv:
+        assert kv.put("a", "1") == (None, False)
+        assert kv.bridge_url == cluster[2].url
+    assert "/is_leader" in cluster[2].requests
+
+
+def test_follows_leader_change(cluster):
+    with _store(cluster) as kv:
+        assert kv.put("a", "1") == (None, False)
+        cluster[0].log.leader_id = 2
+        assert kv.put("a", "2") == ("1", True)
+        assert kv.bridge_url == cluster[2].url
+        # The applier moved to the new leader and kept its place in the log.
+        assert kv.get("a") == ("2", True)
+        assert kv.last_applied_index == 2
+
+
+def test_fails_over_when_leader_goes_down(cluster):
+    with _store(cluster) as kv:
+        kv.put("a", "1")
+        cluster[0].close()
+        cluster[0].log.leader_id = 1
+        assert kv.put("a", "2") == ("1", True)
+        assert kv.bridge_url == cluster[1].url
+
+
+def test_cas_is_not_retried_after_connection_error(cluster):
+    with _store(cluster) as kv:
+        kv.put("a", "1")
+        cluster[0].close()
+        cluster[0].log.leader_id = 1
+        with pytest.raises(requests.ConnectionError):
+            kv.cas("a", "1", "2")
+
+
+def test_gives_up_without_leader(cluster):
+    cluster[0].log.leader_id = None
+    with _store(cluster, failover_timeout_ms=200) as kv:
+        start = time.monotonic()
+        with pytest.raises(NotLeaderError):
+            kv.put("a", "1")
+        assert 0.2 <= time.monotonic() - start < 2
+
+
+def test_single_node_reports_leader(cluster):
+    cluster[0].log.leader_id = 1
+    with KVStore(cluster[0].url, server_id=0, timeout_ms=2000) as kv:
+        with pytest.raises(NotLeaderError) as excinfo:
+            kv.put("a", "1")
+    assert excinfo.value.leader_id == 1
+
+
+def test_cas_many_is_not_resubmitted_after_partial_batch(cluster):
+    leader = cluster[0]
+    handle_post = leader.handle_post
+
+    def lose_leadership_after_first_chunk(path, body):
+        response = handle_post(path, body)
+        if path == "/submit_batch":
+            leader.log.leader_id = 1
+        return response
+
+    with _store(cluster, batch_size=1) as kv:
+        kv.put_many({"a": "1", "b": "2"})
+        leader.handle_post = lose_leadership_after_first_chunk
+        with pytest.raises(NotLeaderError) as excinfo:
+            kv.cas_many([("a", "1", "10"), ("b", "2", "20")])
+    assert excinfo.value.maybe_committed
+    # Only the first chunk's cas was submitted, and only once.
+    cas_entries = [entry for entry in leader.log.entries if entry["command"]["kind"] == "cas"]
+    assert [entry["command"]["key"] for entry in cas_entries] == ["a"]
+
+
+class _LeaderChangeTimeoutTransport(HTTPTransport):
+    """Transport whose commit waits time out because the leader changed meanwhile."""
+
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    def post(self, url, **kwargs):
+        if url.endswith("/wait_commit"):
+            self.log.leader_id = 1
+            raise requests.exceptions.ReadTimeout("timed out waiting for the commit")
+        return super().post(url, **kwargs)
+
+
+def test_commit_wait_timeout_reports_lost_leadership(cluster):
+    transport = _LeaderChangeTimeoutTransport(cluster[0].log)
+    with _store(cluster, transport=transport, combined_submit=False, stream_commits=False) as kv:
+        with pytest.raises(NotLeaderError) as excinfo:
+            kv.cas("a", "", "1")
+    transport.close()
+    assert excinfo.value.maybe_committed
+    assert len(cluster[0].log.entries) == 1
@@ -0,0 +1,43 @@
+"""Unit tests for KVStore's batched put_many/get_many/cas_many."""
+
+import pytest
+
+from python_kv import KVStore
+
+
+@pytest.mark.parametrize("stream_commits", [True, False])
+def test_put_many_and_get_many_split_into_batches(bridge, stream_commits):
+    with KVStore(bridge.url, server_id=0, timeout_ms=2000, batch_size=3,
+                 stream_commits=stream_commits) as kv:
+        items = {f"key{i}": str(i) for i in range(10)}
+        assert kv.put_many(items) == [(None, False)] * 10
+        assert bridge.requests.count("/submit_batch") == 4
+
+        values = kv.get_many([f"key{i}" for i in reversed(range(10))] + ["missing"])
+        assert values == [(str(i), True) for i in reversed(range(10))] + [(None, False)]
+        assert bridge.requests.count("/submit_batch") == 8
+    assert "/submit" not in bridge.requests
+
+
+def test_cas_many_reports_old_values(bridge):
+    with KVStore(bridge.url, server_id=0, timeout_ms=2000) as kv:
+        kv.put_many([("a", "1"), ("b", "2")])
+        assert kv.cas_many([("a", "1", "10"), ("b", "wrong", "20")]) == [("1", True), ("2", True)]
+        assert kv.get_many(["a", "b"]) == [("10", True), ("2", True)]
+
+
+def test_empty_batches_submit_nothing(bridge):
+    with KVStore(bridge.url, server_id=0, timeout_ms=2000) as kv:
+        assert kv.put_many({}) == []
+        assert kv.get_many([]) == []
+    assert bridge.requests == []
+
+
+@pytest.mark.parametrize("stream_commits", [True, False])
+def test_batches_larger_than_recent_results(bridge, stream_commits):
+    # Only 8 results are kept, so a 30-key batch has to run in rounds to
+    # collect all of its results.
+    with KVStore(bridge.url, server_id=0, timeout_ms=2000, recent_results=8,
+                 stream_commits=stream_commits) as kv:
+        assert kv.put_many({f"key{i}": str(i) for i in range(30)}) == [(None, False)] * 30
+        assert kv.get_many([f"key{i}" for i in range(30)]) == [(str(i), True) for i in range(30)]
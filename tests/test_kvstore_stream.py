@@ -0,0 +1,83 @@
+"""Unit tests for KVStore's streaming commit applier and its polling fallback."""
+
+import gc
+from concurrent.futures import ThreadPoolExecutor
+
+from python_kv import HTTPTransport, KVStore
+
+from .fake_bridge import wait_until
+
+
+def test_applier_follows_commit_stream(bridge):
+    with KVStore(bridge.url, server_id=0, timeout_ms=2000) as kv:
+        assert kv.put("a", "1") == (None, False)
+        assert kv.get("a") == ("1", True)
+
+        # Entries other clients commit are applied as they arrive.
+        bridge.log.append({"kind": "put", "key": "b", "value": "2", "id": 1})
+        assert wait_until(lambda: kv.last_applied_index == 2)
+        assert kv.datastore.get("b") == ("2", True)
+    assert bridge.requests.count("/commits_stream") == 1
+    assert "/get_commits_since" not in bridge.requests
+
+
+def test_falls_back_to_polling_without_stream(bridge):
+    bridge.missing.add("/commits_stream")
+    with KVStore(bridge.url, server_id=0, timeout_ms=2000) as kv:
+        assert kv.put("a", "1") == (None, False)
+        assert kv.get("a") == ("1", True)
+        assert not kv._stream_supported
+    assert bridge.requests.count("/commits_stream") == 1
+    assert "/get_commits_since" in bridge.requests
+
+
+def test_polling_results_applied_by_other_threads(bridge):
+    # Concurrent operations apply each other's entries while polling; each
+    # still gets its own result.
+    bridge.missing.add("/commits_stream")
+    with KVStore(bridge.url, server_id=0, timeout_ms=2000) as kv:
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda i: kv.put(f"key{i}", str(i)), range(100)))
+        assert results == [(None, False)] * 100
+        assert kv.get("key99") == ("99", True)
+
+
+def test_reconnects_after_truncated_stream(bridge):
+    bridge.truncate_streams = 1
+    with KVStore(bridge.url, server_id=0, timeout_ms=2000) as kv:
+        assert kv.put("a", "1") == (None, False)
+        assert kv.get("a") == ("1", True)
+    assert bridge.requests.count("/commits_stream") == 2
+
+
+def test_reconnects_when_stream_goes_silent(bridge):
+    bridge.stall_streams = 1
+    with KVStore(bridge.url, server_id=0, timeout_ms=2000, stream_idle_timeout_ms=200) as kv:
+        assert kv.put("a", "1") == (None, False)
+        assert kv.last_error is None
+    assert bridge.requests.count("/commits_stream") == 2
+
+
+def test_streams_stay_out_of_shared_pool(bridge):
+    shared = HTTPTransport(pool_maxsize=2)
+    stores = [KVStore(bridge.url, server_id=0, timeout_ms=2000, transport=shared) for _ in range(5)]
+    try:
+        for store in stores:
+            store.put("a", "1")
+        assert bridge.open_streams == 5
+        assert shared.get(f"{bridge.url}/is_leader", timeout=2).json() == {"is_leader": True}
+    finally:
+        for store in stores:
+            store.close()
+        shared.close()
+    assert wait_until(lambda: bridge.open_streams == 0)
+
+
+def test_dropped_store_stops_applier(bridge):
+    kv = KVStore(bridge.url, server_id=0, timeout_ms=2000, stream_idle_timeout_ms=200)
+    kv.put("a", "1")
+    applier = kv._applier
+    del kv
+    gc.collect()
+    applier.join(timeout=2)
+    assert not applier.is_alive()
@@ -0,0 +1,23 @@
+"""Unit tests for KVStore's combined submit-and-wait requests."""
+
+from python_kv import KVStore
+
+
+def test_writes_use_submit_wait(bridge):
+    kv = KVStore(bridge.url, server_id=0, timeout_ms=2000, stream_commits=False)
+    assert kv.put("a", "1") == (None, False)
+    assert kv.put("a", "2") == ("1", True)
+    assert bridge.requests.count("/submit_wait") == 2
+    assert "/submit" not in bridge.requests
+
+
+def test_falls_back_without_submit_wait(bridge):
+    bridge.missing.add("/submit_wait")
+    kv = KVStore(bridge.url, server_id=0, timeout_ms=2000, stream_commits=False)
+    assert kv.put("a", "1") == (None, False)
+    assert kv.put("a", "2") == ("1", True)
+    assert kv.get("a") == ("2", True)
+    # Only the first write probes /submit_wait; nothing was committed twice.
+    assert bridge.requests.count("/submit_wait") == 1
+    assert bridge.requests.count("/submit") == 3
+    assert len(bridge.log.entries) == 3